@@ -1,12 +1,18 @@
 import os
 import pandas as pd
 import logging
-import matplotlib.pyplot as plt
+import config
+import metrics
 from authenticate import YouTubeAPIManager
+from catalog import PlaylistCatalog
+from charts import CHART_DIR, BarChart, renderer as default_renderer
+from dataset import dataset_exists, load_dataset, save_dataset
 from googleapiclient.errors import HttpError
 
-PLAYLIST_ID = "PLmPwAQy0bOJZ3U_u5BGeFC1fE2FvzZ9Yp"
 OUTPUT_CSV = "playlist_statistics.csv"
+MAX_IDS_PER_REQUEST = 50  # videos.list accepts at most 50 comma-separated IDs
+STATS_COLUMNS = ["Title", "Video ID", "Views", "Likes", "Fetched At"]
+PLOT_COLUMNS = ["Title", "Views", "Likes"]  # what visualize_statistics reads
 
 
 logging.basicConfig(level=logging.INFO)
@@ -17,10 +23,22 @@ class YouTubePlaylistManager(YouTubeAPIManager):
     """
     A class to manage YouTube playlist operations, including fetching playlist videos,
     retrieving statistics, and visualizing data.
+    Every statistics fetch is also appended to `history` (a StatsHistory)
+    when one is given. Charts are drawn by `renderer` (a charts.ChartRenderer),
+    the shared headless one by default.
     """
 
-    def __init__(self, credentials_file="credentials.json", token_file="token.json"):
-        super().__init__(credentials_file, token_file)
+    def __init__(
+        self,
+        credentials_file="credentials.json",
+        token_file="token.json",
+        history=None,
+        renderer=None,
+        **kwargs,
+    ):
+        super().__init__(credentials_file, token_file, **kwargs)
+        self.history = history
+        self.renderer = renderer or default_renderer
 
     def get_playlist_videos(self, playlist_id):
         """
@@ -28,76 +46,153 @@ class YouTubePlaylistManager(YouTubeAPIManager):
         Handles pagination to retrieve all videos in the playlist.
         """
         videos = []
-        request = self.youtube.playlistItems().list(
-            part="snippet", playlistId=playlist_id, maxResults=50
-        )
-
-        while request:
-            try:
-                response = request.execute()
-                for item in response["items"]:
-                    video_id = item["snippet"]["resourceId"]["videoId"]
-                    title = item["snippet"]["title"]
-                    videos.append({"video_id": video_id, "title": title})
-
-                request = self.youtube.playlistItems().list_next(request, response)
-            except HttpError as e:
-                logger.error("Error fetching playlist videos: %s", e)
-                break
+        try:
+            for page in self.iter_playlist_pages(playlist_id):
+                videos.extend(self._page_videos(page))
+        except HttpError as e:
+            logger.error("Error fetching playlist videos: %s", e)
 
         return videos
 
+    @staticmethod
+    def _page_videos(page):
+        return [
+            {
+                "video_id": item["contentDetails"]["videoId"],
+                "title": item["snippet"]["title"],
+            }
+            for item in page
+        ]
+
     def get_video_statistics(self, video_id):
         """
         Fetch statistics for a YouTube video.
+        Returns None if the video is deleted, private or could not be fetched.
         """
-        try:
-            request = self.youtube.videos().list(part="statistics", id=video_id)
-            response = request.execute()
+        stats, _ = self.get_videos_statistics([video_id])
+        return stats.get(video_id)
 
-            for item in response["items"]:
-                return {
-                    "views": int(item["statistics"]["viewCount"]),
+    def get_videos_statistics(self, video_ids):
+        """
+        Fetch statistics for many videos, 50 IDs per videos.list call.
+        Returns a tuple (stats, missing): a dict mapping each video ID to its
+        views and likes, and the list of IDs no statistics came back for.
+        """
+        unique_ids = list(dict.fromkeys(video_ids))
+        chunks = [
+            unique_ids[start : start + MAX_IDS_PER_REQUEST]
+            for start in range(0, len(unique_ids), MAX_IDS_PER_REQUEST)
+        ]
+        stats = {}
+
+        for items in self.map_concurrent(self._fetch_statistics_chunk, chunks):
+            for item in items:
+                stats[item["id"]] = {
+                    "views": int(item["statistics"].get("viewCount", 0)),
                     "likes": int(item["statistics"].get("likeCount", 0)),
                 }
+
+        missing = [video_id for video_id in unique_ids if video_id not in stats]
+        if missing:
+            logger.warning(
+                "No statistics returned for %d video(s): %s",
+                len(missing),
+                ", ".join(missing),
+            )
+        return stats, missing
+
+    def _fetch_statistics_chunk(self, chunk):
+        """
+        Fetch one videos.list page of statistics. Returns [] on API errors.
+        """
+        try:
+            request = self.youtube.videos().list(part="statistics", id=",".join(chunk))
+            response = self.execute(request)
         except HttpError as e:
-            logger.error("Error fetching statistics for video %s : %s", video_id, e)
-            return {"views": 0, "likes": 0}
+            logger.error(
+                "Error fetching statistics for %d videos starting at %s : %s",
+                len(chunk),
+                chunk[0],
+                e,
+            )
+            return []
+        return response.get("items", [])
 
+    @metrics.timed("collect_playlist_statistics")
     def collect_playlist_statistics(
-        self, playlist_id, output_csv="playlist_statistics.csv"
+        self,
+        playlist_id,
+        output_csv="playlist_statistics.csv",
+        columns=None,
+        refresh=False,
     ):
         """
-        Collect statistics for all videos in a playlist and save them to a CSV file.
-        If the file already exists, read from it to avoid API calls and save quota.
+        Collect statistics for all videos in a playlist and save them as a
+        dataset exported to `output_csv` (see dataset.save_dataset).
+        If the dataset already exists, read from it to avoid API calls and save
+        quota, loading only `columns` when given. With `refresh`, fetch again
+        and replace it; each fetch is appended to the stats history.
         """
 
-        if os.path.exists(output_csv):
-            logger.info(" %s already exists. Reading from the file.", output_csv)
-            return pd.read_csv(output_csv)
+        if not refresh and dataset_exists(output_csv):
+            logger.info(" %s already exists. Reading from the dataset.", output_csv)
+            return load_dataset(output_csv, columns)
 
         logger.info("Creating %s and fetching playlist statistics...", output_csv)
-        videos = self.get_playlist_videos(playlist_id)
-        video_stats = []
-
-        for video in videos:
-            stats = self.get_video_statistics(video["video_id"])
-            video_stats.append(
-                {
-                    "Title": video["title"],
-                    "Views": stats["views"],
-                    "Likes": stats["likes"],
-                }
-            )
+        # Statistics for each page are requested as soon as the page arrives,
+        # overlapping with the rest of the pagination.
+        pending = []
+        try:
+            for page in self.iter_playlist_pages(playlist_id):
+                videos = self._page_videos(page)
+                if not videos:
+                    continue
+                ids = [video["video_id"] for video in videos]
+                future = self.submit(self._fetch_statistics_chunk, ids)
+                pending.append((videos, future))
+        except HttpError as e:
+            logger.error("Error fetching playlist videos: %s", e)
 
-        df = pd.DataFrame(video_stats)
-        df.to_csv(output_csv, index=False)
+        video_stats = []
+        history_stats = {}
+        fetched_at = pd.Timestamp.now(tz="UTC")
+        for videos, future in pending:
+            stats_by_id = {item["id"]: item["statistics"] for item in future.result()}
+            for video in videos:
+                stats = stats_by_id.get(video["video_id"])
+                if stats is None:
+                    logger.warning(
+                        "Skipping '%s' (%s): video is deleted or private.",
+                        video["title"],
+                        video["video_id"],
+                    )
+                    continue
+                views = int(stats.get("viewCount", 0))
+                likes = int(stats.get("likeCount", 0))
+                history_stats[video["video_id"]] = {"views": views, "likes": likes}
+                video_stats.append(
+                    {
+                        "Title": video["title"],
+                        "Video ID": video["video_id"],
+                        "Views": views,
+                        "Likes": likes,
+                        "Fetched At": fetched_at,
+                    }
+                )
+
+        df = save_dataset(pd.DataFrame(video_stats, columns=STATS_COLUMNS), output_csv)
         logger.info("Playlist statistics saved to %s.", output_csv)
+        if self.history is not None:
+            self.history.append(history_stats, fetched_at)
+        if columns is not None:
+            return df[columns]
         return df
 
-    def visualize_statistics(self, df):
+    def visualize_statistics(
+        self, df, output=os.path.join(CHART_DIR, "playlist_stats.png")
+    ):
         """
-        Visualize video statistics using matplotlib.
+        Render video statistics to `output` (PNG or SVG path, or a buffer).
         Shows:
         - Top 10 highest views
         - Top 10 highest likes
@@ -110,30 +205,53 @@ class YouTubePlaylistManager(YouTubeAPIManager):
         highest_likes = df.nlargest(10, "Likes")
         lowest_likes = df.nsmallest(10, "Likes")
 
-        fig, axs = plt.subplots(2, 2, figsize=(15, 10))
-
-        axs[0, 0].barh(highest_views["Title"], highest_views["Views"], color="blue")
-        axs[0, 0].set_title("Top 10 Highest Views")
-        axs[0, 0].set_xlabel("Views")
-        axs[0, 0].invert_yaxis()
-
-        axs[0, 1].barh(highest_likes["Title"], highest_likes["Likes"], color="green")
-        axs[0, 1].set_title("Top 10 Highest Likes")
-        axs[0, 1].set_xlabel("Likes")
-        axs[0, 1].invert_yaxis()
-
-        axs[1, 0].barh(lowest_views["Title"], lowest_views["Views"], color="red")
-        axs[1, 0].set_title("Bottom 10 Lowest Views")
-        axs[1, 0].set_xlabel("Views")
-        axs[1, 0].invert_yaxis()
-
-        axs[1, 1].barh(lowest_likes["Title"], lowest_likes["Likes"], color="orange")
-        axs[1, 1].set_title("Bottom 10 Lowest Likes")
-        axs[1, 1].set_xlabel("Likes")
-        axs[1, 1].invert_yaxis()
-
-        plt.tight_layout()
-        plt.show()
+        charts = [
+            BarChart(
+                "Top 10 Highest Views",
+                highest_views["Title"],
+                highest_views["Views"],
+                "Views",
+                color="blue",
+            ),
+            BarChart(
+                "Top 10 Highest Likes",
+                highest_likes["Title"],
+                highest_likes["Likes"],
+                "Likes",
+                color="green",
+            ),
+            BarChart(
+                "Bottom 10 Lowest Views",
+                lowest_views["Title"],
+                lowest_views["Views"],
+                "Views",
+                color="red",
+            ),
+            BarChart(
+                "Bottom 10 Lowest Likes",
+                lowest_likes["Title"],
+                lowest_likes["Likes"],
+                "Likes",
+                color="orange",
+            ),
+        ]
+        self.renderer.render(charts, output, ncols=2)
+        if isinstance(output, str):
+            logger.info("Statistics chart saved to %s.", output)
+        return output
+
+
+def join_playlist_data(
+    stats_df, data_csv="playlist_data.csv", columns=("Artist", "Song")
+):
+    """
+    Adds `columns` of the playlist dataset to a statistics frame, matched on
+    Video ID through a PlaylistCatalog rather than on titles.
+    """
+    catalog = PlaylistCatalog.from_dataset(
+        load_dataset(data_csv, ["Video ID", "Title", "Artist", "Song"])
+    )
+    return catalog.join(stats_df, columns)
 
 
 def main():
@@ -142,7 +260,7 @@ def main():
     youtube_manager.authenticate()
 
     video_stats_df = youtube_manager.collect_playlist_statistics(
-        PLAYLIST_ID, OUTPUT_CSV
+        config.PLAYLIST_ID, OUTPUT_CSV, PLOT_COLUMNS
     )
 
     youtube_manager.visualize_statistics(video_stats_df)
@@ -0,0 +1,252 @@
+import glob
+import json
+import logging
+import os
+
+import numpy as np
+
+from catalog import normalize_artist
+from titles import parse_titles
+
+logger = logging.getLogger(__name__)
+
+# Where ArtistAffinity.from_snapshots keeps the matrix between runs.
+CACHE_NAME = "artist_affinity.npz"
+
+
+def title_artists(parsed):
+    """Normalized primary and featured artists of a ParsedTitle."""
+    artists = parsed.artists + parsed.featured
+    return {normalize_artist(artist) for artist in artists if artist.strip()}
+
+
+class ArtistAffinity:
+    """
+    Sparse artist x playlist matrix of the playlist snapshots, used to rank
+    songs by how well their artists fit a playlist.
+
+    Entry (artist, playlist) is the TF-IDF weight of the artist's songs in
+    the playlist, (1 + log count) * log(1 + playlists / playlists with the
+    artist), and every playlist column has unit length. The affinity of the
+    artists to a target playlist is M @ (M.T @ t), where t is the target's
+    column: artists score high when they share playlists with the target's
+    artists, weighted by how similar those playlists are to the target, so
+    the artist x artist co-occurrence matrix is never built.
+
+    The matrix is kept in coordinate form (one numpy array each for the
+    artist, playlist and count of the non-zero entries), and both products
+    are one np.bincount over them, O(non-zero entries).
+
+    Args:
+        playlists (list): Playlist IDs, one per column
+        artists (list): Normalized artist names, one per row
+        rows (array): Artist index of each non-zero entry
+        cols (array): Playlist index of each non-zero entry
+        counts (array): Songs by the artist in the playlist
+        fingerprints (list): Per playlist, what its snapshot file looked
+            like when read (see from_snapshots)
+    """
+
+    def __init__(self, playlists, artists, rows, cols, counts, fingerprints=None):
+        self.playlists = list(playlists)
+        self.artists = list(artists)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.fingerprints = list(fingerprints or [None] * len(self.playlists))
+        self._artist_index = {artist: index for index, artist in enumerate(artists)}
+        self._playlist_index = {
+            playlist_id: index for index, playlist_id in enumerate(self.playlists)
+        }
+        frequency = np.bincount(self.rows, minlength=len(self.artists))
+        self._idf = np.log1p(len(self.playlists) / np.maximum(frequency, 1))
+        weights = (1 + np.log(self.counts)) * self._idf[self.rows]
+        norms = np.bincount(self.cols, weights=weights**2, minlength=len(playlists))
+        self.weights = weights / np.sqrt(norms)[self.cols]
+
+    def __len__(self):
+        return len(self.playlists)
+
+    @classmethod
+    def from_titles(cls, playlists):
+        """From a mapping of playlist ID to the titles in it."""
+        return cls._build(
+            {playlist_id: (titles, None) for playlist_id, titles in playlists.items()}
+        )
+
+    @classmethod
+    def _build(cls, playlists, cached=None):
+        """
+        From a mapping of playlist ID to (titles, fingerprint), reusing the
+        columns of `cached` (an ArtistAffinity) for playlists whose titles are
+        None.
+        """
+        artist_index = {}
+        rows, cols, counts, fingerprints = [], [], [], []
+        if cached is not None:
+            artist_index = dict(cached._artist_index)
+            # Old column -> new column, -1 for playlists parsed again or gone.
+            new_col = np.full(len(cached), -1, dtype=np.int64)
+            for col, (playlist_id, (titles, _)) in enumerate(playlists.items()):
+                if titles is None:
+                    new_col[cached._playlist_index[playlist_id]] = col
+            mask = new_col[cached.cols] >= 0
+            rows.append(cached.rows[mask])
+            cols.append(new_col[cached.cols[mask]])
+            counts.append(cached.counts[mask])
+        for col, (playlist_id, (titles, fingerprint)) in enumerate(playlists.items()):
+            fingerprints.append(fingerprint)
+            if titles is None:
+                continue
+            artist_ids = [
+                artist_index.setdefault(artist, len(artist_index))
+                for parsed in parse_titles(list(titles))
+                for artist in title_artists(parsed)
+            ]
+            column, column_counts = np.unique(
+                np.array(artist_ids, dtype=np.int64), return_counts=True
+            )
+            rows.append(column)
+            cols.append(np.full(len(column), col, dtype=np.int64))
+            counts.append(column_counts)
+        artists = list(artist_index)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        # Drop the artists of playlists that are gone.
+        used, rows = np.unique(rows, return_inverse=True)
+        return cls(
+            list(playlists),
+            [artists[index] for index in used],
+            rows,
+            np.concatenate(cols) if cols else np.empty(0, dtype=np.int64),
+            np.concatenate(counts) if counts else np.empty(0),
+            fingerprints,
+        )
+
+    @classmethod
+    def from_snapshots(cls, directory, cache_file=None):
+        """
+        From every playlist snapshot in `directory` (see snapshots.py). The
+        matrix is cached in `cache_file` (default: CACHE_NAME in the
+        directory) with the size and modification time of each snapshot, so
+        the next run only parses the titles of snapshots that changed.
+        """
+        cache_file = cache_file or os.path.join(directory, CACHE_NAME)
+        cached = cls.load(cache_file) if os.path.exists(cache_file) else None
+        playlists = {}
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            playlist_id = os.path.splitext(os.path.basename(path))[0]
+            stat = os.stat(path)
+            fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+            if (
+                cached is not None
+                and playlist_id in cached._playlist_index
+                and cached.fingerprints[cached._playlist_index[playlist_id]]
+                == fingerprint
+            ):
+                playlists[playlist_id] = (None, fingerprint)
+                continue
+            with open(path, "r", encoding="utf-8") as snapshot_file:
+                pages = json.load(snapshot_file)["pages"]
+            titles = [item["title"] for page in pages for item in page["items"]]
+            playlists[playlist_id] = (titles, fingerprint)
+        parsed = sum(titles is not None for titles, _ in playlists.values())
+        model = cls._build(playlists, cached)
+        if parsed or cached is None or len(cached) != len(model):
+            model.save(cache_file)
+        logger.info(
+            "Artist affinity: %d playlists, %d artists, %d parsed again.",
+            len(model),
+            len(model.artists),
+            parsed,
+        )
+        return model
+
+    def save(self, path):
+        """Write the matrix atomically, so a crash never leaves half a file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "wb") as cache:
+            np.savez(
+                cache,
+                playlists=np.array(self.playlists, dtype=str),
+                artists=np.array(self.artists, dtype=str),
+                rows=self.rows,
+                cols=self.cols,
+                counts=self.counts,
+                fingerprints=np.array(
+                    [fingerprint or "" for fingerprint in self.fingerprints], dtype=str
+                ),
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as cache:
+            return cls(
+                cache["playlists"].tolist(),
+                cache["artists"].tolist(),
+                cache["rows"],
+                cache["cols"],
+                cache["counts"],
+                [fingerprint or None for fingerprint in cache["fingerprints"].tolist()],
+            )
+
+    def profile(self, titles):
+        """
+        The column a playlist with `titles` would have, as a dense vector
+        over the artists. Artists the matrix does not know are left out.
+        """
+        artist_ids = [
+            self._artist_index[artist]
+            for parsed in parse_titles(list(titles))
+            for artist in title_artists(parsed)
+            if artist in self._artist_index
+        ]
+        counts = np.bincount(artist_ids, minlength=len(self.artists)).astype(float)
+        profile = np.zeros(len(self.artists))
+        present = counts > 0
+        profile[present] = (1 + np.log(counts[present])) * self._idf[present]
+        norm = np.linalg.norm(profile)
+        return profile / norm if norm else profile
+
+    def artist_scores(self, titles):
+        """Affinity of every artist to a playlist with `titles`."""
+        target = self.profile(titles)
+        similarity = np.bincount(
+            self.cols, weights=self.weights * target[self.rows], minlength=len(self)
+        )
+        return np.bincount(
+            self.rows,
+            weights=self.weights * similarity[self.cols],
+            minlength=len(self.artists),
+        )
+
+    def score_titles(self, titles, target_titles):
+        """
+        Affinity of each of `titles` to a playlist with `target_titles`: the
+        best score among the title's artists, 0 for unknown artists.
+        """
+        artist_scores = self.artist_scores(target_titles)
+        return [
+            max(
+                (
+                    artist_scores[self._artist_index[artist]]
+                    for artist in title_artists(parsed)
+                    if artist in self._artist_index
+                ),
+                default=0.0,
+            )
+            for parsed in parse_titles(list(titles))
+        ]
+
+    def rank(self, items, target_titles):
+        """
+        The playlist items (playlistItems resources) sorted by affinity to a
+        playlist with `target_titles`, best first. Ties keep their order.
+        """
+        scores = self.score_titles(
+            [item["snippet"]["title"] for item in items], target_titles
+        )
+        order = sorted(range(len(items)), key=lambda index: -scores[index])
+        return [items[index] for index in order]
@@ -0,0 +1,145 @@
+import csv
+import heapq
+import itertools
+import json
+import operator
+import os
+from collections import Counter
+
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from dataset import dataset_path
+from titles import parse_title, split_credits
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters counter (Metwally et al.) holding at most
+    `capacity` items. Any item seen more than total / capacity times is
+    kept, and a kept count overestimates the true one by at most
+    `errors[item]`. Same `update`/`most_common` interface as Counter.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        self._heap = []  # (count, item), with stale entries skipped lazily
+
+    def add(self, item, count=1):
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            victim, floor = self._pop_min()
+            del self.counts[victim], self.errors[victim]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item, count
+
+    def update(self, counts):
+        for item, count in counts.items():
+            self.add(item, count)
+
+    def most_common(self, n=None):
+        ranked = sorted(self.counts.items(), key=lambda pair: pair[1], reverse=True)
+        return ranked[:n]
+
+
+def iter_artist_counts(source, artist_column="Artist", chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yields Counters of raw artist credits from `source`, one per chunk of at
+    most `chunksize` rows (all of them if None). Rows are never kept, so
+    memory is bounded by the distinct credits of a chunk.
+
+    `source` is a dataset path (see dataset.py; its Feather column is counted
+    vectorized), a plain CSV file, or a playlist snapshot JSON (see
+    snapshots.py) whose titles are parsed for the artist.
+    Raises ValueError if `artist_column` is missing.
+    """
+    if source.endswith(".json"):
+        with open(source, "r", encoding="utf-8") as snapshot_file:
+            pages = json.load(snapshot_file)["pages"]
+        titles = (item["title"] for page in pages for item in page["items"])
+        artists = (parse_title(title).artist or "Unknown" for title in titles)
+        while counts := Counter(itertools.islice(artists, chunksize)):
+            yield counts
+
+    elif os.path.exists(dataset_path(source)):
+        try:
+            table = feather.read_table(
+                dataset_path(source), columns=[artist_column], memory_map=True
+            )
+        except ValueError:
+            raise ValueError(f"Column '{artist_column}' not found in {source}.")
+        for batch in table.to_batches(chunksize) if chunksize else [table]:
+            counts = pc.value_counts(batch.column(0))
+            yield Counter(
+                {
+                    value: count
+                    for value, count in zip(
+                        counts.field("values").to_pylist(),
+                        counts.field("counts").to_pylist(),
+                    )
+                    if value
+                }
+            )
+
+    else:
+        with open(source, "r", newline="", encoding="utf-8") as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, [])
+            try:
+                artist_index = header.index(artist_column)
+            except ValueError:
+                raise ValueError(f"Column '{artist_column}' not found in {source}.")
+            artists = map(operator.itemgetter(artist_index), reader)
+            while counts := Counter(itertools.islice(artists, chunksize)):
+                yield counts
+
+
+def count_artists(sources, artist_column="Artist", split=True, capacity=None):
+    """
+    Counts artists across every file in `sources` in a single pass each.
+    With `split`, a credit counts once for every artist it names (see
+    split_credits). With `capacity`, counting is approximate and memory
+    bounded by a SpaceSaving counter of that size instead of an exact Counter.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    totals = SpaceSaving(capacity) if capacity else Counter()
+    # Exact counts need a counter per distinct credit anyway; only the
+    # bounded mode pays for chunking.
+    chunksize = DEFAULT_CHUNKSIZE if capacity else None
+    for source in sources:
+        for raw_counts in iter_artist_counts(source, artist_column, chunksize):
+            if not split:
+                totals.update(raw_counts)
+                continue
+            counts = Counter()
+            for credit, count in raw_counts.items():
+                for name in split_credits(credit):
+                    counts[name] += count
+            totals.update(counts)
+    return totals
+
+
+def top_artists(sources, top_n=20, **kwargs):
+    """The `top_n` (artist, count) pairs across `sources`, most common first."""
+    return count_artists(sources, **kwargs).most_common(top_n)
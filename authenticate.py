@@ -1,14 +1,22 @@
 import os
-import json
-import google.auth
-import google.oauth2.credentials
-import google_auth_oauthlib.flow
-import googleapiclient.discovery
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import googleapiclient.errors
 from dotenv import load_dotenv
+import metrics
+from quota import cost_of
+import transport
 
 load_dotenv()
 
+# Only what the playlist code reads: playlist item ID, title and video ID. The
+# total count makes the first page change whenever items are added or removed.
+PLAYLIST_ITEM_FIELDS = (
+    "etag,nextPageToken,pageInfo/totalResults,"
+    "items(id,snippet/title,contentDetails/videoId)"
+)
+
 
 class YouTubeAPIManager:
     """
@@ -20,58 +28,232 @@ class YouTubeAPIManager:
         credentials_file=os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials.json"),
         token_file=os.getenv("GOOGLE_TOKEN_FILE", "token.json"),
         scopes=("https://www.googleapis.com/auth/youtube"),
+        max_in_flight=int(os.getenv("YOUTUBE_MAX_IN_FLIGHT", "8")),
+        http_factory=None,
+        cache=None,
+        quota=None,
+        in_flight=None,
     ):
         self.credentials_file = credentials_file
         self.token_file = token_file
         self.scopes = scopes
-        self.credentials = None
+        self.authorized_session = None
         self.youtube = None
+        self.max_in_flight = max_in_flight
+        self.http_factory = http_factory
+        self.cache = cache
+        self.quota = quota
+        # Caps the requests on the wire, whichever thread sends them; managers
+        # passed the same semaphore share one limit.
+        self.in_flight = in_flight or threading.BoundedSemaphore(max(max_in_flight, 1))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
 
     def authenticate(self):
         """
-        Authenticate the user with OAuth 2.0 and refresh the token if expired.
+        Authenticate the user with OAuth 2.0. Managers with the same token
+        file and scopes share one transport.AuthorizedSession: only the first
+        loads the credentials and builds the service, from the discovery
+        document bundled with googleapiclient. The token is refreshed
+        proactively, before it expires, and every manager sends its requests
+        over the process's pool of keep-alive connections.
+        """
+        self.authorized_session = transport.get_session(
+            self.token_file, self.scopes, self.credentials_file
+        )
+        self.youtube = self.authorized_session.youtube
+
+    @property
+    def credentials(self):
+        if self.authorized_session is None:
+            return None
+        return self.authorized_session.credentials
+
+    def _thread_http(self):
+        """
+        Returns the HTTP connection to send the calling thread's requests
+        over. The session's pooled connection is safe to share; one from
+        `http_factory` is not, so every worker thread builds its own.
+        """
+        if self.http_factory is None:
+            if self.authorized_session is None:
+                return None
+            return self.authorized_session.http
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = self.http_factory()
+        return http
+
+    def execute(self, request):
+        """
+        Executes an API request on the calling thread's own HTTP connection.
+        When a ResponseCache is set, GET requests are served from it and
+        any mutation invalidates the cached playlist pages. Requests that do
+        reach the network are metered by `quota`, if set.
+        While metrics are enabled, the latency of every call is recorded.
+        """
+        if not metrics.registry.enabled:
+            return self._execute(request)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = self._execute(request)
+            status = "ok"
+            return response
+        finally:
+            metrics.registry.observe(
+                "youtube_api_request_seconds",
+                time.perf_counter() - start,
+                method=metrics.request_method(request),
+                status=status,
+            )
+
+    def _execute(self, request):
+        if self.cache is None:
+            return self._send(request)
+        if getattr(request, "method", None) != "GET":
+            try:
+                return self._send(request)
+            finally:
+                self.cache.invalidate("playlistItems")
+        return self._execute_cached(request)
+
+    def _send(self, request):
+        """
+        Sends a request over the network, through the QuotaMeter if one is set.
+        """
+        if self.quota is None:
+            return self._transport(request)
+        return self.quota.run(request, self._transport)
+
+    def _transport(self, request):
+        http = self._thread_http()
+        if metrics.registry.enabled:
+            method = metrics.request_method(request)
+            metrics.registry.inc(
+                "youtube_api_quota_units_total", cost_of(request), method=method
+            )
+            if http is None:  # a batch takes the http of its first part
+                first = next(iter(getattr(request, "_requests", {}).values()), request)
+                http = first.http
+            http = metrics.MeteredHttp(http, method)
+        with self.in_flight:
+            if http is None:
+                return request.execute()
+            return request.execute(http=http)
+
+    def _execute_cached(self, request):
+        """
+        Serves fresh entries straight from the cache and revalidates stale
+        ones with If-None-Match, reusing the cached body on a 304.
         """
-        if os.path.exists(self.token_file):
-            with open(self.token_file, "r", encoding="utf-8") as token:
-                info = json.load(token)
-                self.credentials = (
-                    google.oauth2.credentials.Credentials.from_authorized_user_info(
-                        info, self.scopes
-                    )
+        cached = self.cache.lookup(request)
+        if cached is not None:
+            body, etag, fresh = cached
+            if fresh:
+                self.cache.count("hits")
+                return body
+            if etag:
+                request.headers["If-None-Match"] = etag
+        try:
+            response = self._send(request)
+        except googleapiclient.errors.HttpError as e:
+            if cached is not None and e.resp.status == 304:
+                self.cache.count("revalidated")
+                self.cache.touch(request)
+                return cached[0]
+            raise
+        finally:
+            request.headers.pop("If-None-Match", None)
+        self.cache.count("misses")
+        self.cache.store(request, response)
+        return response
+
+    def iter_playlist_pages(self, playlist_id, fields=PLAYLIST_ITEM_FIELDS):
+        """
+        Yields the items of a playlist one page (up to 50 items) at a time.
+        Only `fields` are requested; pass fields=None for full items.
+        """
+        page_token = None
+        while True:
+            request = self.youtube.playlistItems().list(
+                part="snippet,contentDetails",
+                playlistId=playlist_id,
+                maxResults=50,  # Max is 50 per request
+                pageToken=page_token,
+                fields=fields,
+            )
+            response = self.execute(request)
+            yield response.get("items", [])
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+    def iter_playlist_items(self, playlist_id, fields=PLAYLIST_ITEM_FIELDS):
+        """
+        Yields the items of a playlist as pages arrive, so callers can start
+        working before pagination finishes.
+        """
+        for page in self.iter_playlist_pages(playlist_id, fields):
+            yield from page
+
+    def submit(self, func, *args):
+        """
+        Starts `func(*args)` on the worker pool and returns its Future.
+        Runs inline, returning a finished Future, when concurrency is off or
+        when called from inside a worker.
+        """
+        if self.max_in_flight > 1 and not getattr(self._local, "in_worker", False):
+            return self._get_executor().submit(func, *args)
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_in_flight,
+                    thread_name_prefix=type(self).__name__,
+                    initializer=self._mark_worker,
                 )
+            return self._executor
 
-            if (
-                self.credentials
-                and self.credentials.expired
-                and self.credentials.refresh_token
-            ):
-                try:
-                    self.credentials.refresh(google.auth.transport.requests.Request())
-                    with open(self.token_file, "w", encoding="utf-8") as token:
-                        token.write(self.credentials.to_json())
-                    print("Token refreshed successfully.")
-                except Exception as e:
-                    print(f"Error refreshing token: {e}")
-                    self._run_auth_flow()
-            elif not self.credentials.valid:
-                self._run_auth_flow()
-        else:
-            self._run_auth_flow()
-
-        # Build the YouTube service
-        self.youtube = googleapiclient.discovery.build(
-            "youtube", "v3", credentials=self.credentials
-        )
+    def _mark_worker(self):
+        self._local.in_worker = True
 
-    def _run_auth_flow(self):
+    def map_concurrent(self, func, iterable):
         """
-        Runs the OAuth 2.0 flow and saves new credentials to the token file.
+        Calls `func` on every item with at most `max_in_flight` calls running
+        at once and returns the results in input order.
+        Called from inside a worker it runs serially, so nested use cannot
+        deadlock the pool.
         """
-        flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
-            self.credentials_file, self.scopes
-        )
-        self.credentials = flow.run_local_server(port=0)
+        items = list(iterable)
+        if (
+            self.max_in_flight <= 1
+            or len(items) <= 1
+            or getattr(self._local, "in_worker", False)
+        ):
+            return [func(item) for item in items]
+        return list(self._get_executor().map(func, items))
+
+    def execute_all(self, requests):
+        """
+        Executes independent API requests concurrently, returning the responses
+        in request order. The first HttpError raised is propagated.
+        """
+        return self.map_concurrent(self.execute, requests)
 
-        with open(self.token_file, "w", encoding="utf-8") as token:
-            token.write(self.credentials.to_json())
-        print("New token obtained and saved.")
+    def close(self):
+        """
+        Shuts down the worker pool, if one was started.
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
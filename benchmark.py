@@ -0,0 +1,862 @@
+"""
+Offline benchmarks for the API-heavy code paths.
+
+Every benchmark runs the real managers against the in-memory fake from
+`fake_youtube.py`, counting API calls and measuring wall time.
+
+Run with: python benchmark.py
+"""
+
+import contextlib
+import csv
+import gc
+import io
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httplib2
+import pandas as pd
+
+from fake_youtube import (
+    FakeYouTubeHttp,
+    build_client,
+    seed_playlist,
+    self_signed_certificate,
+    serve,
+)
+from affinity import ArtistAffinity
+from artists import count_artists
+from catalog import PlaylistCatalog
+from charts import BarChart, ChartRenderer, render_charts
+from cleaning import clean_csv
+from dataset import load_dataset, save_dataset
+from dedup import find_duplicates, jaccard, song_key, _shingles
+from manager import PlaylistManager
+import metrics
+from orchestrator import Orchestrator
+from quota import estimate_cost
+from reorder import plan_moves
+from response_cache import ResponseCache
+from snapshots import PlaylistSnapshotStore, sync_playlist
+from stats_history import StatsHistory
+from titles import parse_title, parse_titles, split_credits
+from transport import ConnectionPool, PooledHttp
+from new_releases import AutomateNew
+from Video_stats import YouTubePlaylistManager
+
+BENCH_PLAYLIST_ID = "PLbenchmark"
+
+
+def _timed(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+
+def _report(name, calls, seconds):
+    print(f"{name:<48} {calls:>8} calls {seconds * 1000:>10.1f} ms")
+
+
+def bench_video_statistics(sizes=(1_000, 10_000)):
+    """Per-video videos.list calls versus 50-ID batches."""
+    for size in sizes:
+        fake = FakeYouTubeHttp()
+        seed_playlist(fake, BENCH_PLAYLIST_ID, size, deleted_every=100)
+        manager = YouTubePlaylistManager()
+        manager.youtube = build_client(fake)
+        video_ids = [item["videoId"] for item in fake.playlists[BENCH_PLAYLIST_ID]]
+
+        _, seconds = _timed(lambda: [manager.get_video_statistics(v) for v in video_ids])
+        _report(f"statistics, one call per video ({size})", fake.calls.total(), seconds)
+
+        fake.calls.clear()
+        _, seconds = _timed(manager.get_videos_statistics, video_ids)
+        _report(f"statistics, batched by 50 ({size})", fake.calls.total(), seconds)
+
+
+def bench_concurrent_statistics(size=5_000, latency=0.02, limits=(1, 4, 16)):
+    """Statistics throughput over a local HTTP server with injected latency."""
+    fake = FakeYouTubeHttp(latency=latency)
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size)
+    server = serve(fake)
+    video_ids = [item["videoId"] for item in fake.playlists[BENCH_PLAYLIST_ID]]
+    try:
+        for limit in limits:
+            manager = YouTubePlaylistManager(
+                max_in_flight=limit, http_factory=httplib2.Http
+            )
+            manager.youtube = build_client(httplib2.Http(), server.url)
+            fake.calls.clear()
+            _, seconds = _timed(manager.get_videos_statistics, video_ids)
+            _report(
+                f"statistics, max_in_flight={limit} ({size}, {latency * 1000:.0f} ms)",
+                fake.calls.total(),
+                seconds,
+            )
+            print(f"{'':<48} {fake.calls.total() / seconds:>8.1f} requests/s")
+            manager.close()
+    finally:
+        server.shutdown()
+
+
+def bench_connection_pool(requests=200, workers=8):
+    """
+    Per-request latency over a local TLS stand-in of the API: a new
+    connection per request, with a TCP and TLS handshake each time, versus
+    the shared keep-alive ConnectionPool, from one thread and from several.
+    """
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, 50)
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = self_signed_certificate(directory)
+        server = serve(fake, certificate=certificate)
+
+        def connect():
+            return httplib2.Http(ca_certs=certificate[0])
+
+        client = build_client(connect(), server.url)
+        pooled = PooledHttp(ConnectionPool(connect))
+
+        def first_page(http):
+            return client.playlistItems().list(
+                part="snippet", playlistId=BENCH_PLAYLIST_ID, maxResults=50
+            ).execute(http=http)
+
+        cases = [
+            ("cold, new connection per request", lambda: first_page(connect()), 1),
+            ("pooled", lambda: first_page(pooled), 1),
+            (f"pooled, {workers} threads", lambda: first_page(pooled), workers),
+        ]
+        try:
+            for name, send, threads in cases:
+                latencies = []
+
+                def timed_request(_):
+                    start = time.perf_counter()
+                    send()
+                    latencies.append(time.perf_counter() - start)
+
+                connections = server.connections
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as executor:
+                    list(executor.map(timed_request, range(requests)))
+                seconds = time.perf_counter() - start
+                latencies.sort()
+                mean = sum(latencies) / len(latencies)
+                p95 = latencies[int(len(latencies) * 0.95)]
+                print(
+                    f"{f'TLS request, {name}':<48} {mean * 1000:>8.2f} ms mean"
+                    f" {p95 * 1000:>8.2f} ms p95"
+                    f" {server.connections - connections:>6} connections"
+                )
+                print(f"{'':<48} {requests / seconds:>8.1f} requests/s")
+        finally:
+            server.shutdown()
+
+
+def bench_batched_inserts(size=500, latency=0.005):
+    """One insert request per song versus multipart batches of 50."""
+    fake = FakeYouTubeHttp(latency=latency)
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size)
+    fake.playlists["PLtarget"] = []
+    automate_new = AutomateNew()
+    automate_new.youtube = build_client(fake)
+    video_ids = [item["videoId"] for item in fake.playlists[BENCH_PLAYLIST_ID]]
+
+    _, seconds = _timed(
+        lambda: [automate_new.add_song_to_playlist("PLtarget", v) for v in video_ids]
+    )
+    _report(f"inserts, one request per song ({size})", fake.calls.total(), seconds)
+
+    fake.calls.clear()
+    _, seconds = _timed(automate_new.add_songs_to_playlist, "PLtarget", video_ids)
+    _report(
+        f"inserts, batched by 50 ({size})", fake.calls["batch.post"], seconds
+    )
+
+
+def bench_remove_deleted_videos(size=2_000, deleted_every=20):
+    """API calls to clean up deleted videos: re-fetch per video versus one pass."""
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size, deleted_every)
+    playlist_manager = PlaylistManager()
+    playlist_manager.youtube = build_client(fake)
+    deleted = [
+        item["videoId"]
+        for item in fake.playlists[BENCH_PLAYLIST_ID]
+        if item["title"] == "Deleted video"
+    ]
+
+    _, seconds = _timed(
+        lambda: [
+            playlist_manager.remove_video_from_playlist(BENCH_PLAYLIST_ID, video_id)
+            for video_id in deleted
+        ]
+    )
+    _report(f"cleanup, re-fetch per video ({size})", fake.calls.total(), seconds)
+
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size, deleted_every)
+    playlist_manager.youtube = build_client(fake)
+    _, seconds = _timed(playlist_manager.remove_deleted_videos, BENCH_PLAYLIST_ID)
+    _report(
+        f"cleanup, single pass ({size})",
+        fake.calls["playlistItems.get"] + fake.calls["batch.post"],
+        seconds,
+    )
+
+
+def bench_response_cache(size=5_000, runs=3):
+    """Repeated playlist fetches with a fresh, then stale (revalidated) cache."""
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(os.path.join(tmp, "cache.sqlite"))
+        playlist_manager = PlaylistManager(cache=cache)
+        playlist_manager.youtube = build_client(fake)
+        for ttl in (300, 0):
+            cache.ttls["playlistItems"] = ttl
+            for run in range(runs):
+                fake.calls.clear()
+                _, seconds = _timed(
+                    playlist_manager.get_playlist_items, BENCH_PLAYLIST_ID
+                )
+                _report(
+                    f"playlist fetch, cache ttl={ttl}s run {run + 1} ({size})",
+                    fake.calls.total(),
+                    seconds,
+                )
+        print(f"{'':<48} {cache.stats()}")
+        cache.close()
+
+
+def bench_incremental_sync(size=5_000):
+    """Snapshot sync requests: first run, no change, and one removed item."""
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size)
+    playlist_manager = PlaylistManager()
+    playlist_manager.youtube = build_client(fake)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PlaylistSnapshotStore(tmp)
+        remove_last = fake.playlists[BENCH_PLAYLIST_ID].pop
+        runs = [
+            ("first sync", lambda: None, False),
+            ("unchanged", lambda: None, False),
+            ("one item removed, full", remove_last, True),
+        ]
+        for name, change, full in runs:
+            change()
+            diff, seconds = _timed(
+                sync_playlist, playlist_manager, BENCH_PLAYLIST_ID, store, full
+            )
+            _report(f"snapshot sync, {name} ({size})", diff.requests, seconds)
+
+
+def bench_streaming_pager(size=5_000):
+    """Payload bytes and peak memory: full items in a list versus the stream."""
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size)
+    playlist_manager = PlaylistManager()
+    playlist_manager.youtube = build_client(fake)
+
+    def full_list():
+        return list(playlist_manager.iter_playlist_items(BENCH_PLAYLIST_ID, None))
+
+    def projected_stream():
+        count = 0
+        for _ in playlist_manager.iter_playlist_items(BENCH_PLAYLIST_ID):
+            count += 1
+        return count
+
+    runs = [("full items, list", full_list), ("fields=, stream", projected_stream)]
+    for name, func in runs:
+        fake.bytes_sent = 0
+        tracemalloc.start()
+        _, seconds = _timed(func)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _report(f"playlist pager, {name} ({size})", size // 50, seconds)
+        print(
+            f"{'':<48} {fake.bytes_sent / 1024:>8.0f} KiB payload"
+            f" {peak / 1024:>8.0f} KiB peak memory"
+        )
+
+
+def bench_new_song_discovery(source_size=10_000, target_size=200):
+    """Requests to find 5 new songs: full downloads versus early exit."""
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, source_size)
+    seed_playlist(fake, "PLtarget", target_size)
+    automate_new = AutomateNew()
+    automate_new.youtube = build_client(fake)
+
+    def full_download():
+        known = {
+            item["contentDetails"]["videoId"]
+            for item in automate_new.get_playlist_items("PLtarget")
+        }
+        source = automate_new.get_playlist_items(BENCH_PLAYLIST_ID)
+        return [i for i in source if i["contentDetails"]["videoId"] not in known][:5]
+
+    _, seconds = _timed(full_download)
+    _report(f"discovery, full downloads ({source_size})", fake.calls.total(), seconds)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        automate_new.snapshot_store = PlaylistSnapshotStore(tmp)
+        automate_new.get_playlist_video_ids("PLtarget")  # previous run's snapshot
+        fake.calls.clear()
+        _, seconds = _timed(
+            automate_new.add_new_songs, BENCH_PLAYLIST_ID, "PLtarget", 5, True
+        )
+        _report(f"discovery, early exit ({source_size})", fake.calls.total(), seconds)
+
+
+def _traced(build):
+    """Memory still held by what `build()` returns, as traced by tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, size
+
+
+def bench_catalog(size=100_000):
+    """
+    Memory of a playlist held as decoded playlistItems dicts plus the old
+    video ID -> item IDs index, versus a PlaylistCatalog, and lookup time.
+    """
+    payload = json.dumps(
+        [
+            {
+                "id": f"{BENCH_PLAYLIST_ID}-{index}",
+                "snippet": {"title": f"Artist {index % 97} - Song {index}"},
+                "contentDetails": {"videoId": f"{BENCH_PLAYLIST_ID}v{index:06d}"},
+            }
+            for index in range(size)
+        ]
+    )
+
+    def dicts():
+        items = json.loads(payload)
+        index = {}
+        for item in items:
+            index.setdefault(item["contentDetails"]["videoId"], []).append(item["id"])
+        return items, index
+
+    def catalog():
+        return PlaylistCatalog.from_api_items(json.loads(payload))
+
+    (items, index), dict_bytes = _traced(dicts)
+    videos, catalog_bytes = _traced(catalog)
+    held = [("list of dicts + index", dict_bytes), ("catalog", catalog_bytes)]
+    for name, held in held:
+        print(f"{f'playlist in memory, {name} ({size})':<48} {held / 2**20:>8.1f} MiB")
+
+    video_ids = [item["contentDetails"]["videoId"] for item in items]
+    _, seconds = _timed(lambda: [videos.get(video_id).title for video_id in video_ids])
+    _report(f"catalog lookups by video ID ({size})", 0, seconds)
+    _, seconds = _timed(videos.by_artist, "Artist 0")
+    _report(f"catalog artist index, titles parsed ({size})", 0, seconds)
+    _, seconds = _timed(lambda: [videos.by_artist(f"artist {i}") for i in range(97)])
+    _report(f"catalog lookups by artist (97 x {size // 97})", 0, seconds)
+
+
+def _dedup_titles(size):
+    """`size` titles, about two uploads per song, with the usual variants."""
+    generator = random.Random(0)
+    suffixes = ["", " (Official Video)", " (Lyrics)", " [Audio]", " (with Aqua)"]
+    titles = []
+    for index in range(size):
+        song = generator.randrange(size // 2)
+        title = f"Artist {song % 997} - Song title {song:06d}"
+        if index % 10 == 0:
+            title = title.replace("title", "ttle")  # a typo, for the LSH pass
+        titles.append((index, title + generator.choice(suffixes)))
+    return titles
+
+
+def _all_pairs_duplicates(entries, threshold=0.8):
+    """The baseline: every pair of titles compared."""
+    keys = [(entry_id, song_key(title)) for entry_id, title in entries]
+    shingles = {key: _shingles(key.song) for _, key in keys}
+    pairs = 0
+    for i, (_, key) in enumerate(keys):
+        for _, other in keys[i + 1 :]:
+            if key.artists == other.artists and (
+                key == other or jaccard(shingles[key], shingles[other]) >= threshold
+            ):
+                pairs += 1
+    return pairs
+
+
+def bench_dedup(size=100_000, baseline_size=5_000):
+    """All-pairs title comparison versus the MinHash-LSH DuplicateIndex."""
+    titles = _dedup_titles(size)
+    _, seconds = _timed(_all_pairs_duplicates, titles[:baseline_size])
+    _report(f"duplicates, all pairs ({baseline_size})", 0, seconds)
+    song_key.cache_clear()
+    _, seconds = _timed(find_duplicates, titles[:baseline_size])
+    _report(f"duplicates, MinHash-LSH ({baseline_size})", 0, seconds)
+    song_key.cache_clear()
+    groups, seconds = _timed(find_duplicates, titles)
+    _report(f"duplicates, MinHash-LSH ({size}, {len(groups)} songs)", 0, seconds)
+
+
+def bench_reorder(size=5_000):
+    """
+    Moves to sort a playlist: minimal moves (every item off the longest
+    ordered run, once) versus re-inserting every item, which takes a delete
+    and an insert per item.
+    """
+    generator = random.Random(0)
+    target = [f"{BENCH_PLAYLIST_ID}-{index}" for index in range(size)]
+    displaced = target[:]
+    for _ in range(size // 100):
+        item_id = displaced.pop(generator.randrange(size))
+        displaced.insert(generator.randrange(size), item_id)
+    appended = sorted(target[: size // 10], key=lambda _: generator.random())
+    appended = target[size // 10 :] + appended
+    shuffled = generator.sample(target, size)
+    scenarios = [("1% moved", displaced), ("10% appended", appended)]
+    scenarios.append(("shuffled", shuffled))
+    naive_units = estimate_cost({"delete": size, "insert": size})
+    for name, current in scenarios:
+        moves, seconds = _timed(plan_moves, current, target)
+        _report(f"reorder {name}, minimal moves ({size})", len(moves), seconds)
+        units = estimate_cost({"update": len(moves)})
+        print(f"{'':<48} {units:>8} units, reinserting all: {naive_units}")
+
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size)
+    items = fake.playlists[BENCH_PLAYLIST_ID]
+    by_id = {item["id"]: item for item in items}
+    items[:] = [by_id[item_id] for item_id in displaced]
+    playlist_manager = PlaylistManager()
+    playlist_manager.youtube = build_client(fake)
+    summary, seconds = _timed(
+        playlist_manager.reorder_playlist, BENCH_PLAYLIST_ID, "added"
+    )
+    calls = fake.calls.total()
+    _report(f"reorder_playlist, fake API, 1% moved ({size})", calls, seconds)
+
+
+def bench_artist_affinity(playlists=300, size=500, candidates=5_000, pick=25):
+    """
+    Builds the artist x playlist matrix of `playlists` snapshots of 10
+    scenes, cold, from its cache, and with one snapshot changed, then ranks
+    new songs for a playlist of one scene. Reports how many of the top
+    `pick` are from that scene, against the first `pick` found.
+    """
+    generator = random.Random(0)
+    directory = tempfile.mkdtemp()
+    store = PlaylistSnapshotStore(directory)
+    for number in range(playlists):
+        scene = number % 10 * 150
+        items = [
+            {
+                "id": f"PL{number}-{index}",
+                "video_id": f"v{index}",
+                "title": f"Artist {scene + generator.randrange(150)} - Song {index}",
+            }
+            for index in range(size)
+        ]
+        store.save(f"PL{number}", {"pages": [{"items": items}]})
+    total = playlists * size
+    model, seconds = _timed(ArtistAffinity.from_snapshots, directory)
+    _report(f"artist affinity, cold ({total} songs)", 0, seconds)
+    model, seconds = _timed(ArtistAffinity.from_snapshots, directory)
+    _report(f"artist affinity, cached ({total} songs)", 0, seconds)
+    os.utime(os.path.join(directory, "PL0.json"))
+    model, seconds = _timed(ArtistAffinity.from_snapshots, directory)
+    _report(f"artist affinity, one changed ({total} songs)", 0, seconds)
+
+    # The target knows a third of its scene's artists.
+    target = [
+        f"Artist {generator.randrange(50)} - Old {index}" for index in range(size)
+    ]
+    items = [
+        {"snippet": {"title": f"Artist {generator.randrange(1500)} - New {index}"}}
+        for index in range(candidates)
+    ]
+    ranked, seconds = _timed(model.rank, items, target)
+    _report(f"artist affinity, rank ({candidates} songs)", 0, seconds)
+
+    def in_scene(picked):
+        return sum(int(item["snippet"]["title"].split()[1]) < 150 for item in picked)
+
+    print(
+        f"{'':<48} top {pick}: {in_scene(ranked[:pick])} in scene,"
+        f" first {pick}: {in_scene(items[:pick])}"
+    )
+
+
+def _legacy_clean_stats(input_csv, output_csv):
+    """The original project.clean_stats, kept as the cleaning baseline."""
+
+    def clean_text(text):
+        text = text.lower()
+        text = re.sub(r"\[.*?\]|\(.*?\)|\{.*?\}", "", text)
+        words_to_remove = ["official", "music", "video", "lyrics"]
+        text = re.sub(
+            r"\b(?:" + "|".join(words_to_remove) + r")\b", "", text, flags=re.IGNORECASE
+        )
+        return " ".join(text.split())
+
+    with open(input_csv, "r", newline="", encoding="utf-8") as input_file, open(
+        output_csv, "w", newline="", encoding="utf-8"
+    ) as output_file:
+        reader = csv.reader(input_file)
+        writer = csv.writer(output_file)
+        writer.writerow(next(reader))
+        for row in reader:
+            writer.writerow([clean_text(cell) for cell in row])
+
+
+def bench_cleaning(rows=1_000_000):
+    """clean_stats on a synthetic playlist_data-style CSV."""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_csv = os.path.join(tmp, "playlist_data.csv")
+        with open(input_csv, "w", newline="", encoding="utf-8") as input_file:
+            writer = csv.writer(input_file)
+            writer.writerow(["Title", "Video ID", "Artist", "Song"])
+            for index in range(rows):
+                artist, song = f"Artist {index % 997}", f"Song {index}"
+                writer.writerow(
+                    [
+                        f"{artist} - {song} (Official Music Video) [HD]",
+                        f"vId{index:08d}",
+                        artist,
+                        f"{song} (Lyrics)",
+                    ]
+                )
+        output_csv = os.path.join(tmp, "clean.csv")
+
+        engines = [
+            ("legacy", lambda: _legacy_clean_stats(input_csv, output_csv)),
+            ("csv engine", lambda: clean_csv(input_csv, output_csv)),
+            ("pandas engine", lambda: clean_csv(input_csv, output_csv, "pandas")),
+        ]
+        for name, func in engines:
+            _, seconds = _timed(func)
+            _report(f"clean_stats, {name} ({rows} rows)", 0, seconds)
+
+
+def bench_dataset_load(rows=1_000_000):
+    """Loading 1M rows of stats from the CSV export vs the Feather dataset."""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "playlist_stats.csv")
+        save_dataset(
+            pd.DataFrame(
+                {
+                    "Title": [f"Artist {i % 997} - Song {i}" for i in range(rows)],
+                    "Artist": [f"Artist {i % 997}" for i in range(rows)],
+                    "Views": range(0, rows * 1000, 1000),
+                    "Likes": range(0, rows * 10, 10),
+                    "Fetched At": pd.Timestamp.now(tz="UTC"),
+                }
+            ),
+            csv_path,
+        )
+
+        loaders = [
+            ("CSV, all columns", lambda: pd.read_csv(csv_path)),
+            ("CSV, Artist only", lambda: pd.read_csv(csv_path, usecols=["Artist"])),
+            ("Feather, all columns", lambda: load_dataset(csv_path)),
+            ("Feather, Artist only", lambda: load_dataset(csv_path, ["Artist"])),
+        ]
+        for name, func in loaders:
+            _, seconds = _timed(func)
+            _report(f"load {rows} rows, {name}", 0, seconds)
+
+
+def bench_stats_history(videos=10_000, days=365):
+    """
+    Hourly 10k-video snapshots for a year, compacted daily; the 7-day growth
+    query is timed as the history grows.
+    """
+    start = pd.Timestamp("2024-01-01", tz="UTC")
+    checkpoints = {7, 30, 90, 180, days}
+    with tempfile.TemporaryDirectory() as tmp:
+        history = StatsHistory(tmp)
+        append_seconds = 0.0
+        for day in range(1, days + 1):
+            stats = {
+                f"v{index:05d}": {"views": index * day, "likes": index}
+                for index in range(videos)
+            }
+            for hour in range(24):
+                fetched_at = start + pd.Timedelta(hours=(day - 1) * 24 + hour)
+                _, seconds = _timed(history.append, stats, fetched_at)
+                append_seconds += seconds
+            history.compact(now=fetched_at)
+            if day in checkpoints:
+                _, seconds = _timed(history.growth, 7, fetched_at)
+                _report(f"7-day growth query after {day} days", 0, seconds)
+        appends = days * 24
+        _report(f"append snapshot of {videos} videos", 0, append_seconds / appends)
+
+def _legacy_common_artists(csv_file, artist_column="Artist"):
+    """The original list-then-Counter count, kept for comparison."""
+    artists = []
+    with open(csv_file, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        artist_index = next(reader).index(artist_column)
+        for row in reader:
+            artists.append(row[artist_index])
+    return Counter(artists)
+
+
+def bench_common_artists(rows=1_000_000, artists=50_000):
+    """
+    Top artists of 1M rows drawn from 50k credits, a third of them naming
+    several artists, per counting path.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "playlist_data.csv")
+        pool = [
+            f"Artist {i}, Artist {i % 97} ft. Artist {i % 13}" if i % 3 == 0 else f"Artist {i}"
+            for i in range(artists)
+        ]
+        credits = [pool[(i * 7919) % artists] for i in range(rows)]
+        pd.DataFrame({"Title": "t", "Artist": credits}).to_csv(csv_path, index=False)
+        dataset_csv = os.path.join(tmp, "dataset.csv")
+        save_dataset(pd.DataFrame({"Artist": credits}), dataset_csv, export_csv=False)
+
+        runs = [
+            ("legacy list + Counter", lambda: _legacy_common_artists(csv_path)),
+            ("CSV stream, exact", lambda: count_artists(csv_path)),
+            ("Feather, exact", lambda: count_artists(dataset_csv)),
+            ("CSV, Space-Saving 1000", lambda: count_artists(csv_path, capacity=1000)),
+        ]
+        for name, func in runs:
+            _, seconds = _timed(func)
+            tracemalloc.start()  # traced separately, it slows allocation-heavy code
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            _report(f"common artists, {name}", 0, seconds)
+            print(f"{'':<48} {peak / 1024 / 1024:>8.1f} MiB peak memory")
+
+
+def _legacy_parse_video_title(title):
+    """The original split-on-the-first-hyphen parser, kept for comparison."""
+    if "-" in title:
+        artist, song = title.split("-", 1)
+        return artist.strip(), song.strip()
+    return None, title.strip()
+
+
+def bench_title_parser(rows=200_000):
+    """
+    Artist accuracy on title_corpus.csv, then throughput on `rows` titles,
+    all distinct (cold) and drawn from the corpus (repeats hit the cache).
+    """
+    corpus = pd.read_csv("title_corpus.csv", dtype=str, keep_default_na=False)
+    for name, artists_of in [
+        ("legacy", lambda t: split_credits(_legacy_parse_video_title(t)[0] or "")),
+        ("titles.parse_title", lambda t: parse_title(t).artists),
+    ]:
+        correct = sum(
+            "; ".join(artists_of(title)) == expected
+            for title, expected in zip(corpus["Title"], corpus["Artists"])
+        )
+        print(f"{'artist accuracy, ' + name:<48} {correct:>5} of {len(corpus)}")
+
+    titles = list(corpus["Title"]) * (rows // len(corpus) + 1)
+    distinct = [f"{title} {index}" for index, title in enumerate(titles[:rows])]
+    repeated = list(corpus["Title"]) * (rows // len(corpus))
+    runs = [
+        ("legacy split", lambda: [_legacy_parse_video_title(t) for t in distinct]),
+        ("parse_title, distinct", lambda: [parse_title(t) for t in distinct]),
+        ("parse_titles, repeated", lambda: parse_titles(repeated)),
+    ]
+    for name, func in runs:
+        parse_title.cache_clear()
+        _, seconds = _timed(func)
+        _report(f"title parser, {name} ({rows // 1000}k)", 0, seconds)
+
+
+def bench_chart_rendering(files=16):
+    """
+    The four 10-bar statistics charts rendered with a new figure each time
+    versus a reused one, then `files` chart files serially versus in a pool.
+    """
+    charts = [
+        BarChart(f"Chart {n}", [f"Video {i}" for i in range(10)], range(10, 0, -1))
+        for n in range(4)
+    ]
+    for name, make_renderer in [
+        ("new figure per render", ChartRenderer),
+        ("reused figure", lambda renderer=ChartRenderer(): renderer),
+    ]:
+        make_renderer().render(charts, ncols=2)  # warm-up: font cache, imports
+        _, seconds = _timed(
+            lambda: [make_renderer().render(charts, ncols=2) for _ in range(10)]
+        )
+        _report(f"charts, 4x10 bars, {name} (x10)", 0, seconds)
+
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = [
+            (charts, os.path.join(directory, f"{index}.png"), {"ncols": 2})
+            for index in range(files)
+        ]
+        renderer = ChartRenderer()
+        _, seconds = _timed(lambda: [renderer.render(c, p, **k) for c, p, k in jobs])
+        _report(f"charts, {files} files, serial", 0, seconds)
+        _, seconds = _timed(render_charts, jobs)
+        _report(f"charts, {files} files, process pool", 0, seconds)
+
+
+STARTUP_TARGET_MS = 100  # `import project`, up to the menu
+
+
+def _import_time(modules):
+    """
+    Time to import `modules` in a fresh interpreter, in seconds, from
+    `python -X importtime` (interpreter startup itself is not counted).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    microseconds = 0
+    for line in result.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        # Top-level imports have a single space before the name.
+        if name[1:] in modules:
+            microseconds += int(cumulative)
+    return microseconds / 1e6
+
+
+def bench_startup():
+    """
+    CLI startup with `python -X importtime`: project.py alone (everything
+    the menu needs) versus every feature module, as it used to load them.
+    """
+    features = [
+        "Video_stats",
+        "manager",
+        "new_releases",
+        "cleaning",
+        "charts",
+        "artists",
+        "stats_history",
+    ]
+    lazy = _import_time(["project"])
+    _report("startup, import project (lazy)", 0, lazy)
+    _report("startup, every feature module (eager)", 0, _import_time(features))
+    verdict = "ok" if lazy * 1000 <= STARTUP_TARGET_MS else "OVER TARGET"
+    print(f"{'startup target':<48} {STARTUP_TARGET_MS:>8} ms   {verdict}")
+
+
+def bench_orchestrator(counts=(1, 10, 50), size=200, latency=0.01):
+    """
+    Syncing 1 to 50 playlists of one account over the fake HTTP server,
+    one worker versus a pool of 8.
+    """
+    fake = FakeYouTubeHttp(latency=latency)
+    for index in range(max(counts)):
+        seed_playlist(fake, f"PLorch{index}", size)
+    server = serve(fake)
+
+    def connect(api_manager):
+        api_manager.http_factory = httplib2.Http
+        api_manager.youtube = build_client(httplib2.Http(), server.url)
+
+    try:
+        for count in counts:
+            for workers in (1, 8):
+                with tempfile.TemporaryDirectory() as directory:
+                    manifest = {
+                        "checkpoint": os.path.join(directory, "checkpoint.json"),
+                        "accounts": [
+                            {
+                                "name": "bench",
+                                "data_dir": directory,
+                                "playlists": [f"PLorch{i}" for i in range(count)],
+                                "workers": workers,
+                                "cache": False,
+                            }
+                        ],
+                    }
+                    fake.calls.clear()
+                    summary, seconds = _timed(Orchestrator(manifest, connect).run)
+                    assert summary["ok"]
+                    _report(
+                        f"orchestrator, {count} playlists, {workers} worker(s)",
+                        fake.calls.total(),
+                        seconds,
+                    )
+    finally:
+        server.shutdown()
+
+
+def bench_metrics_overhead(size=5_000, runs=5):
+    """
+    The cached playlist fetch, the hottest path through execute(), with
+    metrics disabled, enabled and enabled with cProfile.
+    """
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, BENCH_PLAYLIST_ID, size)
+    with tempfile.TemporaryDirectory() as tmp:
+        playlist_manager = PlaylistManager(
+            cache=ResponseCache(os.path.join(tmp, "cache.sqlite"))
+        )
+        playlist_manager.youtube = build_client(fake)
+        playlist_manager.get_playlist_items(BENCH_PLAYLIST_ID)
+        for mode, profile in (("disabled", None), ("enabled", None), ("cprofile", "cprofile")):
+            if mode != "disabled":
+                metrics.registry.enable(profile)
+            best = min(
+                _timed(playlist_manager.get_playlist_items, BENCH_PLAYLIST_ID)[1]
+                for _ in range(runs)
+            )
+            _report(f"cached playlist fetch, metrics {mode} ({size})", 0, best)
+            metrics.registry.disable()
+            metrics.registry.reset()
+        playlist_manager.cache.close()
+
+
+def main():
+    logging.disable(logging.WARNING)
+    bench_video_statistics()
+    bench_concurrent_statistics()
+    bench_connection_pool()
+    bench_batched_inserts()
+    bench_remove_deleted_videos()
+    bench_response_cache()
+    bench_incremental_sync()
+    bench_streaming_pager()
+    bench_new_song_discovery()
+    bench_catalog()
+    bench_dedup()
+    bench_reorder()
+    bench_artist_affinity()
+    bench_cleaning()
+    bench_dataset_load()
+    bench_stats_history()
+    bench_common_artists()
+    bench_title_parser()
+    bench_chart_rendering()
+    bench_startup()
+    bench_orchestrator()
+    bench_metrics_overhead()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import sys
+
+from titles import parse_titles
+
+# Dataset columns `PlaylistCatalog.join` can add, and the record field behind each.
+JOIN_FIELDS = {
+    "Playlist Item ID": "item_id",
+    "Title": "title",
+    "Artist": "artist",
+    "Song": "song",
+}
+
+
+def normalize_artist(name):
+    """Case- and spacing-insensitive form of an artist name, for lookups."""
+    return " ".join(name.split()).casefold()
+
+
+class CatalogItem:
+    """
+    One playlist entry:
+    - item_id  : playlist item ID, or None for rows from a dataset
+    - video_id : YouTube video ID
+    - title    : video title
+    - artist   : artist, once known (from a dataset or by parsing the title)
+    - song     : song name, once known
+    """
+
+    __slots__ = ("item_id", "video_id", "title", "artist", "song")
+
+    def __init__(self, item_id, video_id, title, artist=None, song=None):
+        self.item_id = item_id
+        self.video_id = video_id
+        self.title = title
+        self.artist = artist
+        self.song = song
+
+    def __repr__(self):
+        return (
+            f"CatalogItem(item_id={self.item_id!r}, video_id={self.video_id!r}, "
+            f"title={self.title!r})"
+        )
+
+
+class PlaylistCatalog:
+    """
+    The entries of a playlist as CatalogItems in playlist order, with hash
+    indexes on playlist item ID, video ID and normalized artist, so
+    membership tests and lookups are O(1) whatever the playlist size.
+
+    Video IDs and artists are interned: every index and record shares one
+    copy of each. The artist index is built on first use, parsing the
+    titles of entries that have no artist yet (see titles.parse_titles).
+
+    A video may be in a playlist more than once; `get` returns its first
+    entry and `entries` all of them.
+    """
+
+    def __init__(self, entries=()):
+        self._by_item_id = {}  # also keeps playlist order
+        self._by_video_id = {}  # CatalogItem, or a tuple of them for duplicates
+        self._by_artist = None
+        self._datasets = []  # entries without a playlist item ID
+        for entry in entries:
+            self._add(entry)
+
+    @classmethod
+    def from_api_items(cls, items):
+        """From raw playlistItems resources."""
+        return cls(
+            CatalogItem(
+                item["id"], item["contentDetails"]["videoId"], item["snippet"]["title"]
+            )
+            for item in items
+        )
+
+    @classmethod
+    def from_snapshot(cls, items):
+        """From the compact items of a PlaylistDiff or snapshot."""
+        return cls(
+            CatalogItem(item["id"], item["video_id"], item["title"]) for item in items
+        )
+
+    @classmethod
+    def from_dataset(cls, df):
+        """From a playlist dataset (Video ID, Title, Artist and Song columns)."""
+        return cls(
+            CatalogItem(None, video_id, title, artist, song)
+            for video_id, title, artist, song in zip(
+                df["Video ID"], df["Title"], df["Artist"], df["Song"]
+            )
+        )
+
+    def add(self, item_id, video_id, title, artist=None, song=None):
+        """Appends an entry and returns it."""
+        return self._add(CatalogItem(item_id, video_id, title, artist, song))
+
+    def _add(self, entry):
+        entry.video_id = sys.intern(entry.video_id)
+        if entry.artist is not None:
+            entry.artist = sys.intern(str(entry.artist))
+        if entry.item_id is None:
+            self._datasets.append(entry)
+        else:
+            self._by_item_id[entry.item_id] = entry
+        existing = self._by_video_id.get(entry.video_id)
+        if existing is None:
+            self._by_video_id[entry.video_id] = entry
+        elif isinstance(existing, tuple):
+            self._by_video_id[entry.video_id] = existing + (entry,)
+        else:
+            self._by_video_id[entry.video_id] = (existing, entry)
+        if self._by_artist is not None:
+            self._index_artist(entry)
+        return entry
+
+    def __len__(self):
+        return len(self._by_item_id) + len(self._datasets)
+
+    def __iter__(self):
+        yield from self._by_item_id.values()
+        yield from self._datasets
+
+    def __contains__(self, video_id):
+        return video_id in self._by_video_id
+
+    def video_ids(self):
+        """The distinct video IDs, as a set-like view."""
+        return self._by_video_id.keys()
+
+    def get(self, video_id):
+        """The first entry of a video, or None."""
+        entry = self._by_video_id.get(video_id)
+        return entry[0] if isinstance(entry, tuple) else entry
+
+    def entries(self, video_id):
+        """Every entry of a video, as a tuple."""
+        entry = self._by_video_id.get(video_id)
+        if entry is None:
+            return ()
+        return entry if isinstance(entry, tuple) else (entry,)
+
+    def item(self, item_id):
+        """The entry with a playlist item ID, or None."""
+        return self._by_item_id.get(item_id)
+
+    def by_artist(self, artist):
+        """Every entry credited to `artist`, compared normalized."""
+        if self._by_artist is None:
+            self._build_artist_index()
+        return list(self._by_artist.get(normalize_artist(artist), ()))
+
+    def _build_artist_index(self):
+        unparsed = [entry for entry in self if entry.artist is None]
+        for entry, parsed in zip(
+            unparsed, parse_titles([entry.title for entry in unparsed])
+        ):
+            entry.artist = sys.intern(parsed.artist or "Unknown")
+            entry.song = parsed.song
+        self._by_artist = {}
+        for entry in self:
+            self._index_artist(entry)
+
+    def _index_artist(self, entry):
+        if entry.artist is not None:
+            key = sys.intern(normalize_artist(entry.artist))
+            self._by_artist.setdefault(key, []).append(entry)
+
+    def pop_video(self, video_id):
+        """Removes every entry of a video and returns them."""
+        removed = self.entries(video_id)
+        for entry in removed:
+            self._discard(entry)
+        return list(removed)
+
+    def remove_item(self, item_id):
+        """Removes the entry with a playlist item ID and returns it, or None."""
+        entry = self._by_item_id.get(item_id)
+        if entry is not None:
+            self._discard(entry)
+        return entry
+
+    def _discard(self, entry):
+        if entry.item_id is None:
+            self._datasets.remove(entry)
+        else:
+            del self._by_item_id[entry.item_id]
+        remaining = tuple(
+            other for other in self.entries(entry.video_id) if other is not entry
+        )
+        if not remaining:
+            del self._by_video_id[entry.video_id]
+        else:
+            self._by_video_id[entry.video_id] = (
+                remaining if len(remaining) > 1 else remaining[0]
+            )
+        if self._by_artist is not None and entry.artist is not None:
+            self._by_artist[normalize_artist(entry.artist)].remove(entry)
+
+    def join(self, df, columns=("Artist", "Song"), on="Video ID"):
+        """
+        Returns `df` with `columns` (see JOIN_FIELDS) looked up by the video
+        IDs in its `on` column, in one pass. Videos not in the catalog get
+        None.
+        """
+        unknown = set(columns) - set(JOIN_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot join column(s): {', '.join(sorted(unknown))}.")
+        if any(JOIN_FIELDS[column] in ("artist", "song") for column in columns):
+            if any(entry.artist is None for entry in self):
+                self._build_artist_index()
+        entries = [self.get(video_id) for video_id in df[on]]
+        return df.assign(
+            **{
+                column: [
+                    getattr(entry, JOIN_FIELDS[column]) if entry else None
+                    for entry in entries
+                ]
+                for column in columns
+            }
+        )
@@ -0,0 +1,208 @@
+import io
+import logging
+import math
+import os
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Only the Agg canvas is used; pyplot is never imported, so no GUI toolkit is
+# loaded and rendering works on headless machines.
+from matplotlib import rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+
+logger = logging.getLogger(__name__)
+
+CHART_DIR = os.getenv("CHART_DIR", "charts")
+MAX_LABEL_LENGTH = 48  # longer video titles are cut with "…"
+
+
+class BarChart(
+    namedtuple(
+        "BarChart", "title labels values xlabel ylabel color",
+        defaults=("", "", "skyblue"),
+    )
+):
+    """
+    A horizontal bar chart, first label on top:
+    - title  : chart title
+    - labels : bar labels, e.g. video titles or artists
+    - values : one number per label
+    """
+
+    __slots__ = ()
+
+
+class ChartRenderer:
+    """
+    Renders BarCharts to PNG or SVG with the Agg canvas.
+
+    Figures are kept per layout and reused: when a chart has as many bars
+    as the last one drawn on its axes, the bars, ticks and labels are
+    updated in place instead of being rebuilt. Margins come from measuring
+    the bar labels once per render rather than from a tight-layout pass,
+    which would draw the figure twice. `stats()` reports how many charts
+    were rendered and how long it took.
+
+    Args:
+        figsize (tuple): Size in inches of a single chart
+        dpi (int): Resolution of PNG output
+    """
+
+    def __init__(self, figsize=(10, 6), dpi=100):
+        self.figsize = figsize
+        self.dpi = dpi
+        self._figures = {}
+        self._bars = {}  # axes -> BarContainer drawn on it last
+        self.renders = 0
+        self.seconds = 0.0
+
+    def _figure(self, nrows, ncols):
+        key = (nrows, ncols)
+        if key not in self._figures:
+            figure = Figure(
+                figsize=(self.figsize[0] * ncols, self.figsize[1] * nrows),
+                dpi=self.dpi,
+            )
+            FigureCanvasAgg(figure)
+            figure.subplots(nrows, ncols, squeeze=False)
+            self._figures[key] = figure
+        return self._figures[key]
+
+    def _draw(self, ax, chart):
+        labels = [_label(label) for label in chart.labels]
+        values = list(chart.values)
+        bars = self._bars.get(ax)
+        if bars is None or len(bars) != len(values):
+            ax.clear()
+            positions = range(len(values))
+            bars = self._bars[ax] = ax.barh(positions, values)
+            # Positional ticks, so two bars with the same title stay separate.
+            ax.set_yticks(positions, labels)
+            ax.invert_yaxis()
+        else:
+            for bar, value in zip(bars, values):
+                bar.set_width(value)
+            ax.set_yticklabels(labels)
+            ax.relim()
+            ax.autoscale_view()
+        for bar in bars:
+            bar.set_facecolor(chart.color)
+        ax.set_title(_escape(chart.title))
+        ax.set_xlabel(chart.xlabel)
+        ax.set_ylabel(chart.ylabel)
+        ax.set_visible(True)
+        return labels
+
+    def _fit_margins(self, figure, labels, nrows, ncols):
+        """Leaves room left of every axes for the widest bar label."""
+        renderer = figure.canvas.get_renderer()
+        font = FontProperties(size=rcParams["ytick.labelsize"])
+        with warnings.catch_warnings():
+            # Missing glyphs are reported once, when the figure is saved.
+            warnings.simplefilter("ignore", UserWarning)
+            widest = max(
+                (
+                    renderer.get_text_width_height_descent(label, font, ismath=False)[0]
+                    for label in labels
+                ),
+                default=0,
+            )
+        width, height = figure.get_size_inches() * figure.dpi
+        gap = widest + 0.6 * figure.dpi  # tick marks, padding and the y label
+        axes_width = (width * 0.98 - ncols * gap) / ncols
+        axes_height = (height - nrows * 1.2 * figure.dpi) / nrows
+        figure.subplots_adjust(
+            left=gap / width,
+            right=0.98,
+            bottom=0.7 * figure.dpi / height,
+            top=1 - 0.5 * figure.dpi / height,
+            wspace=gap / axes_width,
+            hspace=1.2 * figure.dpi / axes_height,
+        )
+
+    def render(self, charts, output=None, format=None, ncols=1):
+        """
+        Draws `charts` (one BarChart or a list) in a grid `ncols` wide and
+        saves it to `output`, a file path or a writable buffer. The format
+        comes from `format`, else the path's extension, else PNG. Without
+        `output`, returns the encoded bytes.
+        """
+        start = time.perf_counter()
+        if isinstance(charts, BarChart):
+            charts = [charts]
+        ncols = min(ncols, len(charts))
+        nrows = math.ceil(len(charts) / ncols)
+        figure = self._figure(nrows, ncols)
+        labels = []
+        for ax, chart in zip(figure.axes, charts):
+            labels.extend(self._draw(ax, chart))
+        for ax in figure.axes[len(charts) :]:
+            ax.set_visible(False)
+        self._fit_margins(figure, labels, nrows, ncols)
+
+        if format is None and isinstance(output, str):
+            format = os.path.splitext(output)[1].lstrip(".").lower() or None
+        buffer = io.BytesIO() if output is None else output
+        if isinstance(buffer, str):
+            os.makedirs(os.path.dirname(buffer) or ".", exist_ok=True)
+        figure.savefig(buffer, format=format or "png")
+
+        seconds = time.perf_counter() - start
+        self.renders += len(charts)
+        self.seconds += seconds
+        logger.debug("Rendered %d chart(s) in %.3f s.", len(charts), seconds)
+        return buffer.getvalue() if output is None else output
+
+    def stats(self):
+        """Charts rendered this session and the time spent rendering them."""
+        return {
+            "renders": self.renders,
+            "seconds": round(self.seconds, 3),
+            "figures": len(self._figures),
+        }
+
+
+def _escape(text):
+    # "$" starts mathtext in matplotlib; titles such as "$uicideboy$" are text.
+    return str(text).replace("$", r"\$")
+
+
+def _label(label):
+    label = str(label)
+    if len(label) > MAX_LABEL_LENGTH:
+        label = label[: MAX_LABEL_LENGTH - 1].rstrip() + "…"
+    return _escape(label)
+
+
+_worker_renderer = None
+
+
+def _render_job(job):
+    global _worker_renderer
+    if _worker_renderer is None:
+        _worker_renderer = ChartRenderer()
+    charts, output, kwargs = job
+    return _worker_renderer.render(charts, output, **kwargs)
+
+
+def render_charts(jobs, processes=None):
+    """
+    Renders many outputs in a process pool. `jobs` is a list of
+    (charts, path) pairs, or (charts, path, render kwargs) triples. Each
+    worker reuses its figures across the jobs it gets. Returns the paths.
+    """
+    jobs = [(job[0], job[1], job[2] if len(job) > 2 else {}) for job in jobs]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(processes) as executor:
+        paths = list(executor.map(_render_job, jobs))
+    logger.info(
+        "Rendered %d chart file(s) in %.3f s.", len(paths), time.perf_counter() - start
+    )
+    return paths
+
+
+renderer = ChartRenderer()
@@ -0,0 +1,60 @@
+import json
+import os
+
+# Defaults shared by every entry point. A JSON config file overrides them.
+PLAYLIST_ID = "PLmPwAQy0bOJZ3U_u5BGeFC1fE2FvzZ9Yp"  # change it to your own playlist
+FROM_PLAYLIST_ID = "PL3-sRm8xAzY9gpXTMGVHJWy_FMD67NBed"  # famous playlist
+NUMBER_OF_SONGS_TO_ADD = 5
+DEDUPE_THRESHOLD = 0.8  # song name similarity of near-duplicates, see dedup.py
+CONFIG_FILE = os.getenv("YOUTUBE_MANAGER_CONFIG", "config.json")
+
+DEFAULTS = {
+    "playlists": [PLAYLIST_ID],
+    "from_playlists": [FROM_PLAYLIST_ID],
+    "songs_to_add": NUMBER_OF_SONGS_TO_ADD,
+    # Skip other uploads of songs already in the playlist when adding new
+    # songs: None (off) or a similarity threshold such as DEDUPE_THRESHOLD.
+    "dedupe_threshold": None,
+    # Add the new songs whose artists fit the playlist best instead of the
+    # first ones found; see affinity.py.
+    "rank_new_songs": False,
+    "data_csv": "playlist_data.csv",
+    "clean_data_csv": "clean_playlist_data.csv",
+    "stats_csv": "playlist_stats.csv",
+    "clean_stats_csv": "clean_playlist_stats.csv",
+    "quota_state_file": "quota_usage.json",
+}
+
+
+def load_config(path=None):
+    """
+    DEFAULTS overridden by the JSON object in `path`, or in CONFIG_FILE when
+    no path is given and that file exists. Raises ValueError for unknown keys.
+    """
+    config = dict(DEFAULTS)
+    if path is None:
+        if not os.path.exists(CONFIG_FILE):
+            return config
+        path = CONFIG_FILE
+    with open(path, "r", encoding="utf-8") as config_file:
+        overrides = json.load(config_file)
+    unknown = sorted(set(overrides) - set(DEFAULTS))
+    if unknown:
+        raise ValueError(f"Unknown config key(s) in {path}: {', '.join(unknown)}.")
+    for key in ("playlists", "from_playlists"):
+        if isinstance(overrides.get(key), str):
+            overrides[key] = [overrides[key]]
+    config.update(overrides)
+    return config
+
+
+def playlist_file(path, playlist_id, playlist_ids):
+    """
+    The file `path` stands for when working on `playlist_id`. With several
+    playlists each gets its own, e.g. playlist_data.csv ->
+    playlist_data_PLxxxx.csv; with one, `path` is used as it is.
+    """
+    if len(playlist_ids) <= 1:
+        return path
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_{playlist_id}{extension}"
@@ -0,0 +1,87 @@
+import logging
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+logger = logging.getLogger(__name__)
+
+# Typed schema shared by every playlist dataset; columns a dataset lacks are skipped.
+COLUMN_TYPES = {
+    "Title": "str",
+    "Video ID": "str",
+    "Artist": "category",
+    "Song": "str",
+    "Views": "int64",
+    "Likes": "int64",
+    "Fetched At": "datetime64[ns, UTC]",
+}
+
+
+def dataset_path(csv_path):
+    """
+    Datasets are addressed by their CSV export path; the columnar copy
+    lives next to it, e.g. playlist_data.csv -> playlist_data.feather.
+    """
+    return os.path.splitext(csv_path)[0] + ".feather"
+
+
+def dataset_exists(csv_path):
+    """True if the dataset can be loaded, from Feather or its CSV export."""
+    return os.path.exists(dataset_path(csv_path)) or os.path.exists(csv_path)
+
+
+def apply_column_types(df):
+    """
+    Casts the known columns of `df` to their COLUMN_TYPES dtype. Count
+    cells that are blank or not a number become 0, with a warning.
+    """
+    types = {
+        column: dtype for column, dtype in COLUMN_TYPES.items() if column in df
+    }
+    for column, dtype in types.items():
+        if dtype == "int64" and not pd.api.types.is_integer_dtype(df[column]):
+            values = pd.to_numeric(df[column], errors="coerce")
+            missing = int(values.isna().sum())
+            if missing:
+                logger.warning(
+                    "%d '%s' value(s) blank or not a number, stored as 0.",
+                    missing,
+                    column,
+                )
+            df = df.assign(**{column: values.fillna(0)})
+    if "Fetched At" in types:
+        df = df.assign(**{"Fetched At": pd.to_datetime(df["Fetched At"], utc=True)})
+    return df.astype(types)
+
+
+def save_dataset(df, csv_path, export_csv=True):
+    """
+    Writes `df` as an uncompressed Feather file, so it can be memory-mapped
+    on load, and exports it to `csv_path` unless `export_csv` is False.
+    Returns the typed frame that was written.
+    """
+    df = apply_column_types(df).reset_index(drop=True)
+    path = dataset_path(csv_path)
+    df.to_feather(path + ".tmp", compression="uncompressed")
+    os.replace(path + ".tmp", path)
+    if export_csv:
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+    return df
+
+
+def load_dataset(csv_path, columns=None):
+    """
+    Loads a dataset, reading only `columns` when given. Feather files are
+    memory-mapped, so unused columns are never read. A dataset that only
+    exists as CSV (e.g. from an older version) is parsed once and converted.
+    """
+    path = dataset_path(csv_path)
+    if os.path.exists(path):
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        return table.to_pandas()
+
+    logger.info("Converting %s to %s.", csv_path, path)
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding="utf-8")
+    df = save_dataset(df, csv_path, export_csv=False)
+    return df[columns] if columns is not None else df
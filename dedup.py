@@ -0,0 +1,256 @@
+import functools
+import re
+import unicodedata
+import zlib
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+
+from cleaning import NOISE_WORDS_PATTERN
+from titles import parse_title
+
+DEFAULT_THRESHOLD = 0.8  # Jaccard similarity of song 3-grams
+NUM_PERMUTATIONS = 32
+BANDS = 8  # LSH bands of NUM_PERMUTATIONS // BANDS rows each
+SHINGLE_SIZE = 3
+NUMBERS_PATTERN = re.compile(r"\d+")
+NON_WORD_PATTERN = re.compile(r"[^\w]+")
+# Titles the API gives videos that are gone; they say nothing about the song.
+UNAVAILABLE_TITLES = frozenset({"Deleted video", "Private video"})
+
+
+class SongKey(namedtuple("SongKey", "artists song tags")):
+    """
+    What makes two uploads the same recording:
+    - artists : normalized primary artists, sorted; featured ones are left out
+    - song    : normalized song name, without noise words
+    - tags    : normalized version tags such as "remix" or "live", sorted
+    """
+
+    __slots__ = ()
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def _normalize(text):
+    if not text.isascii():  # drop accents: "Beyoncé" -> "beyonce"
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    text = NOISE_WORDS_PATTERN.sub(" ", text.casefold())
+    return " ".join(NON_WORD_PATTERN.sub(" ", text).replace("_", " ").split())
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def song_key(title):
+    """
+    The SongKey of a video title, e.g. "Nicki Minaj & Ice Spice – Barbie
+    World (with Aqua) [Official Music Video]" and "Nicki Minaj, Ice Spice -
+    Barbie World (Lyrics)" share one.
+    """
+    parsed = parse_title(title)
+    return SongKey(
+        tuple(sorted({_normalize(artist) for artist in parsed.artists} - {""})),
+        _normalize(parsed.song) or _normalize(title),
+        tuple(sorted({_normalize(tag) for tag in parsed.tags})),
+    )
+
+
+def _shingles(song):
+    padded = f" {song} "
+    if len(padded) <= SHINGLE_SIZE:
+        return frozenset([padded])
+    return frozenset(
+        padded[index : index + SHINGLE_SIZE]
+        for index in range(len(padded) - SHINGLE_SIZE + 1)
+    )
+
+
+class _ShingleHashes(dict):
+    """crc32 of each 3-gram, computed once: 3-grams repeat across titles."""
+
+    def __missing__(self, shingle):
+        value = self[shingle] = zlib.crc32(shingle.encode("utf-8"))
+        return value
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+class DuplicateIndex:
+    """
+    Finds uploads of the same song among video titles.
+
+    Titles with the same SongKey are duplicates outright. Near-duplicates
+    (typos or stray words in the song name) are found with MinHash-LSH over
+    the 3-grams of the song name: each key gets NUM_PERMUTATIONS minhashes,
+    split into BANDS bands, and only keys sharing a band bucket are compared,
+    so finding candidates takes near-linear time instead of all pairs.
+    Buckets are also blocked on the artists, the tags and the numbers in
+    the song, as a near-duplicate must share all three ("Part 2" is not
+    "Part 3") and have a 3-gram similarity of at least `threshold`.
+
+    "Deleted video" and "Private video" titles are ignored.
+
+    Args:
+        threshold (float): Minimum Jaccard similarity of near-duplicates;
+            1.0 keeps exact key matches only
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._ids = {}  # SongKey -> ids of the titles with that key
+        self._signatures = {}  # SongKey -> (3-grams, block)
+        # Per band: band hash mixed with the block hash -> [SongKey]
+        self._buckets = [{} for _ in range(BANDS)]
+        self._shingle_hashes = _ShingleHashes()
+        rows = NUM_PERMUTATIONS // BANDS
+        generator = np.random.default_rng(20240601)
+        self._a = generator.integers(1, 2**32, NUM_PERMUTATIONS, dtype=np.uint64) | 1
+        self._b = generator.integers(0, 2**32, NUM_PERMUTATIONS, dtype=np.uint64)
+        self._mix = generator.integers(1, 2**63, rows, dtype=np.uint64) | 1
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ids.values())
+
+    def _bucket_ids(self, shingle_sets, blocks):
+        """
+        Per key, the id of its bucket in each LSH band: the hash of the band
+        of its MinHash signature, mixed with the hash of its block. A hash
+        collision only adds a candidate, as `_similar` compares the blocks.
+        """
+        lengths = np.fromiter(map(len, shingle_sets), dtype=np.int64)
+        hashes = np.fromiter(
+            map(self._shingle_hashes.__getitem__, chain.from_iterable(shingle_sets)),
+            dtype=np.uint64,
+            count=int(lengths.sum()),
+        )
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signature = np.empty((len(shingle_sets), NUM_PERMUTATIONS), dtype=np.uint64)
+        for column in range(NUM_PERMUTATIONS):
+            # Multiply-shift hashing; uint64 overflow wraps, as intended.
+            values = (hashes * self._a[column] + self._b[column]) >> np.uint64(32)
+            signature[:, column] = np.minimum.reduceat(values, offsets)
+        bands = signature.reshape(len(shingle_sets), BANDS, -1)
+        block_hashes = np.fromiter(
+            (hash(block) & 0xFFFFFFFFFFFFFFFF for block in blocks),
+            dtype=np.uint64,
+            count=len(blocks),
+        )
+        return ((bands * self._mix).sum(axis=2) ^ block_hashes[:, None]).tolist()
+
+    @staticmethod
+    def _block(key):
+        """What near-duplicates must share besides their 3-grams."""
+        return key.artists, key.tags, tuple(NUMBERS_PATTERN.findall(key.song))
+
+    def add_many(self, entries):
+        """Indexes (id, title) pairs; builds the MinHash signatures in bulk."""
+        new_keys = []
+        for entry_id, title in entries:
+            if title in UNAVAILABLE_TITLES:
+                continue
+            key = song_key(title)
+            if key not in self._ids:
+                self._ids[key] = []
+                new_keys.append(key)
+            self._ids[key].append(entry_id)
+        if self.threshold >= 1 or not new_keys:
+            return
+        shingle_sets = [_shingles(key.song) for key in new_keys]
+        blocks = [self._block(key) for key in new_keys]
+        for key, shingles, block, bucket_ids in zip(
+            new_keys, shingle_sets, blocks, self._bucket_ids(shingle_sets, blocks)
+        ):
+            self._signatures[key] = shingles, block
+            for buckets, bucket_id in zip(self._buckets, bucket_ids):
+                bucket = buckets.get(bucket_id)
+                if bucket is None:
+                    buckets[bucket_id] = [key]
+                else:
+                    bucket.append(key)
+
+    def add(self, entry_id, title):
+        self.add_many([(entry_id, title)])
+
+    def _similar_keys(self, key):
+        """Indexed keys other than `key` that are near-duplicates of it."""
+        if self.threshold >= 1:
+            return []
+        shingles = _shingles(key.song)
+        block = self._block(key)
+        bucket_ids = self._bucket_ids([shingles], [block])[0]
+        candidates = {
+            other
+            for buckets, bucket_id in zip(self._buckets, bucket_ids)
+            for other in buckets.get(bucket_id, ())
+            if other != key
+        }
+        return [
+            other
+            for other in candidates
+            if self._similar((shingles, block), self._signatures[other])
+        ]
+
+    def _similar(self, signature, other):
+        (shingles, block), (other_shingles, other_block) = signature, other
+        return block == other_block and (
+            jaccard(shingles, other_shingles) >= self.threshold
+        )
+
+    def find(self, title):
+        """
+        Ids of the indexed titles that are the same song as `title`: exact
+        key matches first, then near-duplicates.
+        """
+        if title in UNAVAILABLE_TITLES:
+            return []
+        key = song_key(title)
+        ids = list(self._ids.get(key, ()))
+        for other in self._similar_keys(key):
+            ids.extend(self._ids[other])
+        return ids
+
+    def __contains__(self, title):
+        return bool(self.find(title))
+
+    def groups(self):
+        """
+        Lists of ids that are uploads of the same song, for every song
+        indexed more than once, in the order they were added.
+        """
+        parent = {key: key for key in self._ids}
+
+        def root(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        # Only keys sharing a bucket can be near-duplicates.
+        checked = set()
+        signatures = self._signatures
+        buckets = (bucket for band in self._buckets for bucket in band.values())
+        for bucket in buckets:
+            for i, key in enumerate(bucket):
+                for other in bucket[i + 1 :]:
+                    pair = (key, other)
+                    if pair in checked:
+                        continue
+                    checked.add(pair)
+                    if self._similar(signatures[key], signatures[other]):
+                        parent[root(other)] = root(key)
+        members = {}
+        for key, ids in self._ids.items():
+            members.setdefault(root(key), []).extend(ids)
+        return [ids for ids in members.values() if len(ids) > 1]
+
+
+def find_duplicates(entries, threshold=DEFAULT_THRESHOLD):
+    """
+    Groups the (id, title) pairs in `entries` that are uploads of the same
+    song. Returns a list of id lists, one per song with several uploads.
+    """
+    index = DuplicateIndex(threshold)
+    index.add_many(entries)
+    return index.groups()
@@ -0,0 +1,455 @@
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import ssl
+import subprocess
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict, deque
+from email.parser import FeedParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+import googleapiclient.discovery
+
+from quota import QUOTA_COSTS
+
+# When the first playlist item was added; each next one a minute later.
+ADDED_AT_EPOCH = datetime.datetime(2024, 1, 1)
+
+# The quota cost table's verb for each HTTP method.
+HTTP_VERBS = {"get": "list", "post": "insert", "put": "update", "delete": "delete"}
+
+
+class FakeYouTubeHttp:
+    """
+    An httplib2-compatible stand-in for the YouTube Data API v3.
+
+    Plug it into the real discovery client with `build_client` so requests go
+    through the same code paths as production, but are answered from memory:
+    - playlistItems.list with maxResults/pageToken pagination
+    - videos.list with up to 50 comma-separated IDs
+    - playlistItems.insert, playlistItems.update (moves) and playlistItems.delete
+    - the multipart /batch endpoint, dispatching each part to the above
+
+    GET responses honour the `fields` projection parameter and the size of
+    every response body is added up in `bytes_sent`.
+
+    Every call is counted per API method in `calls` (batch parts included,
+    plus one "batch.post" per batch). List responses carry an ETag and
+    answer a matching If-None-Match with 304. `inject_errors` makes the next calls of
+    a method fail with a given status. `latency` seconds are
+    slept per call, outside the lock, so concurrent callers overlap; the
+    highest number of overlapping calls is kept in `peak_in_flight`.
+
+    With a `daily_quota`, calls are charged like the real API (batch parts
+    each at their own cost) and, once it is spent, answered with a 403
+    quotaExceeded. Units charged so far are in `quota_used`.
+    """
+
+    def __init__(self, latency=0.0, daily_quota=None):
+        self.playlists = {}
+        self.videos = {}
+        self.calls = Counter()
+        self.latency = latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.faults = defaultdict(deque)
+        self.bytes_sent = 0
+        self.daily_quota = daily_quota
+        self.quota_used = 0
+        self._item_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def add_video(self, video_id, title, views=0, likes=0):
+        """Register a public video that videos.list can return statistics for."""
+        self.videos[video_id] = {"title": title, "views": views, "likes": likes}
+
+    def add_playlist_item(self, playlist_id, video_id, title=None):
+        """Append a video to a playlist. Unknown videos show up as 'Deleted video'."""
+        items = self.playlists.setdefault(playlist_id, [])
+        if title is None:
+            video = self.videos.get(video_id)
+            title = video["title"] if video else "Deleted video"
+        number = next(self._item_ids)
+        added_at = ADDED_AT_EPOCH + datetime.timedelta(minutes=number)
+        items.append(
+            {
+                "id": f"{playlist_id}-{number}",
+                "videoId": video_id,
+                "title": title,
+                "publishedAt": added_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        )
+
+    def inject_errors(self, api_method, status, times=1, reason="backendError"):
+        """Fail the next `times` calls of `api_method` (e.g. "playlistItems.post")."""
+        self.faults[api_method].extend([(status, reason)] * times)
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                response, content = self._dispatch(uri, method, body, headers or {})
+                self.bytes_sent += len(content)
+                return response, content
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _dispatch(self, uri, method, body, headers):
+        parsed = urllib.parse.urlparse(uri)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        resource = parsed.path.rstrip("/").rsplit("/", 1)[-1]
+        api_method = f"{resource}.{method.lower()}"
+        handler = getattr(self, f"_{resource}_{method.lower()}", None)
+        if handler is None:
+            return self._error(404, f"No fake handler for {method} {parsed.path}")
+        self.calls[api_method] += 1
+        if self.faults[api_method]:
+            status, reason = self.faults[api_method].popleft()
+            return self._error(status, reason)
+        if self.daily_quota is not None and resource != "batch":
+            cost = QUOTA_COSTS[HTTP_VERBS[method.lower()]]
+            if self.quota_used + cost > self.daily_quota:
+                return self._error(403, "quotaExceeded")
+            self.quota_used += cost
+        if resource == "batch":
+            return handler(headers, body)
+        response, content = handler(params, body)
+        if method == "GET" and response.status == 200:
+            if params.get("fields"):
+                payload = project_fields(json.loads(content), params["fields"])
+                content = json.dumps(payload).encode("utf-8")
+            return self._with_etag(response, content, headers)
+        return response, content
+
+    @staticmethod
+    def _with_etag(response, content, headers):
+        """Tag a list response with an ETag and honour If-None-Match."""
+        etag = '"' + hashlib.md5(content).hexdigest() + '"'
+        if_none_match = {k.lower(): v for k, v in headers.items()}.get("if-none-match")
+        if if_none_match == etag:
+            response = httplib2.Response({"status": "304"})
+            response.reason = "Not Modified"
+            return response, b""
+        payload = json.loads(content)
+        payload = {"etag": etag, **payload}
+        response["etag"] = etag
+        return response, json.dumps(payload).encode("utf-8")
+
+    def _batch_post(self, headers, body):
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        content_type = {k.lower(): v for k, v in headers.items()}["content-type"]
+        parser = FeedParser()
+        parser.feed(f"content-type: {content_type}\r\n\r\n{body}")
+        boundary = "fake_batch_boundary"
+        parts = []
+        for part in parser.close().get_payload():
+            request_line, _, rest = (
+                part.get_payload().replace("\r\n", "\n").partition("\n")
+            )
+            _, _, part_body = rest.partition("\n\n")
+            method, path, _ = request_line.split(" ", 2)
+            response, content = self._dispatch(
+                path, method, part_body or None, {"content-type": "application/json"}
+            )
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {response.status} {response.reason}\r\n"
+                f"Content-Type: application/json\r\n\r\n"
+                f"{content.decode('utf-8')}\r\n"
+            )
+        payload = "".join(parts) + f"--{boundary}--"
+        response = httplib2.Response(
+            {
+                "status": "200",
+                "content-type": f"multipart/mixed; boundary={boundary}",
+            }
+        )
+        return response, payload.encode("utf-8")
+
+    def _playlistItems_get(self, params, body):
+        items = self.playlists.get(params.get("playlistId"))
+        if items is None:
+            return self._error(404, "playlistNotFound")
+        max_results = int(params.get("maxResults", 5))
+        start = int(params.get("pageToken") or 0)
+        page = items[start : start + max_results]
+        response = {
+            "kind": "youtube#playlistItemListResponse",
+            "items": [
+                self._playlist_item(params["playlistId"], start + offset, item)
+                for offset, item in enumerate(page)
+            ],
+            "pageInfo": {"totalResults": len(items), "resultsPerPage": max_results},
+        }
+        if start + max_results < len(items):
+            response["nextPageToken"] = str(start + max_results)
+        return self._ok(response)
+
+    def _videos_get(self, params, body):
+        video_ids = [v for v in params.get("id", "").split(",") if v]
+        if len(video_ids) > 50:
+            return self._error(400, "Too many IDs in videos.list request")
+        items = []
+        for video_id in video_ids:
+            video = self.videos.get(video_id)
+            if video is None:
+                continue
+            items.append(
+                {
+                    "kind": "youtube#video",
+                    "id": video_id,
+                    "statistics": {
+                        "viewCount": str(video["views"]),
+                        "likeCount": str(video["likes"]),
+                    },
+                }
+            )
+        return self._ok({"kind": "youtube#videoListResponse", "items": items})
+
+    def _playlistItems_post(self, params, body):
+        snippet = json.loads(body)["snippet"]
+        playlist_id = snippet["playlistId"]
+        video_id = snippet["resourceId"]["videoId"]
+        if playlist_id not in self.playlists:
+            return self._error(404, "playlistNotFound")
+        if video_id not in self.videos:
+            return self._error(404, "videoNotFound")
+        self.add_playlist_item(playlist_id, video_id)
+        items = self.playlists[playlist_id]
+        return self._ok(self._playlist_item(playlist_id, len(items) - 1, items[-1]))
+
+    def _playlistItems_put(self, params, body):
+        resource = json.loads(body)
+        snippet = resource["snippet"]
+        items = self.playlists.get(snippet["playlistId"])
+        if items is None:
+            return self._error(404, "playlistNotFound")
+        for index, item in enumerate(items):
+            if item["id"] == resource["id"]:
+                break
+        else:
+            return self._error(404, "playlistItemNotFound")
+        position = snippet.get("position", index)
+        if not 0 <= position < len(items):
+            return self._error(400, "invalidPlaylistItemPosition")
+        items.insert(position, items.pop(index))
+        return self._ok(self._playlist_item(snippet["playlistId"], position, item))
+
+    def _playlistItems_delete(self, params, body):
+        for items in self.playlists.values():
+            for index, item in enumerate(items):
+                if item["id"] == params.get("id"):
+                    del items[index]
+                    return self._ok("", 204)
+        return self._error(404, "playlistItemNotFound")
+
+    @staticmethod
+    def _playlist_item(playlist_id, position, item):
+        video_id = item["videoId"]
+        thumbnails = {
+            size: {
+                "url": f"https://i.ytimg.com/vi/{video_id}/{size}.jpg",
+                "width": width,
+                "height": width * 3 // 4,
+            }
+            for size, width in [("default", 120), ("medium", 320), ("high", 480)]
+        }
+        return {
+            "kind": "youtube#playlistItem",
+            "etag": f"item-{item['id']}",
+            "id": item["id"],
+            "snippet": {
+                "publishedAt": item["publishedAt"],
+                "channelId": "UCfakechannel",
+                "title": item["title"],
+                "description": f"Official video for {item['title']}. " * 4,
+                "thumbnails": thumbnails,
+                "channelTitle": "Fake Channel",
+                "playlistId": playlist_id,
+                "position": position,
+                "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                "videoOwnerChannelTitle": "Fake Artist - Topic",
+            },
+            "contentDetails": {
+                "videoId": video_id,
+                "videoPublishedAt": "2023-06-01T00:00:00Z",
+            },
+        }
+
+    @staticmethod
+    def _ok(payload, status=200):
+        response = httplib2.Response(
+            {"status": str(status), "content-type": "application/json"}
+        )
+        response.reason = HTTPStatus(status).phrase
+        content = json.dumps(payload) if payload != "" else ""
+        return response, content.encode("utf-8")
+
+    @classmethod
+    def _error(cls, status, reason):
+        error = {
+            "code": status,
+            "message": reason,
+            "errors": [{"reason": reason, "message": reason}],
+        }
+        return cls._ok({"error": error}, status)
+
+
+def _parse_fields(spec, pos=0):
+    """Parse a `fields` spec like "a,b/c,d(e,f)" into a nested dict."""
+    tree = {}
+    while pos < len(spec):
+        end = pos
+        while end < len(spec) and spec[end] not in ",()":
+            end += 1
+        path = spec[pos:end].strip().split("/")
+        pos = end
+        subtree = None
+        if pos < len(spec) and spec[pos] == "(":
+            subtree, pos = _parse_fields(spec, pos + 1)
+            pos += 1  # closing parenthesis
+        node = tree
+        for part in path[:-1]:
+            node = node.setdefault(part, {})
+        node[path[-1]] = subtree
+        if pos < len(spec) and spec[pos] == ")":
+            return tree, pos
+        pos += 1  # comma
+    return tree, pos
+
+
+def project_fields(value, spec):
+    """Keep only the parts of a response selected by a `fields` spec."""
+
+    def project(value, tree):
+        if tree is None:
+            return value
+        if isinstance(value, list):
+            return [project(entry, tree) for entry in value]
+        return {
+            key: project(value[key], subtree)
+            for key, subtree in tree.items()
+            if key in value
+        }
+
+    return project(value, _parse_fields(spec)[0])
+
+
+def seed_playlist(fake, playlist_id, size, deleted_every=0):
+    """
+    Fill `fake` with a synthetic playlist of `size` videos.
+    Every `deleted_every`-th video is left out of the video catalogue so it
+    behaves like a deleted upload.
+    """
+    for index in range(size):
+        video_id = f"{playlist_id}v{index:06d}"
+        if not (deleted_every and index % deleted_every == deleted_every - 1):
+            fake.add_video(
+                video_id,
+                f"Artist {index % 97} - Song {index}",
+                views=index * 1000,
+                likes=index * 10,
+            )
+        fake.add_playlist_item(playlist_id, video_id)
+
+
+class _Server(ThreadingHTTPServer):
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1  # only the serving thread accepts connections
+        super().process_request(request, client_address)
+
+
+def self_signed_certificate(directory, host="127.0.0.1"):
+    """
+    Write a throwaway certificate and key for `host` to `directory` with the
+    openssl command, for `serve(..., certificate=...)`. Returns (certificate
+    file, key file); clients trust it with httplib2.Http(ca_certs=certificate).
+    """
+    certfile = os.path.join(directory, "fake_youtube.crt")
+    keyfile = os.path.join(directory, "fake_youtube.key")
+    command = "openssl req -x509 -newkey rsa:2048 -nodes -days 1".split()
+    command += ["-subj", f"/CN={host}", "-addext", f"subjectAltName=IP:{host}"]
+    command += ["-keyout", keyfile, "-out", certfile]
+    subprocess.run(command, check=True, capture_output=True)
+    return certfile, keyfile
+
+
+def serve(fake, host="127.0.0.1", port=0, certificate=None):
+    """
+    Serve `fake` over real HTTP on a background thread, or over HTTPS with
+    `certificate`, a (certificate file, key file) pair such as
+    `self_signed_certificate` returns.
+    Returns the server; its base URL is in `server.url` and the number of
+    connections accepted so far in `server.connections`. Call
+    `server.shutdown()` when done.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        wbufsize = -1  # send headers and body in one write; avoids Nagle stalls
+        disable_nagle_algorithm = True  # bodies over the buffer size still stalled
+
+        def _handle(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else None
+            response, content = fake.request(
+                self.path, self.command, body, dict(self.headers)
+            )
+            self.send_response(response.status)
+            for header, value in response.items():
+                if header not in ("status", "content-length"):
+                    self.send_header(header, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    server = _Server((host, port), Handler)
+    server.daemon_threads = True
+    scheme = "http"
+    if certificate is not None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        # The handshake runs on the first read, in the connection's own thread.
+        server.socket = context.wrap_socket(
+            server.socket, server_side=True, do_handshake_on_connect=False
+        )
+        scheme = "https"
+    server.url = f"{scheme}://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def build_client(http, api_endpoint=None):
+    """
+    Build a YouTube client from the bundled discovery document on top of
+    `http`, optionally pointed at a local server such as `serve(...).url`.
+    """
+    client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+    return googleapiclient.discovery.build(
+        "youtube",
+        "v3",
+        http=http,
+        static_discovery=True,
+        client_options=client_options,
+    )
@@ -0,0 +1,28 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stands in for a module until one of its attributes is first used, then
+    imports it and takes over its namespace, so later lookups cost the same
+    as on the real module.
+    """
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self.__name__}'>"
+
+
+def lazy_import(name):
+    """
+    Returns module `name`, importing it only when an attribute is first
+    accessed. Already imported modules are returned as they are.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
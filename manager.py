@@ -1,97 +1,242 @@
+import config
 import pandas as pd
-import os
+from googleapiclient.errors import HttpError
 from authenticate import (
     YouTubeAPIManager,
 )
+from catalog import PlaylistCatalog
+from dataset import dataset_exists, load_dataset, save_dataset
+from mutations import PlaylistMutationBatch
+from quota import estimate_cost
+from reorder import REORDER_FIELDS, order_items, plan_moves
+from snapshots import PlaylistSnapshotStore, sync_playlist
+from titles import parse_title, parse_titles
+
+PLAYLIST_DATA_COLUMNS = ["Title", "Video ID", "Artist", "Song", "Fetched At"]
 
 
 class PlaylistManager(YouTubeAPIManager):
     """Has the methods:
     - get_playlist : gets all the videos in a playlist
     - remove deleted or private videos from playlist
+    - reorder a playlist with the fewest moves
 
     Args:
         YouTubeAPIManager (Class): Takes in all the authenticator data for YouTube API
     """
 
-    def __init__(self, credentials_file="credentials.json", token_file="token.json"):
-        super().__init__(credentials_file, token_file)
+    def __init__(
+        self, credentials_file="credentials.json", token_file="token.json", **kwargs
+    ):
+        super().__init__(credentials_file, token_file, **kwargs)
 
     def get_playlist_items(self, plist_id):
         """Gets all the videos in a playlist SPECIFICALLY FOR MY PLAYLIST"""
-        items = []
-        page_token = None
-        while True:
-            request = self.youtube.playlistItems().list(
-                part="snippet,contentDetails",
-                playlistId=plist_id,
-                maxResults=50,  # Max is 50 per request
-                pageToken=page_token,
-            )
-            response = request.execute()
-            items.extend(response["items"])
-            page_token = response.get("nextPageToken")
-
-            if not page_token:
-                break
-        return items
-
-    def remove_video_from_playlist(self, playlist_id, video_id):
-        """Remove a video from the playlist FUCTION USED IN remove_deleted_videos function"""
-        playlist_items = self.get_playlist_items(playlist_id)
-        for item in playlist_items:
-            if item["contentDetails"]["videoId"] == video_id:
-                request = self.youtube.playlistItems().delete(id=item["id"])
-                request.execute()
-                print(f"Removed video {video_id} from playlist.")
-
-    def remove_deleted_videos(self, playlist_id):
-        """Remove deleted or private videos from the playlist"""
+        return list(self.iter_playlist_items(plist_id))
+
+    def get_video_index(self, playlist_id):
+        """Fetch the playlist once into a PlaylistCatalog indexed by video ID"""
+        return PlaylistCatalog.from_api_items(self.get_playlist_items(playlist_id))
+
+    def remove_video_from_playlist(self, playlist_id, video_id, index=None):
+        """Remove a video from the playlist.
+        Pass a prebuilt `index` from get_video_index to avoid re-fetching the
+        whole playlist; removed items are dropped from it."""
+        if index is None:
+            index = self.get_video_index(playlist_id)
+        for entry in index.pop_video(video_id):
+            request = self.youtube.playlistItems().delete(id=entry.item_id)
+            self.execute(request)
+            print(f"Removed video {video_id} from playlist.")
+
+    def remove_deleted_videos(self, playlist_id, dry_run=False):
+        """Remove deleted or private videos from the playlist in a single pass.
+
+        The playlist is fetched once and every matching item is deleted by its
+        playlist item ID with batched delete calls. With `dry_run` nothing is
+        deleted. Returns a summary dict:
+        - scanned : number of playlist items looked at
+        - reclaimed : items removed (or that would be, in a dry run)
+        - failed : items whose delete failed
+        - batch_calls : batch requests sent
+        - projected_units : quota cost of the deletes
+        """
         playlist_items = self.get_playlist_items(playlist_id)
+        batch = PlaylistMutationBatch(self)
+        candidates = {}
         for item in playlist_items:
             title = item["snippet"]["title"]
             if title in ["Deleted video", "Private video"]:
-                video_id = item["contentDetails"]["videoId"]
-                self.remove_video_from_playlist(playlist_id, video_id)
-                print(f"Removed {title} from playlist.")
+                record = {
+                    "title": title,
+                    "video_id": item["contentDetails"]["videoId"],
+                    "playlist_item_id": item["id"],
+                }
+                candidates[batch.delete(item["id"], playlist_id)] = record
+
+        summary = {
+            "playlist_id": playlist_id,
+            "dry_run": dry_run,
+            "scanned": len(playlist_items),
+            "reclaimed": [],
+            "failed": [],
+            "batch_calls": 0,
+            "projected_units": estimate_cost({"delete": len(candidates)}),
+        }
+        if dry_run:
+            summary["reclaimed"] = list(candidates.values())
+            print(f"Dry run: would remove {len(candidates)} items from playlist.")
+            return summary
+
+        result = batch.execute()
+        summary["batch_calls"] = result.batches
+        failed = {mutation for mutation, _ in result.failed}
+        for mutation, record in candidates.items():
+            if mutation in failed:
+                summary["failed"].append(record)
+            else:
+                summary["reclaimed"].append(record)
+                print(f"Removed {record['title']} from playlist.")
+        return summary
+
+    def reorder_playlist(self, playlist_id, order_by, reverse=False, dry_run=False):
+        """Sort the playlist with as few playlistItems.update calls as possible.
+
+        `order_by` is "title", "artist", "added" (date added to the
+        playlist) or a mapping of video ID to value, e.g. views from
+        collect_playlist_statistics (see reorder.order_items). Only items
+        off the longest run already in order are moved, one update each
+        (see reorder.plan_moves). Updates are sent one at a time, in order,
+        as each position assumes the moves before it; the first failure
+        stops the run, and running it again picks up from there. With
+        `dry_run` nothing is moved. Returns a summary dict:
+        - items : number of playlist items
+        - moved : items moved (or that would be, in a dry run)
+        - kept : items left in place
+        - failed : item ID of the move that failed, if one did
+        - projected_units : quota cost of the moves
+        - naive_units : quota cost of deleting and re-inserting every item
+        """
+        items = list(self.iter_playlist_items(playlist_id, fields=REORDER_FIELDS))
+        current = [item["id"] for item in items]
+        moves = plan_moves(current, order_items(items, order_by, reverse))
+        summary = {
+            "playlist_id": playlist_id,
+            "dry_run": dry_run,
+            "items": len(items),
+            "moved": len(moves) if dry_run else 0,
+            "kept": len(items) - len(moves),
+            "failed": [],
+            "projected_units": estimate_cost({"update": len(moves)}),
+            "naive_units": estimate_cost({"delete": len(items), "insert": len(items)}),
+        }
+        if dry_run:
+            print(
+                f"Dry run: would move {len(moves)} of {len(items)} items "
+                f"for {summary['projected_units']} quota units."
+            )
+            return summary
+
+        video_ids = {item["id"]: item["contentDetails"]["videoId"] for item in items}
+        for item_id, position in moves:
+            request = self.youtube.playlistItems().update(
+                part="snippet",
+                body={
+                    "id": item_id,
+                    "snippet": {
+                        "playlistId": playlist_id,
+                        "resourceId": {
+                            "kind": "youtube#video",
+                            "videoId": video_ids[item_id],
+                        },
+                        "position": position,
+                    },
+                },
+            )
+            try:
+                self.execute(request)
+            except HttpError as e:
+                print(f"Failed to move {item_id} to position {position}: {e}")
+                summary["failed"].append(item_id)
+                break
+            summary["moved"] += 1
+        print(f"Moved {summary['moved']} of {len(items)} items in playlist.")
+        return summary
+
+    def sync_playlist_data(
+        self, playlist_id, file_path="playlist_data.csv", store=None
+    ):
+        """Bring the playlist dataset up to date with an incremental sync.
+
+        Only changed pages are downloaded (see snapshots.sync_playlist). Rows
+        of videos whose title did not change are kept as they are, new ones
+        are parsed in one batch (see titles.parse_titles) and stamped with
+        the fetch time, removed ones dropped, and the dataset follows
+        playlist order. It is stored in Feather and
+        exported to `file_path` (see dataset.save_dataset).
+        Returns the PlaylistDiff."""
+        diff = sync_playlist(self, playlist_id, store or PlaylistSnapshotStore())
+        if not diff.changed and dataset_exists(file_path):
+            print(f"'{file_path}' is already up to date.")
+            return diff
+
+        existing = {}
+        if dataset_exists(file_path):
+            old_df = load_dataset(file_path)
+            for row in old_df.to_dict("records"):
+                existing.setdefault(row["Video ID"], row)
+
+        stale = [
+            item
+            for item in diff.items
+            if item["video_id"] not in existing
+            or existing[item["video_id"]]["Title"] != item["title"]
+        ]
+        titles = parse_titles([item["title"] for item in stale])
+        parsed = {item["video_id"]: title for item, title in zip(stale, titles)}
+
+        rows = []
+        fetched_at = pd.Timestamp.now(tz="UTC")
+        for item in diff.items:
+            title = parsed.get(item["video_id"])
+            if title is None:
+                rows.append(existing[item["video_id"]])
+                continue
+            rows.append(
+                {
+                    "Title": item["title"],
+                    "Video ID": item["video_id"],
+                    "Artist": title.artist or "Unknown",
+                    "Song": title.song,
+                    "Fetched At": fetched_at,
+                }
+            )
+
+        save_dataset(pd.DataFrame(rows, columns=PLAYLIST_DATA_COLUMNS), file_path)
+        print(
+            f"Updated '{file_path}': {len(diff.added)} added, "
+            f"{len(diff.removed)} removed, {len(diff.moved)} moved."
+        )
+        return diff
 
 
 def parse_video_title(title):
-    """Parse the video title to separate the artist and song name."""
-    if "-" in title:
-        artist, song = title.split("-", 1)
-        return artist.strip(), song.strip()
-    else:
-        return None, title.strip()
+    """
+    Parse the video title to separate the artist and song name.
+    Returns (artist, song), with artist None if the title names none; see
+    titles.parse_title for featured artists and version tags.
+    """
+    parsed = parse_title(title)
+    return parsed.artist, parsed.song
 
 
 def main():
-    PLAYLIST_ID = "PLmPwAQy0bOJZ3U_u5BGeFC1fE2FvzZ9Yp" #this is my specific playlist ID "change it to your own"
     playlist_manager = PlaylistManager()
     playlist_manager.authenticate()
 
-    playlistItems = playlist_manager.get_playlist_items(PLAYLIST_ID)
-
-    data = []
-    for item in playlistItems:
-        title = item["snippet"]["title"]
-        video_id = item["contentDetails"]["videoId"]
-
-        artist, song = parse_video_title(title)
-
-        data.append([title, video_id, artist if artist else "Unknown", song])
-
-    df = pd.DataFrame(data, columns=["Title", "Video ID", "Artist", "Song"])
-
-    file_path = "playlist_data.csv"
-
-    if not os.path.exists(file_path):
-        df.to_csv(file_path, index=False, encoding="utf-8")
-        print(f"Playlist data written to '{file_path}' successfully.")
-    else:
-        print(f"'{file_path}' already exists. No data was written.")
+    diff = playlist_manager.sync_playlist_data(config.PLAYLIST_ID, "playlist_data.csv")
 
-    print(f"Data for {len(playlistItems)} videos saved to '{file_path}'.")
+    print(f"Data for {len(diff.items)} videos saved to 'playlist_data.csv'.")
 
 
 if __name__ == "__main__":
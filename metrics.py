@@ -0,0 +1,331 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from functools import wraps
+
+from lazy import lazy_import
+
+# Only needed in a profile mode.
+cProfile = lazy_import("cProfile")
+pstats = lazy_import("pstats")
+tracemalloc = lazy_import("tracemalloc")
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the last bucket, +Inf, is implied.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PROFILE_MODES = ("cprofile", "tracemalloc")
+METRICS_FILE = os.getenv("YOUTUBE_METRICS_FILE", "metrics.prom")
+
+HELP = {
+    "youtube_api_request_seconds": "Time spent in execute(), cache hits included.",
+    "youtube_api_bytes_sent_total": "Request bytes sent to the API.",
+    "youtube_api_bytes_received_total": "Response bytes received from the API.",
+    "youtube_api_quota_units_total": "Quota units of the requests sent, retries included.",
+    "youtube_api_retries_total": "Requests retried after a transient error.",
+    "youtube_api_cache_events_total": "Response cache hits, misses, revalidations and evictions.",
+    "youtube_manager_operation_seconds": "Time spent in data operations.",
+    "youtube_manager_operation_peak_bytes": "Peak traced memory of data operations.",
+}
+
+
+class Histogram:
+    """Counts of observed values per bucket, plus their sum."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and latency histograms for API calls and data
+    operations, exported as JSON (`as_dict`) or Prometheus text
+    (`to_prometheus`). Every metric may carry labels, e.g. the API method.
+
+    Nothing is recorded while disabled: `inc`, `observe` and functions
+    wrapped with `timed` return after a single flag check.
+
+    With a profile mode, `timed` operations are also profiled: "cprofile"
+    adds their call statistics to `profile_stats()`, "tracemalloc" records
+    their peak traced memory (approximate when operations overlap).
+
+    Args:
+        enabled (bool): Start recording right away
+        profile (str): None, "cprofile" or "tracemalloc"; implies enabled
+    """
+
+    def __init__(self, enabled=False, profile=None):
+        self.enabled = False
+        self.profile = None
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pstats = None
+        self._started_tracemalloc = False
+        if enabled or profile:
+            self.enable(profile)
+
+    def enable(self, profile=None):
+        if profile not in (None, *PROFILE_MODES):
+            raise ValueError(
+                f"Unknown profile mode {profile!r}, use one of {', '.join(PROFILE_MODES)}."
+            )
+        if profile == "tracemalloc" and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.profile = profile
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.profile = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self):
+        """Drops everything recorded so far."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._pstats = None
+
+    def inc(self, name, value=1, **labels):
+        """Adds `value` to a counter."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def set_max(self, name, value, **labels):
+        """Raises a gauge to `value` if it is higher."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = max(self._gauges.get(key, value), value)
+
+    def observe(self, name, value, **labels):
+        """Records `value` in a histogram."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timed(self, operation):
+        """
+        Decorator recording the duration of each call in
+        youtube_manager_operation_seconds{operation=...}, and profiling it
+        in a profile mode.
+        """
+
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                return self._measure(operation, func, args, kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def _measure(self, operation, func, args, kwargs):
+        profiler = None
+        if self.profile == "cprofile" and not getattr(self._local, "profiling", False):
+            # One profiler per thread at a time; nested operations share it.
+            profiler = cProfile.Profile()
+            self._local.profiling = True
+        elif self.profile == "tracemalloc":
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        status = "error"
+        try:
+            if profiler is not None:
+                result = profiler.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            self.observe(
+                "youtube_manager_operation_seconds",
+                time.perf_counter() - start,
+                operation=operation,
+                status=status,
+            )
+            if profiler is not None:
+                self._local.profiling = False
+                with self._lock:
+                    if self._pstats is None:
+                        self._pstats = pstats.Stats(profiler)
+                    else:
+                        self._pstats.add(profiler)
+            elif self.profile == "tracemalloc" and tracemalloc.is_tracing():
+                self.set_max(
+                    "youtube_manager_operation_peak_bytes",
+                    tracemalloc.get_traced_memory()[1],
+                    operation=operation,
+                )
+
+    def profile_stats(self):
+        """The pstats.Stats of every operation profiled so far, or None."""
+        return self._pstats
+
+    def as_dict(self):
+        """Everything recorded so far as a JSON-friendly dict."""
+        metrics = defaultdict(list)
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                metrics[name].append({"labels": dict(labels), "value": value})
+            for (name, labels), value in sorted(self._gauges.items()):
+                metrics[name].append({"labels": dict(labels), "value": value})
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metrics[name].append(
+                    {
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 6),
+                        "buckets": {
+                            _bound(bound): count
+                            for bound, count in histogram.cumulative()
+                        },
+                    }
+                )
+        return dict(metrics)
+
+    def to_prometheus(self):
+        """Everything recorded so far in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            series = [
+                ("counter", self._counters),
+                ("gauge", self._gauges),
+                ("histogram", self._histograms),
+            ]
+            for kind, values in series:
+                last_name = None
+                for (name, labels), value in sorted(values.items()):
+                    if name != last_name:
+                        if name in HELP:
+                            lines.append(f"# HELP {name} {HELP[name]}")
+                        lines.append(f"# TYPE {name} {kind}")
+                        last_name = name
+                    if kind != "histogram":
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                        continue
+                    for bound, count in value.cumulative():
+                        bucket_labels = _labels(labels + (("le", _bound(bound)),))
+                        lines.append(f"{name}_bucket{bucket_labels} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(value.sum)}")
+                    lines.append(f"{name}_count{_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=METRICS_FILE):
+        """
+        Saves the metrics to `path`, as JSON for a .json file and as
+        Prometheus text otherwise. In cprofile mode the call statistics go
+        next to it, in a .pstats file for `python -m pstats`.
+        """
+        if path.endswith(".json"):
+            text = json.dumps(self.as_dict(), indent=2)
+        else:
+            text = self.to_prometheus()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(text)
+        stats = self.profile_stats()
+        if stats is not None:
+            stats.dump_stats(os.path.splitext(path)[0] + ".pstats")
+        logger.info("Metrics written to %s.", path)
+        return path
+
+
+def _bound(bound):
+    return "+Inf" if bound == float("inf") else _number(bound)
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def request_method(request):
+    """The API method of a request, e.g. "playlistItems.list", or "batch"."""
+    return getattr(request, "methodId", None) or "batch"
+
+
+class MeteredHttp:
+    """
+    Wraps an httplib2-compatible object, counting the bytes each request
+    sends and receives. Everything else is passed through.
+    """
+
+    def __init__(self, http, method):
+        self.http = http
+        self.method = method
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        response, content = self.http.request(
+            uri, method=method, body=body, headers=headers, **kwargs
+        )
+        registry.inc(
+            "youtube_api_bytes_sent_total", len(body or b""), method=self.method
+        )
+        registry.inc(
+            "youtube_api_bytes_received_total", len(content or b""), method=self.method
+        )
+        return response, content
+
+    def __getattr__(self, attr):
+        return getattr(self.http, attr)
+
+
+# The process-wide registry. YOUTUBE_METRICS=1 turns it on; YOUTUBE_PROFILE
+# (cprofile or tracemalloc) turns it on with profiling.
+registry = MetricsRegistry(
+    enabled=os.getenv("YOUTUBE_METRICS", "") not in ("", "0"),
+    profile=os.getenv("YOUTUBE_PROFILE") or None,
+)
+timed = registry.timed
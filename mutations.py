@@ -0,0 +1,221 @@
+import logging
+import time
+from collections import namedtuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from quota import QuotaExceededError
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 50  # YouTube rejects batches with more than 50 sub-requests
+RETRYABLE_STATUSES = {409, 429, 500, 502, 503, 504}
+# Errors after which no further batch is sent: the quota is spent or the
+# connection is gone. The mutations not sent yet are reported as failed.
+ABORTING_ERRORS = (QuotaExceededError, httplib2.HttpLib2Error, OSError)
+
+Mutation = namedtuple("Mutation", ["kind", "playlist_id", "target"])
+Mutation.__doc__ = """A queued playlistItems change.
+`target` is the video ID for inserts and the playlist item ID for deletes."""
+
+
+class MutationResult:
+    """
+    Outcome of a PlaylistMutationBatch run:
+    - succeeded : [(Mutation, API response)], one pair per queued mutation
+    - failed    : [(Mutation, error)] for mutations that failed for good or
+                  were never sent because the run was aborted
+    - batches   : number of multipart batch calls sent, retries included
+    A mutation queued twice has a pair for each time.
+    """
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = []
+        self.batches = 0
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def summary(self):
+        """The targets that succeeded and failed, and the batch calls sent."""
+        return {
+            "succeeded": [mutation.target for mutation, _ in self.succeeded],
+            "failed": [mutation.target for mutation, _ in self.failed],
+            "batches": self.batches,
+        }
+
+    def __repr__(self):
+        return (
+            f"MutationResult(succeeded={len(self.succeeded)}, "
+            f"failed={len(self.failed)}, batches={self.batches})"
+        )
+
+
+class PlaylistMutationBatch:
+    """
+    Groups playlistItems inserts and deletes into multipart batch calls.
+
+    Queue mutations with `insert`/`delete`, then `execute` sends them 50 per
+    batch. Sub-requests failing with a retryable status are re-submitted in
+    a follow-up batch up to `max_retries` times; everything else is reported
+    in the returned MutationResult. If the quota runs out or the connection
+    fails, no further batch is sent and the mutations not applied yet are
+    reported as failed with that error. Per-item callbacks receive
+    (mutation, response, exception) once the item's outcome is final.
+
+    Args:
+        manager (YouTubeAPIManager): An authenticated manager to send batches with
+    """
+
+    def __init__(
+        self, manager, batch_size=MAX_BATCH_SIZE, max_retries=2, retry_delay=1.0
+    ):
+        self.manager = manager
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue = []
+
+    def __len__(self):
+        return len(self._queue)
+
+    def insert(self, playlist_id, video_id, callback=None):
+        """Queue adding `video_id` to the end of `playlist_id`."""
+        return self._add(Mutation("insert", playlist_id, video_id), callback)
+
+    def delete(self, playlist_item_id, playlist_id=None, callback=None):
+        """Queue removing the playlist item `playlist_item_id`."""
+        return self._add(Mutation("delete", playlist_id, playlist_item_id), callback)
+
+    def _add(self, mutation, callback):
+        self._queue.append((mutation, callback))
+        return mutation
+
+    def _build_request(self, mutation):
+        playlist_items = self.manager.youtube.playlistItems()
+        if mutation.kind == "insert":
+            return playlist_items.insert(
+                part="snippet",
+                body={
+                    "snippet": {
+                        "playlistId": mutation.playlist_id,
+                        "resourceId": {
+                            "kind": "youtube#video",
+                            "videoId": mutation.target,
+                        },
+                    }
+                },
+            )
+        return playlist_items.delete(id=mutation.target)
+
+    def execute(self):
+        """
+        Send every queued mutation and return a MutationResult.
+        Batches are sent one after another so inserts keep their order.
+        """
+        result = MutationResult()
+        pending = list(self._queue)
+        self._queue = []
+        aborted = None
+
+        for attempt in range(self.max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                logger.info(
+                    "Retrying %d failed mutations in %.1fs.", len(pending), delay
+                )
+                time.sleep(delay)
+
+            retry = []
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start : start + self.batch_size]
+                if aborted is not None:
+                    outcomes = [(entry, None, aborted) for entry in chunk]
+                else:
+                    outcomes, aborted = self._send(chunk, result)
+                for (mutation, callback), response, error in outcomes:
+                    last_attempt = attempt == self.max_retries or aborted is not None
+                    if error is None:
+                        self._finish(mutation, callback, result, response=response)
+                    elif (
+                        getattr(error, "status_code", None) in RETRYABLE_STATUSES
+                        and not last_attempt
+                    ):
+                        retry.append((mutation, callback))
+                    else:
+                        self._finish(mutation, callback, result, error=error)
+            if aborted is not None:
+                for mutation, callback in retry:
+                    self._finish(mutation, callback, result, error=aborted)
+                break
+            pending = retry
+
+        if result.failed:
+            logger.error(
+                "%d of %d playlist mutations failed.",
+                len(result.failed),
+                len(result.failed) + len(result.succeeded),
+            )
+        return result
+
+    def _send(self, chunk, result):
+        """
+        Send one batch. Returns the ((mutation, callback), response, error)
+        of every entry, and the error that should stop the run, if any.
+        Sub-requests answered before a failure of the whole batch keep
+        their outcome.
+        """
+        responses = {}
+        errors = {}
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                responses[int(request_id)] = response
+            else:
+                errors[int(request_id)] = exception
+
+        batch = self.manager.youtube.new_batch_http_request(callback=on_response)
+        for index, (mutation, _) in enumerate(chunk):
+            batch.add(self._build_request(mutation), request_id=str(index))
+
+        result.batches += 1
+        aborted = None
+        try:
+            self.manager.execute(batch)
+        except HttpError as e:
+            logger.error("Batch of %d mutations failed: %s", len(chunk), e)
+            batch_error = e
+        except ABORTING_ERRORS as e:
+            logger.error("Batch of %d mutations aborted: %s", len(chunk), e)
+            batch_error = aborted = e
+        else:
+            batch_error = None
+
+        outcomes = []
+        for index, entry in enumerate(chunk):
+            if index in responses:
+                outcomes.append((entry, responses[index], None))
+            else:
+                outcomes.append((entry, None, errors.get(index, batch_error)))
+        return outcomes, aborted
+
+    @staticmethod
+    def _finish(mutation, callback, result, response=None, error=None):
+        if error is not None:
+            result.failed.append((mutation, error))
+            logger.error(
+                "Failed to %s %s in playlist %s: %s",
+                mutation.kind,
+                mutation.target,
+                mutation.playlist_id,
+                error,
+            )
+        else:
+            result.succeeded.append((mutation, response))
+        if callback is not None:
+            callback(mutation, response, error)
@@ -1,6 +1,17 @@
+import itertools
 import logging
+import config
 from authenticate import YouTubeAPIManager
+from catalog import PlaylistCatalog
 from googleapiclient.errors import HttpError
+from lazy import lazy_import
+from mutations import PlaylistMutationBatch
+from quota import estimate_cost
+from snapshots import PlaylistSnapshotStore, sync_playlist
+
+# Only needed when deduplicating or ranking songs, and pull in numpy.
+dedup = lazy_import("dedup")
+affinity = lazy_import("affinity")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,29 +24,22 @@ class AutomateNew(YouTubeAPIManager):
     - Get playlist items from a popular playlist
     - Add only the new songs (not already in my playlist)
     - Optionally, limit the number of songs to add
+    - Optionally, add the songs whose artists fit my playlist best first
 
     Args:
         YouTubeAPIManager (class): Authenticator class
+        snapshot_store (PlaylistSnapshotStore): Where the target playlist's
+            video IDs are kept between runs
     """
 
+    def __init__(self, *args, snapshot_store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.snapshot_store = snapshot_store or PlaylistSnapshotStore()
+
     def get_playlist_items(self, playlist_id):
         """Fetch all items from a playlist."""
-        items = []
-        page_token = None
         try:
-            while True:
-                request = self.youtube.playlistItems().list(
-                    part="snippet,contentDetails",
-                    playlistId=playlist_id,
-                    maxResults=50,  # Max 50 results per request
-                    pageToken=page_token,
-                )
-                response = request.execute()
-                items.extend(response.get("items", []))
-                page_token = response.get("nextPageToken")
-
-                if not page_token:
-                    break
+            items = list(self.iter_playlist_items(playlist_id))
 
             if not items:
                 logger.warning("No items found in playlist %s", playlist_id)
@@ -58,7 +62,7 @@ class AutomateNew(YouTubeAPIManager):
                     }
                 },
             )
-            response = request.execute()
+            response = self.execute(request)
             logger.info(
                 "Successfully added video ID %s to playlist %s", video_id, playlist_id
             )
@@ -70,67 +74,199 @@ class AutomateNew(YouTubeAPIManager):
             )
             return None
 
-    def add_new_songs(self, from_playlist_id, to_playlist_id, number_of_songs_to_add):
-        """Add songs from `from_playlist_id` to `to_playlist_id` if they are not already in the target playlist."""
-        from_playlist_items = self.get_playlist_items(from_playlist_id)
-        if not from_playlist_items:
+    def add_songs_to_playlist(self, playlist_id, video_ids):
+        """
+        Add many songs to the playlist using batched insert calls.
+        Returns the MutationResult with the per-song outcome.
+        """
+        batch = PlaylistMutationBatch(self)
+        for video_id in video_ids:
+            batch.insert(playlist_id, video_id)
+        result = batch.execute()
+        logger.info(
+            "Added %d of %d songs to playlist %s in %d batch call(s).",
+            len(result.succeeded),
+            len(video_ids),
+            playlist_id,
+            result.batches,
+        )
+        return result
+
+    def get_playlist_catalog(self, playlist_id):
+        """
+        The PlaylistCatalog of a playlist, from an incremental snapshot sync.
+        Costs a single request when the playlist has not changed since the
+        last run.
+        """
+        diff = sync_playlist(self, playlist_id, self.snapshot_store)
+        return PlaylistCatalog.from_snapshot(diff.items)
+
+    def get_playlist_video_ids(self, playlist_id):
+        """The set of video IDs in a playlist; see get_playlist_catalog."""
+        return set(self.get_playlist_catalog(playlist_id).video_ids())
+
+    def iter_source_items(self, playlist_ids):
+        """
+        Streams the items of several source playlists one after the other.
+        A source that cannot be fetched is logged and skipped.
+        """
+        for playlist_id in playlist_ids:
+            try:
+                yield from self.iter_playlist_items(playlist_id)
+            except HttpError as e:
+                logger.error(
+                    "Failed to retrieve playlist items for %s : %s ", playlist_id, e
+                )
+
+    @staticmethod
+    def find_new_songs(items, known_video_ids, limit, known_songs=None):
+        """
+        Picks up to `limit` items whose video is not in `known_video_ids`
+        (a set or PlaylistCatalog), skipping duplicates. With `known_songs`
+        (a dedup.DuplicateIndex), items whose title is another upload of a
+        song in it are skipped too, and the picked ones are added to it.
+        Stops consuming `items` as soon as enough are found, so a streamed
+        source stops paging early.
+        """
+        seen = set()
+        new_songs = []
+        for item in items:
+            if len(new_songs) >= limit:
+                break
+            video_id = item["contentDetails"]["videoId"]
+            if video_id in known_video_ids or video_id in seen:
+                continue
+            seen.add(video_id)
+            if known_songs is not None:
+                title = item["snippet"]["title"]
+                if title in known_songs:
+                    logger.info("Skipping '%s', already in the playlist.", title)
+                    continue
+                known_songs.add(video_id, title)
+            new_songs.append(item)
+        return new_songs
+
+    @staticmethod
+    def index_songs(catalog, threshold):
+        """A dedup.DuplicateIndex of the titles in a PlaylistCatalog."""
+        known_songs = dedup.DuplicateIndex(threshold)
+        known_songs.add_many((entry.video_id, entry.title) for entry in catalog)
+        return known_songs
+
+    def rank_songs(self, items, catalog):
+        """
+        Sorts playlist items by the affinity of their artists to the playlist
+        in `catalog` (a PlaylistCatalog), best first; see
+        affinity.ArtistAffinity. The artist model is built from the snapshot
+        store and cached there between runs.
+        """
+        model = affinity.ArtistAffinity.from_snapshots(self.snapshot_store.directory)
+        return model.rank(items, [entry.title for entry in catalog])
+
+    def add_new_songs(
+        self,
+        from_playlist_id,
+        to_playlist_id,
+        number_of_songs_to_add,
+        dry_run=False,
+        dedupe_threshold=None,
+        rank=False,
+    ):
+        """Add songs from `from_playlist_id` to `to_playlist_id` if they are not already in the target playlist.
+        `from_playlist_id` may also be a list of source playlists, searched in
+        order with duplicates across them skipped. Sources are streamed and
+        paging stops once enough new songs are found; the target's video IDs
+        come from a cached snapshot.
+        With `dedupe_threshold`, songs already in the target under another
+        upload (lyric video, audio, ...) are skipped too; see
+        dedup.DuplicateIndex for the threshold.
+        With `rank`, every new song of the sources is scored and the ones
+        whose artists fit the target best are added (see rank_songs), so
+        the sources are read in full.
+        With `dry_run`, nothing is inserted and the projected quota cost of the
+        inserts is returned instead."""
+        if isinstance(from_playlist_id, str):
+            from_playlist_ids = [from_playlist_id]
+        else:
+            from_playlist_ids = list(from_playlist_id)
+
+        known_future = self.submit(self.get_playlist_catalog, to_playlist_id)
+        source_items = self.iter_source_items(from_playlist_ids)
+        # The first source page is fetched while the target playlist syncs.
+        first_item = next(source_items, None)
+        try:
+            to_playlist = known_future.result()
+        except HttpError as e:
             logger.error(
-                "Failed to fetch playlist items from %s. Aborting operation. ",
-                from_playlist_id,
+                "Failed to fetch playlist items from %s. Aborting operation. %s",
+                to_playlist_id,
+                e,
             )
             return
 
-        to_playlist_items = self.get_playlist_items(to_playlist_id)
-        if not to_playlist_items:
+        if first_item is None:
             logger.error(
-                "Failed to fetch playlist items from %s. Aborting operation.",
-                to_playlist_id,
+                "Failed to fetch playlist items from %s. Aborting operation. ",
+                ", ".join(from_playlist_ids),
             )
             return
 
-        to_playlist_video_ids = {
-            item["contentDetails"]["videoId"] for item in to_playlist_items
-        }
-
-        new_songs = [
-            item
-            for item in from_playlist_items
-            if item["contentDetails"]["videoId"] not in to_playlist_video_ids
-        ]
+        known_songs = None
+        if dedupe_threshold is not None:
+            known_songs = self.index_songs(to_playlist, dedupe_threshold)
+        new_songs = self.find_new_songs(
+            itertools.chain([first_item], source_items),
+            to_playlist,
+            float("inf") if rank else number_of_songs_to_add,
+            known_songs,
+        )
+        if rank and new_songs:
+            new_songs = self.rank_songs(new_songs, to_playlist)
 
         if not new_songs:
             logger.info(
                 "No new songs to add. All songs from playlist %s are already in %s.",
-                from_playlist_items,
+                ", ".join(from_playlist_ids),
                 to_playlist_id,
             )
             return
 
         songs_to_add = new_songs[:number_of_songs_to_add]
+        video_ids = [item["contentDetails"]["videoId"] for item in songs_to_add]
+
+        if dry_run:
+            projection = {
+                "video_ids": video_ids,
+                "projected_units": estimate_cost({"insert": len(video_ids)}),
+            }
+            logger.info(
+                "Dry run: would add %d songs to %s for %d quota units.",
+                len(songs_to_add),
+                to_playlist_id,
+                projection["projected_units"],
+            )
+            return projection
 
         for item in songs_to_add:
-            video_id = item["contentDetails"]["videoId"]
-            video_title = item["snippet"]["title"]
-            logger.info("Adding '%s' to playlist %s.", video_title, to_playlist_id)
-            self.add_song_to_playlist(to_playlist_id, video_id)
+            logger.info(
+                "Adding '%s' to playlist %s.", item["snippet"]["title"], to_playlist_id
+            )
+        result = self.add_songs_to_playlist(to_playlist_id, video_ids)
 
         logger.info(
-            "Added %s new songs to playlist %s.", len(songs_to_add), to_playlist_id
+            "Added %s new songs to playlist %s.", len(result.succeeded), to_playlist_id
         )
+        return result
 
 
 # Usage example:
 def main():
-    PLAYLIST_ID = "PLmPwAQy0bOJZ3U_u5BGeFC1fE2FvzZ9Yp"  # Your playlist ID
-    FROM_PLAYLIST_ID = "PL3-sRm8xAzY9gpXTMGVHJWy_FMD67NBed"  # Famous playlist ID
-    NUMBER_OF_SONGS_TO_ADD = 5  # Number of songs to add
-
     try:
         youtube_manager = AutomateNew()
         youtube_manager.authenticate()
 
         youtube_manager.add_new_songs(
-            FROM_PLAYLIST_ID, PLAYLIST_ID, NUMBER_OF_SONGS_TO_ADD
+            config.FROM_PLAYLIST_ID, config.PLAYLIST_ID, config.NUMBER_OF_SONGS_TO_ADD
         )
         logger.info("Songs from the famous playlist added successfully.")
 
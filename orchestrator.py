@@ -0,0 +1,266 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from quota import DEFAULT_DAILY_LIMIT, QuotaExceededError, QuotaMeter
+from response_cache import ResponseCache
+from session import Session, summarize
+from snapshots import PlaylistSnapshotStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = "orchestrator_checkpoint.json"
+ACCOUNT_DEFAULTS = {
+    "token_file": "token.json",
+    "credentials_file": "credentials.json",
+    "workers": 4,  # playlists worked on at once
+    "max_in_flight": 8,  # API requests in flight at once, across all workers
+    "daily_quota": DEFAULT_DAILY_LIMIT,
+    "units_per_second": None,
+    "cache": True,
+    "jobs": ["sync"],
+    "from_playlists": [],
+    "songs_to_add": 5,
+    "dedupe_threshold": None,
+    "rank_new_songs": False,
+}
+
+
+def _sync(session, account, playlist_id):
+    return session.playlist_manager.sync_playlist_data(
+        playlist_id, account.path(playlist_id, "data.csv"), account.snapshot_store
+    )
+
+
+def _stats(session, account, playlist_id):
+    return session.youtube_manager.collect_playlist_statistics(
+        playlist_id, account.path(playlist_id, "stats.csv"), refresh=True
+    )
+
+
+def _prune(session, account, playlist_id):
+    return session.playlist_manager.remove_deleted_videos(playlist_id)
+
+
+def _add_new(session, account, playlist_id):
+    return session.automate_new.add_new_songs(
+        account.settings["from_playlists"],
+        playlist_id,
+        account.settings["songs_to_add"],
+        dedupe_threshold=account.settings["dedupe_threshold"],
+        rank=account.settings["rank_new_songs"],
+    )
+
+
+JOBS = {"sync": _sync, "stats": _stats, "prune": _prune, "add-new": _add_new}
+
+
+class Account:
+    """
+    One channel of a manifest: its settings, its playlists with their jobs,
+    and the Session holding its single authenticated client. Every account
+    has its own quota budget, response cache, worker count and data
+    directory (data/<name> by default) holding its datasets, snapshots and
+    statistics history.
+    """
+
+    def __init__(self, settings, connect=None):
+        self.settings = {**ACCOUNT_DEFAULTS, **settings}
+        self.name = self.settings["name"]
+        self.data_dir = self.settings.get("data_dir") or os.path.join(
+            "data", self.name
+        )
+        self.playlists = {}
+        for playlist in self.settings.get("playlists", []):
+            if isinstance(playlist, str):
+                playlist = {"id": playlist}
+            self.playlists[playlist["id"]] = playlist.get("jobs", self.settings["jobs"])
+        unknown = {job for jobs in self.playlists.values() for job in jobs} - set(JOBS)
+        if unknown:
+            raise ValueError(
+                f"Unknown job(s) for account {self.name}: {', '.join(sorted(unknown))}."
+            )
+
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.quota = QuotaMeter(
+            daily_limit=self.settings["daily_quota"],
+            units_per_second=self.settings["units_per_second"],
+            state_file=os.path.join(self.data_dir, "quota_usage.json"),
+        )
+        self.snapshot_store = PlaylistSnapshotStore(
+            os.path.join(self.data_dir, "snapshots")
+        )
+        cache = None
+        if self.settings["cache"]:
+            cache = ResponseCache(os.path.join(self.data_dir, "api_cache.sqlite"))
+        self.session = Session(
+            cache,
+            self.quota,
+            connect=connect,
+            history_dir=os.path.join(self.data_dir, "stats_history"),
+            snapshot_store=self.snapshot_store,
+            token_file=self.settings["token_file"],
+            credentials_file=self.settings["credentials_file"],
+            max_in_flight=self.settings["max_in_flight"],
+        )
+
+    def path(self, playlist_id, suffix):
+        return os.path.join(self.data_dir, f"{playlist_id}_{suffix}")
+
+
+def load_manifest(path):
+    """
+    Reads a JSON manifest:
+        {"checkpoint": "...", "accounts": [{"name": "music",
+          "token_file": "tokens/music.json", "playlists": ["PL...", ...],
+          "jobs": ["sync", "prune"], ...}, ...]}
+    A playlist may also be {"id": "PL...", "jobs": [...]} to override the
+    account's jobs. See ACCOUNT_DEFAULTS for the other account settings.
+    """
+    with open(path, "r", encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    names = [account.get("name") for account in manifest.get("accounts", [])]
+    if not names or None in names or len(set(names)) != len(names):
+        raise ValueError(f"{path} needs accounts with unique names.")
+    return manifest
+
+
+class Orchestrator:
+    """
+    Runs the jobs of a manifest across accounts and playlists.
+
+    Every account gets one authenticated client and its own worker pool of
+    `workers` threads; each worker takes a playlist and runs its jobs in
+    order. However many workers and managers send them, at most
+    `max_in_flight` of an account's requests are in flight at once (see
+    Session). Accounts run side by side, each within its own quota: once one
+    runs out, its remaining jobs are skipped while the others carry on.
+
+    Finished jobs are recorded in a checkpoint file after each one, so a
+    run that crashed or failed resumes where it stopped; the checkpoint is
+    removed once every job has succeeded.
+
+    Args:
+        manifest (dict): See load_manifest
+        connect (callable): Passed to every Session, e.g. to use a fake API
+    """
+
+    def __init__(self, manifest, connect=None):
+        self.accounts = [
+            Account(settings, connect) for settings in manifest["accounts"]
+        ]
+        self.checkpoint_file = manifest.get("checkpoint", DEFAULT_CHECKPOINT)
+        self.done = {}
+        self._lock = threading.Lock()
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_file):
+            return {}
+        with open(self.checkpoint_file, "r", encoding="utf-8") as checkpoint:
+            return json.load(checkpoint)["done"]
+
+    def _record(self, key, record):
+        with self._lock:
+            self.done[key] = record
+            tmp = self.checkpoint_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as checkpoint:
+                json.dump({"done": self.done}, checkpoint, default=str)
+            os.replace(tmp, self.checkpoint_file)
+
+    def _run_playlist(self, account, playlist_id, jobs, exhausted):
+        records = []
+        failed = False
+        for job in jobs:
+            key = f"{account.name}/{playlist_id}/{job}"
+            record = {"account": account.name, "playlist_id": playlist_id, "job": job}
+            records.append(record)
+            if key in self.done:
+                record.update(self.done[key], resumed=True)
+                continue
+            if failed:  # later jobs of a playlist build on the earlier ones
+                record.update(ok=False, error="skipped, an earlier job failed")
+                continue
+            if exhausted.is_set():
+                record.update(ok=False, error="skipped, quota exceeded")
+                continue
+            start = time.perf_counter()
+            try:
+                result = JOBS[job](account.session, account, playlist_id)
+                record.update(ok=True, result=summarize(result))
+            except QuotaExceededError as e:
+                exhausted.set()
+                record.update(ok=False, error=str(e))
+            except Exception as e:
+                record.update(ok=False, error=f"{type(e).__name__}: {e}")
+            record["seconds"] = round(time.perf_counter() - start, 3)
+            if record["ok"]:
+                self._record(key, {"ok": True, "result": record["result"]})
+            else:
+                logger.error("%s failed: %s", key, record["error"])
+                failed = True
+        return records
+
+    def run(self, fresh=False):
+        """
+        Runs every job not yet in the checkpoint (all of them with `fresh`).
+        Returns a summary with one record per job, per-account quota usage
+        and the wall time.
+        """
+        start = time.perf_counter()
+        self.done = {} if fresh else self._load_checkpoint()
+        if self.done:
+            logger.info("Resuming: %d job(s) already done.", len(self.done))
+
+        executors = []
+        futures = []
+        for account in self.accounts:
+            executor = ThreadPoolExecutor(
+                account.settings["workers"], thread_name_prefix=account.name
+            )
+            executors.append(executor)
+            exhausted = threading.Event()
+            for playlist_id, jobs in account.playlists.items():
+                futures.append(
+                    executor.submit(
+                        self._run_playlist, account, playlist_id, jobs, exhausted
+                    )
+                )
+        records = [record for future in futures for record in future.result()]
+        for executor in executors:
+            executor.shutdown()
+
+        ok = all(record["ok"] for record in records)
+        if ok and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+        return {
+            "ok": ok,
+            "seconds": round(time.perf_counter() - start, 3),
+            "jobs": records,
+            "quota": {account.name: account.quota.stats() for account in self.accounts},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a playlist manifest.")
+    parser.add_argument("manifest", help="JSON manifest of accounts and playlists")
+    parser.add_argument(
+        "--fresh", action="store_true", help="ignore the checkpoint and start over"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    summary = Orchestrator(load_manifest(args.manifest)).run(fresh=args.fresh)
+    print(json.dumps(summary, default=str))
+    if metrics.registry.enabled:
+        metrics.registry.write()
+    return 0 if summary["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
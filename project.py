@@ -1,51 +1,50 @@
-from Video_stats import YouTubePlaylistManager
-from manager import PlaylistManager, parse_video_title
-from new_releases import AutomateNew
-from collections import Counter
-import csv
-import re
+from config import DEDUPE_THRESHOLD, load_config, playlist_file
+from quota import QuotaExceededError, QuotaMeter
+from response_cache import ResponseCache
+from session import Session, summarize
+from lazy import lazy_import
+import metrics
+import argparse
+import contextlib
+import json
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
+import sys
+import time
 import logging
 
+# Feature modules pull in pandas, pyarrow, matplotlib and the Google client
+# libraries, so they are loaded only when a command first needs them.
+Video_stats = lazy_import("Video_stats")
+artists = lazy_import("artists")
+cleaning = lazy_import("cleaning")
+dataset = lazy_import("dataset")
+charts = lazy_import("charts")
+catalog = lazy_import("catalog")
+dedup = lazy_import("dedup")
+pd = lazy_import("pandas")
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-PLAYLIST_ID = "PLmPwAQy0bOJZ3U_u5BGeFC1fE2FvzZ9Yp"
-FROM_PLAYLIST_ID = "PL3-sRm8xAzY9gpXTMGVHJWy_FMD67NBed"
-STATS_OUTPUT_CSV = "playlist_stats.csv"
-NUMBER_OF_SONGS_TO_ADD = 5
-DATA_PLAYLIST_CSV = "clean_playlist_data.csv"
+# Exit codes for schedulers; argparse itself exits with 2 on bad usage.
+EXIT_OK = 0
+EXIT_FAILED = 1  # at least one step failed, the others still ran
+EXIT_QUOTA = 3  # the daily quota ran out and the remaining steps were skipped
 
 
-def clean_stats(input_csv, output_csv):
+@metrics.timed("clean_stats")
+def clean_stats(input_csv, output_csv, engine="csv"):
     """
-    Cleans up text in the CSV file (e.g., removes certain words).
+    Cleans up text in the dataset (e.g., removes certain words).
+    IDs and numeric columns are copied as they are. Datasets stored in
+    Feather are cleaned column-typed; plain CSV files are streamed, use
+    engine="pandas" for vectorized cleaning of large ones (see cleaning.clean_csv).
     """
-
-    def clean_text(text):
-        text = text.lower()
-        text = re.sub(r"\[.*?\]|\(.*?\)|\{.*?\}", "", text)
-        words_to_remove = ["official", "music", "video", "lyrics"]
-        text = re.sub(
-            r"\b(?:" + "|".join(words_to_remove) + r")\b", "", text, flags=re.IGNORECASE
-        )
-        return " ".join(text.split())
-
-    with open(input_csv, "r", newline="", encoding="utf-8") as input_file, open(
-        output_csv, "w", newline="", encoding="utf-8"
-    ) as output_file:
-        reader = csv.reader(input_file)
-        writer = csv.writer(output_file)
-
-        writer.writerow(next(reader))  # Write header
-
-        for row in reader:
-            writer.writerow([clean_text(cell) for cell in row])
-
-    logger.info(f"Data cleaning complete. Saved to {output_csv}.")
+    if os.path.exists(dataset.dataset_path(input_csv)):
+        cleaning.clean_dataset(input_csv, output_csv)
+    else:
+        cleaning.clean_csv(input_csv, output_csv, engine=engine)
 
 
 def clean_playlist_data(
@@ -57,52 +56,445 @@ def clean_playlist_data(
     clean_stats(input_csv, output_csv)
 
 
-def common_artists(csv_file, artist_column="Artist", top_n=20):
+@metrics.timed("common_artists")
+def common_artists(
+    csv_file,
+    artist_column="Artist",
+    top_n=20,
+    split_credits=True,
+    capacity=None,
+    output=None,
+):
     """
-    Plot the top N most frequent artists.
+    Plot the top N most frequent artists to `output` (PNG or SVG path, or a
+    buffer; charts/top_artists.png by default) and return the (artist,
+    count) pairs plotted.
+    `csv_file` may be one file or a list of playlist files and snapshots,
+    counted together in a single streaming pass (see artists.count_artists).
+    Credits such as "A, B" or "A ft. B" count toward each artist unless
+    `split_credits` is False; `capacity` bounds memory with approximate counts.
     """
-    artists = []
-    with open(csv_file, "r", newline="", encoding="utf-8") as csvfile:
-        reader = csv.reader(csvfile)
-        header = next(reader)
+    try:
+        artist_counts = artists.count_artists(
+            csv_file, artist_column, split=split_credits, capacity=capacity
+        )
+    except ValueError as e:
+        logger.error(e)
+        return
+
+    top_artists = artist_counts.most_common(top_n)
+    if output is None:
+        output = os.path.join(charts.CHART_DIR, "top_artists.png")
+    if top_artists:
+        artist_names, counts = zip(*top_artists)
+        chart = charts.BarChart(
+            f"Top {top_n} Most Common Artists in Playlist",
+            artist_names,
+            counts,
+            "Number of Songs",
+            "Artists",
+        )
+        charts.renderer.render(chart, output)
+        if isinstance(output, str):
+            logger.info(f"Top artists chart saved to {output}.")
+    else:
+        logger.error("No artist data to plot.")
+    return top_artists
 
+
+def show_growth(history, days=7, top_n=10, data_csv="playlist_data.csv"):
+    """
+    Print the videos that gained the most views over the last `days` days,
+    titled from the playlist data when it is available.
+    """
+    growth = history.growth(days)
+    if growth.empty:
+        logger.error("No statistics history yet. Refresh the statistics first.")
+        return
+    videos = catalog.PlaylistCatalog()
+    if dataset.dataset_exists(data_csv):
+        videos = catalog.PlaylistCatalog.from_dataset(
+            dataset.load_dataset(data_csv, ["Video ID", "Title", "Artist", "Song"])
+        )
+
+    print(f"\nTop {top_n} by views gained over the last {days} days:")
+    for video_id, row in growth.head(top_n).iterrows():
+        video = videos.get(video_id)
+        print(f"{row['views_delta']:>+12,}  {video.title if video else video_id}")
+
+
+class Run:
+    """
+    Runs the steps of one command and records their results and timings
+    for the summary. A failing step is logged and the next one still runs;
+    once the quota is exhausted, the remaining steps are skipped.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.steps = []
+        self.quota_exceeded = False
+        self.start = time.perf_counter()
+
+    def step(self, command, target, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) as one step; returns its result or None."""
+        record = {"command": command, "target": target, "ok": False}
+        self.steps.append(record)
+        if self.quota_exceeded:
+            record["error"] = "skipped, quota exceeded"
+            return None
+        start = time.perf_counter()
+        result = None
         try:
-            artist_index = header.index(artist_column)
-        except ValueError:
-            logger.error(f"Column '{artist_column}' not found in the CSV header.")
-            return
+            result = func(*args, **kwargs)
+            record["ok"] = True
+            record["result"] = summarize(result)
+        except QuotaExceededError as e:
+            self.quota_exceeded = True
+            record["error"] = str(e)
+            logger.error(f"{command} {target}: {e}")
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            logger.error(f"{command} {target} failed: {e}")
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    @property
+    def exit_code(self):
+        if self.quota_exceeded:
+            return EXIT_QUOTA
+        if not all(step["ok"] for step in self.steps):
+            return EXIT_FAILED
+        return EXIT_OK
+
+    def summary(self, command):
+        return {
+            "command": command,
+            "ok": self.exit_code == EXIT_OK,
+            "exit_code": self.exit_code,
+            "seconds": round(time.perf_counter() - self.start, 3),
+            "steps": self.steps,
+            "cache": self.session.cache.stats(),
+            "quota": self.session.quota.stats(),
+        }
+
+
+def cmd_sync(run, config, args):
+    playlist_ids = args.playlists or config["playlists"]
+    for playlist_id in playlist_ids:
+        path = playlist_file(
+            args.output or config["data_csv"], playlist_id, playlist_ids
+        )
+        run.step(
+            "sync",
+            playlist_id,
+            lambda: run.session.playlist_manager.sync_playlist_data(playlist_id, path),
+        )
 
-        for row in reader:
-            artists.append(row[artist_index])
 
-    if artists:
-        artist_counts = Counter(artists)
-        top_artists = artist_counts.most_common(top_n)
+def cmd_stats(run, config, args):
+    playlist_ids = args.playlists or config["playlists"]
 
-        artist_names, counts = zip(*top_artists)
-        plt.figure(figsize=(10, 6))
-        plt.barh(artist_names, counts, color="skyblue")
-        plt.xlabel("Number of Songs")
-        plt.ylabel("Artists")
-        plt.title(f"Top {top_n} Most Common Artists in Playlist")
-        plt.gca().invert_yaxis()
-        plt.tight_layout()
-        plt.show()
-    else:
-        logger.error("No artist data to plot.")
+    def collect(playlist_id):
+        youtube_manager = run.session.youtube_manager
+        output_csv = playlist_file(config["stats_csv"], playlist_id, playlist_ids)
+        df = youtube_manager.collect_playlist_statistics(
+            playlist_id, output_csv, refresh=not args.cached
+        )
+        if args.chart:
+            youtube_manager.visualize_statistics(
+                df, playlist_file(args.chart, playlist_id, playlist_ids)
+            )
+        return df
+
+    for playlist_id in playlist_ids:
+        run.step("stats", playlist_id, collect, playlist_id)
+    if not args.cached:
+        run.step("stats", "history", lambda: run.session.history.compact())
+
+
+def cmd_clean(run, config, args):
+    files = []
+    if args.what in ("data", "all"):
+        files.append((config["data_csv"], config["clean_data_csv"]))
+    if args.what in ("stats", "all"):
+        files.append((config["stats_csv"], config["clean_stats_csv"]))
+    playlist_ids = config["playlists"]
+    for playlist_id in playlist_ids:
+        for input_csv, output_csv in files:
+            input_csv = playlist_file(input_csv, playlist_id, playlist_ids)
+            output_csv = playlist_file(output_csv, playlist_id, playlist_ids)
+            run.step(
+                "clean", input_csv, clean_stats, input_csv, output_csv, args.engine
+            )
+
+
+def cmd_top_artists(run, config, args):
+    playlist_ids = config["playlists"]
+    sources = args.files or [
+        playlist_file(config["clean_data_csv"], playlist_id, playlist_ids)
+        for playlist_id in playlist_ids
+    ]
+
+    def plot():
+        top = common_artists(
+            sources,
+            top_n=args.top,
+            split_credits=not args.no_split,
+            capacity=args.capacity,
+            output=args.output,
+        )
+        if top is None:
+            raise ValueError(f"No artist column in {', '.join(sources)}.")
+        return top
+
+    top = run.step("top-artists", ", ".join(sources), plot)
+    for artist, count in top or []:
+        print(f"{count:>6}  {artist}")
+
+
+def cmd_add_new(run, config, args):
+    from_playlist_ids = args.from_playlists or config["from_playlists"]
+    count = args.count if args.count is not None else config["songs_to_add"]
+    rank = args.rank if args.rank is not None else config["rank_new_songs"]
+    threshold = args.dedupe if args.dedupe is not None else config["dedupe_threshold"]
+    for playlist_id in args.playlists or config["playlists"]:
+        run.step(
+            "add-new",
+            playlist_id,
+            lambda: run.session.automate_new.add_new_songs(
+                from_playlist_ids,
+                playlist_id,
+                count,
+                dry_run=args.dry_run,
+                dedupe_threshold=threshold,
+                rank=rank,
+            ),
+        )
 
 
-def main():
+def find_duplicate_songs(datasets, threshold=DEDUPE_THRESHOLD):
     """
-    Main program to manage playlist and stats.
+    The rows of the playlist `datasets` (Video ID and Title columns) that
+    are uploads of the same song as another row, within a dataset or across
+    them. Rows get a "Group" number per song and a "Dataset" column, and are
+    sorted by group.
     """
-    youtube_manager = YouTubePlaylistManager()
-    playlist_manager = PlaylistManager()
-    automate_new = AutomateNew()
+    df = pd.concat(
+        [
+            dataset.load_dataset(path, ["Video ID", "Title"]).assign(Dataset=path)
+            for path in datasets
+        ],
+        ignore_index=True,
+    )
+    groups = dedup.find_duplicates(enumerate(df["Title"]), threshold)
+    rows = [row for group in groups for row in group]
+    numbers = [number for number, group in enumerate(groups, 1) for _ in group]
+    report = df.iloc[rows].assign(Group=numbers)
+    return report[["Group", "Video ID", "Title", "Dataset"]].reset_index(drop=True)
+
+
+def cmd_duplicates(run, config, args):
+    playlist_ids = args.playlists or config["playlists"]
+    datasets = args.files or [
+        playlist_file(config["data_csv"], playlist_id, playlist_ids)
+        for playlist_id in playlist_ids
+    ]
+    threshold = next(
+        value
+        for value in (args.threshold, config["dedupe_threshold"], DEDUPE_THRESHOLD)
+        if value is not None
+    )
+    report = run.step(
+        "duplicates", ", ".join(datasets), find_duplicate_songs, datasets, threshold
+    )
+    if report is None:
+        return
+    if args.output:
+        report.to_csv(args.output, index=False)
+    for group, video_id, title, _ in report.itertuples(index=False, name=None):
+        print(f"{group:>5}  {video_id}  {title}")
+
+
+def cmd_prune(run, config, args):
+    for playlist_id in args.playlists or config["playlists"]:
+        run.step(
+            "prune",
+            playlist_id,
+            lambda: run.session.playlist_manager.remove_deleted_videos(
+                playlist_id, dry_run=args.dry_run
+            ),
+        )
+
 
-    youtube_manager.authenticate()
-    playlist_manager.authenticate()
-    automate_new.authenticate()
+def cmd_reorder(run, config, args):
+    playlist_ids = args.playlists or config["playlists"]
+
+    def reorder(playlist_id):
+        order_by = args.by
+        if order_by == "views":
+            df = run.session.youtube_manager.collect_playlist_statistics(
+                playlist_id,
+                playlist_file(config["stats_csv"], playlist_id, playlist_ids),
+                ["Video ID", "Views"],
+            )
+            order_by = dict(zip(df["Video ID"], df["Views"]))
+        return run.session.playlist_manager.reorder_playlist(
+            playlist_id, order_by, reverse=args.reverse, dry_run=args.dry_run
+        )
+
+    for playlist_id in playlist_ids:
+        run.step("reorder", playlist_id, reorder, playlist_id)
+
+
+COMMANDS = {
+    "sync": cmd_sync,
+    "stats": cmd_stats,
+    "clean": cmd_clean,
+    "top-artists": cmd_top_artists,
+    "add-new": cmd_add_new,
+    "prune": cmd_prune,
+    "duplicates": cmd_duplicates,
+    "reorder": cmd_reorder,
+}
+
+
+def cmd_run(run, config, args):
+    parser = build_parser()
+    for step in args.steps:
+        COMMANDS[step](run, config, parser.parse_args([step]))
+
+
+def _add_common_options(parser, suppress=False):
+    # On subcommands the defaults are suppressed, so they do not overwrite
+    # the same options given before the subcommand.
+    parser.add_argument(
+        "--config",
+        default=argparse.SUPPRESS if suppress else None,
+        help="JSON config file overriding the defaults in config.py",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        default=argparse.SUPPRESS if suppress else False,
+        help="print a machine-readable summary with timings to stdout",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        default=argparse.SUPPRESS if suppress else None,
+        help="record API and data metrics and write them to FILE "
+        "(JSON for .json, Prometheus text otherwise)",
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="project.py",
+        description="Manage YouTube playlists. Without a command, opens the menu.",
+    )
+    _add_common_options(parser)
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    def command(name, help):
+        subparser = commands.add_parser(name, help=help)
+        _add_common_options(subparser, suppress=True)
+        return subparser
+
+    sync = command("sync", "sync playlist data into the dataset")
+    sync.add_argument("playlists", nargs="*", help="playlist IDs (default: config)")
+    sync.add_argument("--output", help="dataset CSV path (default: config data_csv)")
+
+    stats = command("stats", "fetch video statistics and append them to history")
+    stats.add_argument("playlists", nargs="*", help="playlist IDs (default: config)")
+    stats.add_argument(
+        "--cached", action="store_true", help="reuse stored statistics, fetch nothing"
+    )
+    stats.add_argument("--chart", help="also render the statistics chart to this path")
+
+    clean = command("clean", "clean playlist data and statistics")
+    clean.add_argument("--what", choices=["data", "stats", "all"], default="all")
+    clean.add_argument("--engine", choices=["csv", "pandas"], default="csv")
+
+    top = command("top-artists", "count and plot the most common artists")
+    top.add_argument("files", nargs="*", help="datasets (default: clean playlist data)")
+    top.add_argument("--top", type=int, default=20)
+    top.add_argument("--output", help="chart path (default: charts/top_artists.png)")
+    top.add_argument("--no-split", action="store_true", help="count raw credits")
+    top.add_argument("--capacity", type=int, help="approximate, bounded counting")
+
+    add_new = command("add-new", "add new songs from source playlists")
+    add_new.add_argument("playlists", nargs="*", help="target playlist IDs")
+    add_new.add_argument(
+        "--from",
+        dest="from_playlists",
+        action="append",
+        help="source playlist ID, repeatable (default: config from_playlists)",
+    )
+    add_new.add_argument("--count", type=int, help="songs to add per playlist")
+    add_new.add_argument("--dry-run", action="store_true")
+    add_new.add_argument(
+        "--dedupe",
+        nargs="?",
+        type=float,
+        const=DEDUPE_THRESHOLD,
+        metavar="THRESHOLD",
+        help="also skip other uploads of songs already in the playlist "
+        f"(song name similarity, default {DEDUPE_THRESHOLD})",
+    )
+    add_new.add_argument(
+        "--rank",
+        action=argparse.BooleanOptionalAction,
+        help="add the songs whose artists fit the playlist best, not the first ones "
+        "(default: config rank_new_songs)",
+    )
+
+    prune = command("prune", "remove deleted and private videos")
+    prune.add_argument("playlists", nargs="*", help="playlist IDs (default: config)")
+    prune.add_argument("--dry-run", action="store_true")
+
+    duplicates = command("duplicates", "report songs uploaded more than once")
+    duplicates.add_argument(
+        "playlists", nargs="*", help="playlist IDs (default: config)"
+    )
+    duplicates.add_argument(
+        "--files", nargs="+", help="datasets to search instead of the playlists'"
+    )
+    duplicates.add_argument(
+        "--threshold",
+        type=float,
+        help=f"song name similarity of near-duplicates (default {DEDUPE_THRESHOLD})",
+    )
+    duplicates.add_argument("--output", help="also write the report to this CSV")
+
+    reorder = command("reorder", "sort playlists with the fewest moves")
+    reorder.add_argument("playlists", nargs="*", help="playlist IDs (default: config)")
+    reorder.add_argument(
+        "--by",
+        choices=["title", "artist", "added", "views"],
+        default="added",
+        help="date added (default), title, artist, or views from the stored "
+        "statistics (see stats)",
+    )
+    reorder.add_argument(
+        "--reverse", action="store_true", help="descending, e.g. most viewed first"
+    )
+    reorder.add_argument("--dry-run", action="store_true", help="only project the cost")
+
+    pipeline = command("run", "run several commands in order, with config defaults")
+    pipeline.add_argument("steps", nargs="+", choices=list(COMMANDS))
+
+    command("menu", "interactive menu")
+    return parser
+
+
+def menu(session, config):
+    """
+    Interactive menu to manage playlist and stats.
+    """
+    playlist_id = config["playlists"][0]
+    data_csv, clean_data_csv = config["data_csv"], config["clean_data_csv"]
+    stats_csv = config["stats_csv"]
 
     while True:
         print("\nYouTube Playlist Manager Menu")
@@ -112,61 +504,64 @@ def main():
         print("4. Clean playlist data")
         print("5. Clean playlist statistics")
         print("6. Plot top common artists from playlist data")
-        print("7. Exit")
+        print("7. Refresh video statistics and show 7-day growth")
+        print("8. Exit")
 
-        choice = input("Enter your choice (1-7): ")
+        choice = input("Enter your choice (1-8): ")
 
         if choice == "5":
             try:
-                clean_stats(STATS_OUTPUT_CSV, "clean_playlist_stats.csv")
+                clean_stats(stats_csv, config["clean_stats_csv"])
             except Exception as e:
                 print(f"Error cleaning stats: {e}")
 
         elif choice == "4":
-            clean_playlist_data()
+            clean_playlist_data(data_csv, clean_data_csv)
 
         elif choice == "6":
-            if os.path.exists(DATA_PLAYLIST_CSV):
-                common_artists(DATA_PLAYLIST_CSV)
+            if dataset.dataset_exists(clean_data_csv):
+                common_artists(clean_data_csv)
             else:
                 logger.error(
-                    f"{DATA_PLAYLIST_CSV} does not exist. Clean the playlist data first."
+                    f"{clean_data_csv} does not exist. Clean the playlist data first."
                 )
 
         elif choice == "1":
             try:
-                automate_new.add_new_songs(
-                    FROM_PLAYLIST_ID, PLAYLIST_ID, NUMBER_OF_SONGS_TO_ADD
+                session.automate_new.add_new_songs(
+                    config["from_playlists"],
+                    playlist_id,
+                    config["songs_to_add"],
+                    dedupe_threshold=config["dedupe_threshold"],
+                    rank=config["rank_new_songs"],
                 )
                 logger.info("Songs added successfully.")
             except Exception as e:
                 logger.error(f"An error occurred: {e}")
 
         elif choice == "3":
+            youtube_manager = session.youtube_manager
             video_stats_df = youtube_manager.collect_playlist_statistics(
-                PLAYLIST_ID, STATS_OUTPUT_CSV
+                playlist_id, stats_csv, Video_stats.PLOT_COLUMNS
             )
             youtube_manager.visualize_statistics(video_stats_df)
 
         elif choice == "2":
-            playlistItems = playlist_manager.get_playlist_items(PLAYLIST_ID)
-            data = []
-            for item in playlistItems:
-                title = item["snippet"]["title"]
-                video_id = item["contentDetails"]["videoId"]
-                artist, song = parse_video_title(title)
-                data.append([title, video_id, artist or "Unknown", song])
-
-            df = pd.DataFrame(data, columns=["Title", "Video ID", "Artist", "Song"])
-            file_path = "playlist_data.csv"
-
-            if not os.path.exists(file_path):
-                df.to_csv(file_path, index=False, encoding="utf-8")
-                logger.info(f"Data saved to {file_path}")
-            else:
-                logger.info(f"{file_path} already exists.")
+            diff = session.playlist_manager.sync_playlist_data(playlist_id, data_csv)
+            logger.info(f"Playlist data synced: {diff}")
 
         elif choice == "7":
+            session.youtube_manager.collect_playlist_statistics(
+                playlist_id, stats_csv, refresh=True
+            )
+            session.history.compact()
+            show_growth(session.history, data_csv=data_csv)
+
+        elif choice == "8":
+            logger.info("API cache: %s", session.cache.stats())
+            logger.info("API quota: %s", session.quota.stats())
+            if "charts" in sys.modules:
+                logger.info("Charts: %s", charts.renderer.stats())
             print("Exiting program.")
             break
 
@@ -174,5 +569,53 @@ def main():
             print("Invalid choice. Please try again.")
 
 
+def main(argv=None):
+    """
+    Runs the command in `argv` (see --help) in one process with one shared
+    API client and returns its exit code. Without a command, opens the menu.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.metrics:
+        metrics.registry.enable(metrics.registry.profile)
+
+    session = Session(
+        ResponseCache(), QuotaMeter(state_file=config["quota_state_file"])
+    )
+    if args.command in (None, "menu"):
+        menu(session, config)
+        _write_metrics(args)
+        return EXIT_OK
+
+    run = Run(session)
+    # Library code prints progress; keep stdout for the JSON summary alone.
+    output = contextlib.redirect_stdout(sys.stderr) if args.json else None
+    with output or contextlib.nullcontext():
+        {**COMMANDS, "run": cmd_run}[args.command](run, config, args)
+
+    summary = run.summary(args.command)
+    if args.json:
+        print(json.dumps(summary, default=str))
+    else:
+        for step in summary["steps"]:
+            status = "ok" if step["ok"] else step["error"]
+            logger.info(
+                f"{step['command']} {step['target']}: {status} "
+                f"({step.get('seconds', 0):.2f} s)"
+            )
+    _write_metrics(args)
+    return summary["exit_code"]
+
+
+def _write_metrics(args):
+    # Also written when only YOUTUBE_METRICS or YOUTUBE_PROFILE enabled them.
+    if metrics.registry.enabled:
+        metrics.registry.write(args.metrics or metrics.METRICS_FILE)
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Quota units per call, from the YouTube Data API v3 cost table.
+QUOTA_COSTS = {"list": 1, "insert": 50, "update": 50, "delete": 50}
+DEFAULT_DAILY_LIMIT = 10_000
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RETRYABLE_403_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")  # daily quota resets at midnight PT
+
+
+class QuotaExceededError(Exception):
+    """Raised instead of sending a request that would cross the daily quota."""
+
+
+def cost_of(request):
+    """
+    Quota units a request will use. Batches cost the sum of their parts.
+    """
+    # BatchHttpRequest keeps its sub-requests in _requests; there is no public accessor.
+    parts = getattr(request, "_requests", None)
+    if parts is not None:
+        return sum(cost_of(part) for part in parts.values())
+    return QUOTA_COSTS.get(request.methodId.rsplit(".", 1)[-1], 1)
+
+
+def estimate_cost(calls):
+    """
+    Projected units for a mapping of API method to call count,
+    e.g. estimate_cost({"list": 4, "insert": 5}) == 254.
+    """
+    return sum(QUOTA_COSTS.get(method, 1) * count for method, count in calls.items())
+
+
+def _error_reasons(error):
+    details = error.error_details if isinstance(error.error_details, list) else []
+    return {detail.get("reason") for detail in details if isinstance(detail, dict)}
+
+
+class QuotaMeter:
+    """
+    Central quota accounting and rate limiting for YouTube API calls.
+
+    - Every request is charged its unit cost against `daily_limit`; a request
+      that would cross it raises QuotaExceededError before being sent.
+    - When `units_per_second` is set, a token bucket refilled at that rate
+      (bursting to `burst`) spaces requests out instead of tripping rate
+      limits.
+    - 429, 5xx and rate-limit 403s are retried with exponential backoff and
+      full jitter; a 403 quotaExceeded marks the day as used up.
+
+    Usage is kept per Pacific-time day and, with `state_file`, survives
+    restarts so several runs on the same day share one budget.
+    """
+
+    def __init__(
+        self,
+        daily_limit=int(os.getenv("YOUTUBE_DAILY_QUOTA", DEFAULT_DAILY_LIMIT)),
+        units_per_second=float(os.getenv("YOUTUBE_UNITS_PER_SECOND", 0)) or None,
+        burst=None,
+        max_retries=5,
+        base_delay=1.0,
+        max_delay=60.0,
+        state_file=None,
+        sleep=time.sleep,
+    ):
+        self.daily_limit = daily_limit
+        self.units_per_second = units_per_second
+        self.burst = burst if burst is not None else (units_per_second or 0)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state_file = state_file
+        self.sleep = sleep
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._day, self._used = self._load()
+
+    @staticmethod
+    def _today():
+        return datetime.datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+    def _load(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as state:
+                saved = json.load(state)
+            if saved.get("day") == self._today():
+                return saved["day"], saved["used"]
+        return self._today(), 0
+
+    def _save(self):
+        if self.state_file:
+            with open(self.state_file + ".tmp", "w", encoding="utf-8") as state:
+                json.dump({"day": self._day, "used": self._used}, state)
+            os.replace(self.state_file + ".tmp", self.state_file)
+
+    @property
+    def used(self):
+        with self._lock:
+            self._roll_day()
+            return self._used
+
+    @property
+    def remaining(self):
+        return max(self.daily_limit - self.used, 0)
+
+    def _roll_day(self):
+        today = self._today()
+        if today != self._day:
+            self._day, self._used = today, 0
+
+    def charge(self, units):
+        """
+        Reserve `units` of today's quota, raising QuotaExceededError if
+        that would cross the daily limit.
+        """
+        with self._lock:
+            self._roll_day()
+            if self._used + units > self.daily_limit:
+                left = self.daily_limit - self._used
+                raise QuotaExceededError(
+                    f"Request needs {units} units but only {left} of "
+                    f"{self.daily_limit} are left today."
+                )
+            self._used += units
+            self._save()
+
+    def throttle(self, units):
+        """
+        Block until the token bucket allows `units`. Requests larger than the
+        bucket wait for a full bucket and leave it in debt.
+        """
+        if not self.units_per_second:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._refilled_at) * self.units_per_second,
+                )
+                self._refilled_at = now
+                needed = min(units, self.burst)
+                if self._tokens >= needed:
+                    self._tokens -= units
+                    return
+                wait = (needed - self._tokens) / self.units_per_second
+            self.sleep(wait)
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff delay for retry number `attempt`."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def run(self, request, send):
+        """
+        Charge, throttle and send `request` with `send(request)`, retrying
+        transient failures. Every attempt is charged, as the API does.
+        """
+        units = cost_of(request)
+        for attempt in range(self.max_retries + 1):
+            self.charge(units)
+            self.throttle(units)
+            try:
+                return send(request)
+            except HttpError as e:
+                reasons = _error_reasons(e)
+                if e.status_code == 403 and "quotaExceeded" in reasons:
+                    with self._lock:
+                        self._used = self.daily_limit
+                        self._save()
+                    logger.error("Daily quota exhausted: %s", e)
+                    raise
+                retryable = e.status_code in RETRYABLE_STATUSES or (
+                    e.status_code == 403 and reasons & RETRYABLE_403_REASONS
+                )
+                if not retryable or attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                self.retries += 1
+                metrics.registry.inc(
+                    "youtube_api_retries_total", method=metrics.request_method(request)
+                )
+                logger.warning(
+                    "HTTP %s, retrying in %.1fs (attempt %d of %d).",
+                    e.status_code,
+                    delay,
+                    attempt + 1,
+                    self.max_retries,
+                )
+                self.sleep(delay)
+
+    def stats(self):
+        """Today's usage, remaining units and retries made this session."""
+        return {
+            "day": self._day,
+            "used": self.used,
+            "remaining": self.remaining,
+            "daily_limit": self.daily_limit,
+            "retries": self.retries,
+        }
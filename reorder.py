@@ -0,0 +1,122 @@
+from snapshots import longest_increasing_subsequence
+from titles import parse_titles
+
+# What the reordering reads of each playlist item.
+REORDER_FIELDS = (
+    "nextPageToken,items(id,snippet(title,publishedAt),contentDetails/videoId)"
+)
+
+
+def _by_title(items):
+    return {item["id"]: item["snippet"]["title"].casefold() for item in items}
+
+
+def _by_artist(items):
+    parsed = parse_titles([item["snippet"]["title"] for item in items])
+    return {
+        item["id"]: ((title.artist or "").casefold(), title.song.casefold())
+        for item, title in zip(items, parsed)
+    }
+
+
+def _by_added(items):
+    return {item["id"]: item["snippet"]["publishedAt"] for item in items}
+
+
+# Built-in orderings: each maps playlist items to {item ID: sort key}.
+ORDER_KEYS = {"title": _by_title, "artist": _by_artist, "added": _by_added}
+
+
+def order_items(items, order_by, reverse=False):
+    """
+    The playlist item IDs of `items` (playlistItems resources) in the new
+    order. `order_by` is the name of an ORDER_KEYS ordering, or a mapping of
+    video ID to sort value, e.g. views from collect_playlist_statistics;
+    videos missing from it go last. Ties keep their current order, so
+    they cost no moves.
+    """
+    if isinstance(order_by, str):
+        if order_by not in ORDER_KEYS:
+            raise ValueError(
+                f"Unknown order {order_by!r}, use one of {', '.join(ORDER_KEYS)} "
+                "or a mapping of video ID to value."
+            )
+        keys = ORDER_KEYS[order_by](items)
+    else:
+        keys = {
+            item["id"]: order_by[item["contentDetails"]["videoId"]]
+            for item in items
+            if item["contentDetails"]["videoId"] in order_by
+        }
+    ranked = [item["id"] for item in items if item["id"] in keys]
+    missing = [item["id"] for item in items if item["id"] not in keys]
+    return sorted(ranked, key=keys.__getitem__, reverse=reverse) + missing
+
+
+class _PrefixCounts:
+    """
+    A Fenwick tree over the positions 0..n-1, each holding a count: add to a
+    position and count the positions before an index in O(log n).
+    """
+
+    def __init__(self, counts):
+        self.tree = [0, *counts]
+        for index in range(1, len(self.tree)):
+            parent = index + (index & -index)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[index]
+
+    def add(self, position, delta):
+        index = position + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def before(self, position):
+        total = 0
+        while position > 0:
+            total += self.tree[position]
+            position -= position & -position
+        return total
+
+
+def plan_moves(current, target):
+    """
+    The fewest position changes that turn the order `current` (playlist
+    item IDs) into `target`, a permutation of it. The items on a longest
+    run already in target order stay where they are; every other item is
+    moved once, right after its predecessor in `target`. Returns (item ID,
+    position) pairs, each position valid once the moves before it are done.
+    """
+    rank = {item_id: index for index, item_id in enumerate(target)}
+    if len(rank) != len(current) or rank.keys() != set(current):
+        raise ValueError("The target order must list every playlist item once.")
+    original = {item_id: index for index, item_id in enumerate(current)}
+    run = longest_increasing_subsequence([rank[item_id] for item_id in current])
+    kept = {current[index] for index in run}
+    # Kept and moved items are always in target order, and the items moved
+    # after a kept item sit right behind it, so an item's position is the
+    # placed items ranked before it plus the unmoved items before the kept
+    # item it follows (its anchor; None before the first kept item). Both
+    # counts come from Fenwick trees, over target ranks and current indexes,
+    # so planning takes O(n log n).
+    placed = _PrefixCounts(item_id in kept for item_id in target)
+    unmoved = _PrefixCounts(item_id not in kept for item_id in current)
+    anchor = {item_id: original[item_id] for item_id in kept}
+    moves = []
+    for index, item_id in enumerate(target):
+        if item_id in kept:
+            continue
+        unmoved.add(original[item_id], -1)
+        if index:
+            predecessor = target[index - 1]
+            anchor[item_id] = anchor[predecessor]
+            position = placed.before(index)
+            if anchor[item_id] is not None:
+                position += unmoved.before(anchor[item_id])
+        else:
+            anchor[item_id] = None
+            position = 0
+        placed.add(index, 1)
+        moves.append((item_id, position))
+    return moves
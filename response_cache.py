@@ -0,0 +1,179 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+DEFAULT_TTLS = {
+    "playlistItems": 300,  # playlists change; revalidate with ETags after 5 minutes
+    "videos": 3600,
+}
+DEFAULT_TTL = 600
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache for GET responses of the YouTube Data API.
+
+    Entries are keyed by HTTP method and full request URI (resource plus every
+    query parameter). Within its resource's TTL an entry is served without a
+    request; after that it is revalidated with `If-None-Match` so unchanged
+    pages come back as 304s. The store is kept under `max_bytes` by evicting
+    the least recently used entries.
+
+    Args:
+        path (str): SQLite file, created if missing
+        ttls (dict): Seconds to trust an entry, per resource (e.g. "videos")
+        max_bytes (int): Size budget for stored response bodies
+    """
+
+    def __init__(
+        self,
+        path=os.getenv("YOUTUBE_CACHE_FILE", "api_cache.sqlite"),
+        ttls=None,
+        max_bytes=50 * 1024 * 1024,
+    ):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                resource TEXT NOT NULL,
+                etag TEXT,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def resource_of(request):
+        """'youtube.playlistItems.list' -> 'playlistItems'"""
+        return request.methodId.split(".")[1]
+
+    @staticmethod
+    def key_of(request):
+        return f"{request.method} {request.uri}"
+
+    def lookup(self, request):
+        """
+        Returns (body, etag, fresh) for a cached request, or None on a miss.
+        `fresh` is False once the entry is older than its resource's TTL.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, stored_at FROM responses WHERE key = ?",
+                (self.key_of(request),),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), self.key_of(request)),
+            )
+            self._db.commit()
+        body, etag, stored_at = row
+        ttl = self.ttls.get(self.resource_of(request), DEFAULT_TTL)
+        return json.loads(body), etag, time.time() - stored_at < ttl
+
+    def store(self, request, response):
+        """Store a response body, keeping the store within `max_bytes`."""
+        body = json.dumps(response)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key_of(request),
+                    self.resource_of(request),
+                    response.get("etag"),
+                    body,
+                    len(body),
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+            self._db.commit()
+
+    def touch(self, request):
+        """Mark a revalidated entry as fresh again."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET stored_at = ? WHERE key = ?",
+                (time.time(), self.key_of(request)),
+            )
+            self._db.commit()
+
+    def invalidate(self, resource=None):
+        """Drop every entry, or only those of one resource."""
+        with self._lock:
+            if resource is None:
+                self._db.execute("DELETE FROM responses")
+            else:
+                self._db.execute(
+                    "DELETE FROM responses WHERE resource = ?", (resource,)
+                )
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        )
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.counters["evictions"] += len(evicted)
+        if evicted:
+            metrics.registry.inc(
+                "youtube_api_cache_events_total", len(evicted), event="evictions"
+            )
+
+    def count(self, event):
+        """Bump one of the session counters (hits, misses, revalidated)."""
+        with self._lock:
+            self.counters[event] += 1
+        metrics.registry.inc("youtube_api_cache_events_total", event=event)
+
+    def stats(self):
+        """
+        Returns counters for this session (hits, misses, revalidated,
+        evictions) plus the current number of entries and stored bytes.
+        """
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.counters["hits"],
+            "misses": self.counters["misses"],
+            "revalidated": self.counters["revalidated"],
+            "evictions": self.counters["evictions"],
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,113 @@
+import threading
+
+from lazy import lazy_import
+
+# Loaded with the first manager, so creating a Session stays cheap.
+Video_stats = lazy_import("Video_stats")
+manager = lazy_import("manager")
+new_releases = lazy_import("new_releases")
+stats_history = lazy_import("stats_history")
+
+
+class Session:
+    """
+    The API managers of one account, each built and authenticated the first
+    time it is needed, so offline work never authenticates. All of them
+    share one response cache, quota meter and API client (see
+    YouTubeAPIManager.authenticate), and one limit of `max_in_flight`
+    requests on the wire, however many threads send them. Safe to use from
+    several threads.
+
+    Args:
+        cache (ResponseCache): Shared response cache, or None
+        quota (QuotaMeter): Shared quota meter, or None
+        connect (callable): Called with each new manager instead of
+            `authenticate()`, e.g. to point it at a fake API
+        history_dir (str): StatsHistory directory, or None for the default
+        snapshot_store (PlaylistSnapshotStore): AutomateNew's snapshot store,
+            or None for the default
+        **manager_kwargs: Passed to every manager, e.g. token_file
+    """
+
+    def __init__(
+        self,
+        cache=None,
+        quota=None,
+        connect=None,
+        history_dir=None,
+        snapshot_store=None,
+        **manager_kwargs,
+    ):
+        self.cache = cache
+        self.quota = quota
+        self.connect = connect
+        self.history_dir = history_dir
+        self.snapshot_store = snapshot_store
+        self.manager_kwargs = manager_kwargs
+        self.in_flight = None
+        self._managers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, build):
+        with self._lock:
+            if name not in self._managers:
+                self._managers[name] = build()
+            return self._managers[name]
+
+    def _authenticated(self, manager_class, **kwargs):
+        api_manager = manager_class(
+            cache=self.cache,
+            quota=self.quota,
+            in_flight=self.in_flight,
+            **self.manager_kwargs,
+            **kwargs,
+        )
+        # The first manager's semaphore becomes the session's.
+        self.in_flight = api_manager.in_flight
+        if self.connect is not None:
+            self.connect(api_manager)
+        else:
+            api_manager.authenticate()
+        return api_manager
+
+    @property
+    def history(self):
+        if self.history_dir is None:
+            return self._get("history", stats_history.StatsHistory)
+        return self._get(
+            "history", lambda: stats_history.StatsHistory(self.history_dir)
+        )
+
+    @property
+    def youtube_manager(self):
+        history = self.history
+        return self._get(
+            "youtube_manager",
+            lambda: self._authenticated(
+                Video_stats.YouTubePlaylistManager, history=history
+            ),
+        )
+
+    @property
+    def playlist_manager(self):
+        return self._get(
+            "playlist_manager", lambda: self._authenticated(manager.PlaylistManager)
+        )
+
+    @property
+    def automate_new(self):
+        return self._get(
+            "automate_new",
+            lambda: self._authenticated(
+                new_releases.AutomateNew, snapshot_store=self.snapshot_store
+            ),
+        )
+
+
+def summarize(result):
+    """A JSON-friendly form of a manager call's result."""
+    if hasattr(result, "summary"):  # PlaylistDiff, MutationResult
+        return result.summary()
+    if hasattr(result, "columns"):  # DataFrame
+        return {"rows": len(result)}
+    return result
@@ -0,0 +1,206 @@
+import bisect
+import json
+import logging
+import os
+import time
+
+from googleapiclient.errors import HttpError
+
+from authenticate import PLAYLIST_ITEM_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class PlaylistSnapshotStore:
+    """
+    Keeps the last synced pages of each playlist as one JSON file per
+    playlist in `directory`. Every page is stored with its page token and
+    ETag so the next sync can revalidate it instead of downloading it again.
+    """
+
+    def __init__(self, directory=os.getenv("PLAYLIST_SNAPSHOT_DIR", "snapshots")):
+        self.directory = directory
+
+    def _path(self, playlist_id):
+        return os.path.join(self.directory, f"{playlist_id}.json")
+
+    def load(self, playlist_id):
+        """Returns the stored snapshot of a playlist, or None."""
+        path = self._path(playlist_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as snapshot_file:
+            return json.load(snapshot_file)
+
+    def save(self, playlist_id, snapshot):
+        """Write a snapshot atomically, so a crash never leaves half a file."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(playlist_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(path + ".tmp", path)
+
+
+class PlaylistDiff:
+    """
+    Result of an incremental sync:
+    - items    : the playlist after the sync, in order
+    - added    : items that were not in the previous snapshot
+    - removed  : items of the previous snapshot that are gone
+    - moved    : items whose order relative to the others changed
+    - requests : playlistItems.list calls the sync made
+    Items are dicts with "id" (playlist item ID), "video_id" and "title".
+    """
+
+    def __init__(self, items, added=(), removed=(), moved=(), requests=0):
+        self.items = items
+        self.added = list(added)
+        self.removed = list(removed)
+        self.moved = list(moved)
+        self.requests = requests
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed or self.moved)
+
+    def summary(self):
+        """Item counts of the diff and the requests it took."""
+        return {
+            "items": len(self.items),
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "moved": len(self.moved),
+            "requests": self.requests,
+        }
+
+    def __repr__(self):
+        return (
+            f"PlaylistDiff(items={len(self.items)}, added={len(self.added)}, "
+            f"removed={len(self.removed)}, moved={len(self.moved)}, "
+            f"requests={self.requests})"
+        )
+
+
+def longest_increasing_subsequence(values):
+    """
+    Returns the indexes of one longest strictly increasing subsequence of
+    `values`, in O(n log n).
+    """
+    tails = []  # tails[k]: index of the smallest tail of an increasing run of length k+1
+    tail_values = []
+    previous = [-1] * len(values)
+    for index, value in enumerate(values):
+        k = bisect.bisect_left(tail_values, value)
+        if k:
+            previous[index] = tails[k - 1]
+        if k == len(tails):
+            tails.append(index)
+            tail_values.append(value)
+        else:
+            tails[k] = index
+            tail_values[k] = value
+    run = []
+    index = tails[-1] if tails else -1
+    while index != -1:
+        run.append(index)
+        index = previous[index]
+    return run[::-1]
+
+
+def diff_items(old_items, new_items):
+    """
+    Compares two ordered item lists by playlist item ID. Items kept in place
+    are the longest run whose relative order is unchanged; every other
+    surviving item counts as moved.
+    """
+    old_positions = {item["id"]: index for index, item in enumerate(old_items)}
+    new_ids = {item["id"] for item in new_items}
+    added = [item for item in new_items if item["id"] not in old_positions]
+    removed = [item for item in old_items if item["id"] not in new_ids]
+
+    common = [item for item in new_items if item["id"] in old_positions]
+    in_place = set(
+        longest_increasing_subsequence([old_positions[item["id"]] for item in common])
+    )
+    moved = [item for index, item in enumerate(common) if index not in in_place]
+    return added, removed, moved
+
+
+def _compact(item):
+    return {
+        "id": item["id"],
+        "video_id": item["contentDetails"]["videoId"],
+        "title": item["snippet"]["title"],
+    }
+
+
+def _fetch_page(manager, playlist_id, page_token, etag):
+    """
+    Fetch one page conditionally. Returns None when the page is unchanged,
+    whether the server answered 304 or a cache handed back the same ETag.
+    """
+    request = manager.youtube.playlistItems().list(
+        part="snippet,contentDetails",
+        playlistId=playlist_id,
+        maxResults=50,
+        pageToken=page_token,
+        fields=PLAYLIST_ITEM_FIELDS,
+    )
+    if etag:
+        request.headers["If-None-Match"] = etag
+    try:
+        response = manager.execute(request)
+    except HttpError as e:
+        if etag and e.resp.status == 304:
+            return None
+        raise
+    if etag and response.get("etag") == etag:
+        return None
+    return response
+
+
+def sync_playlist(manager, playlist_id, store):
+    """
+    Incrementally sync a playlist against its stored snapshot.
+
+    Every page is revalidated with its stored ETag. A 304 costs the same
+    quota unit as a download but carries no payload, so changed pages are
+    downloaded and unchanged ones reused from the snapshot. Returns a
+    PlaylistDiff.
+    """
+    previous = store.load(playlist_id) or {"pages": []}
+    old_pages = {page["page_token"]: page for page in previous["pages"]}
+    old_items = [item for page in previous["pages"] for item in page["items"]]
+
+    pages = []
+    requests = 0
+    page_token = None
+    while True:
+        old_page = old_pages.get(page_token)
+        response = _fetch_page(
+            manager, playlist_id, page_token, old_page and old_page["etag"]
+        )
+        requests += 1
+        if response is None:
+            page = old_page
+        else:
+            page = {
+                "page_token": page_token,
+                "etag": response.get("etag"),
+                "next_page_token": response.get("nextPageToken"),
+                "items": [_compact(item) for item in response.get("items", [])],
+            }
+        pages.append(page)
+        page_token = page["next_page_token"]
+        if not page_token:
+            break
+
+    new_items = [item for page in pages for item in page["items"]]
+    added, removed, moved = diff_items(old_items, new_items)
+    store.save(
+        playlist_id,
+        {"playlist_id": playlist_id, "synced_at": time.time(), "pages": pages},
+    )
+    diff = PlaylistDiff(new_items, added, removed, moved, requests)
+    logger.info("Synced playlist %s: %s", playlist_id, diff)
+    return diff
@@ -0,0 +1,222 @@
+import datetime
+import json
+import logging
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SCHEMA = pa.schema(
+    [
+        ("video_id", pa.string()),
+        ("fetched_at", pa.timestamp("s", tz="UTC")),
+        ("views", pa.int64()),
+        ("likes", pa.uint32()),
+    ]
+)
+COMPACTED_PART = "compacted.feather"
+# Schema metadata of a compacted part: the names of the parts folded into it.
+FOLDED_PARTS_KEY = b"folded_parts"
+
+
+class StatsHistory:
+    """
+    Append-only history of video statistics, one row per
+    (video_id, fetched_at).
+
+    Every snapshot is written as a new Feather part under a directory per
+    UTC day, and parts are never rewritten except by `compact`. Range
+    queries only open the days they cover, so they cost the same however
+    long the history grows. `compact` downsamples old days to one part each.
+
+    Args:
+        directory (str): Root of the day partitions, created if missing
+    """
+
+    def __init__(self, directory=os.getenv("STATS_HISTORY_DIR", "stats_history")):
+        self.directory = directory
+
+    def _day_dir(self, day):
+        return os.path.join(self.directory, day.isoformat())
+
+    def days(self):
+        """The UTC days that have snapshots, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            datetime.date.fromisoformat(name) for name in os.listdir(self.directory)
+        )
+
+    def _parts(self, day):
+        day_dir = self._day_dir(day)
+        names = [name for name in os.listdir(day_dir) if name.endswith(".feather")]
+        # A compacted day may still hold the parts it replaced if compaction
+        # was interrupted; the compacted part already covers them. Parts
+        # appended to the day after it was compacted are read as well.
+        if COMPACTED_PART in names:
+            folded = _folded_parts(os.path.join(day_dir, COMPACTED_PART))
+            names = [name for name in names if name not in folded]
+        return [os.path.join(day_dir, name) for name in sorted(names)]
+
+    def append(self, stats, fetched_at=None):
+        """
+        Append one snapshot. `stats` maps video IDs to dicts with "views"
+        and "likes", as returned by get_videos_statistics. Returns the number
+        of rows written.
+        """
+        fetched_at = pd.Timestamp(fetched_at or pd.Timestamp.now(tz="UTC"))
+        if fetched_at.tzinfo is None:
+            fetched_at = fetched_at.tz_localize("UTC")
+        fetched_at = fetched_at.tz_convert("UTC").floor("s")
+        video_ids = list(stats)
+        table = pa.table(
+            [
+                pa.array(video_ids, pa.string()),
+                pa.array([fetched_at] * len(video_ids), HISTORY_SCHEMA[1].type),
+                pa.array([stats[v]["views"] for v in video_ids], pa.int64()),
+                pa.array([stats[v]["likes"] for v in video_ids], pa.uint32()),
+            ],
+            schema=HISTORY_SCHEMA,
+        )
+        day_dir = self._day_dir(fetched_at.date())
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(
+            day_dir, f"{fetched_at:%H%M%S}-{uuid.uuid4().hex[:8]}.feather"
+        )
+        feather.write_feather(table, path + ".tmp", compression="uncompressed")
+        os.replace(path + ".tmp", path)
+        return len(video_ids)
+
+    def read(self, start=None, end=None, video_ids=None):
+        """
+        Snapshots with `start <= fetched_at < end` (either bound optional),
+        optionally limited to `video_ids`, as a DataFrame sorted by
+        fetched_at. Only the day partitions inside the range are opened.
+        """
+        start = _utc(start)
+        end = _utc(end)
+        tables = []
+        for day in self.days():
+            if start is not None and day < start.date():
+                continue
+            if end is not None and day > end.date():
+                break
+            for path in self._parts(day):
+                tables.append(feather.read_table(path, memory_map=True))
+
+        df = pa.concat_tables(tables).to_pandas() if tables else _empty()
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df["fetched_at"] >= start
+        if end is not None:
+            mask &= df["fetched_at"] < end
+        if video_ids is not None:
+            mask &= df["video_id"].isin(list(video_ids))
+        return df[mask].sort_values("fetched_at", kind="stable", ignore_index=True)
+
+    def growth(self, days=7, now=None):
+        """
+        Views and likes gained per video over the last `days` days: the last
+        snapshot in the window minus the first. Returns a DataFrame indexed
+        by video_id, largest views delta first.
+        """
+        now = _utc(now) or pd.Timestamp.now(tz="UTC")
+        df = self.read(now - pd.Timedelta(days=days), now + pd.Timedelta(seconds=1))
+        grouped = df.groupby("video_id", sort=False)
+        first, last = grouped.first(), grouped.last()
+        growth = pd.DataFrame(
+            {
+                "views": last["views"],
+                "views_delta": last["views"] - first["views"],
+                "likes_delta": last["likes"].astype("int64")
+                - first["likes"].astype("int64"),
+                "since": first["fetched_at"],
+            }
+        )
+        return growth.sort_values("views_delta", ascending=False)
+
+    def downsample(self, start=None, end=None, freq="D"):
+        """
+        The last snapshot of each video in every `freq` interval (a pandas
+        offset alias such as "D" or "W") between `start` and `end`.
+        """
+        df = self.read(start, end)
+        buckets = df["fetched_at"].dt.floor(freq)
+        return (
+            df.groupby([df["video_id"], buckets], sort=False)
+            .tail(1)
+            .reset_index(drop=True)
+        )
+
+    def compact(self, keep_days=7, now=None):
+        """
+        Downsample every day older than `keep_days` to the last snapshot of
+        each video that day, in a single part. Recent days keep every
+        snapshot. Parts appended to a day after it was compacted are merged
+        into its compacted part. Returns the number of days compacted.
+        """
+        now = _utc(now) or pd.Timestamp.now(tz="UTC")
+        cutoff = (now - pd.Timedelta(days=keep_days)).date()
+        compacted = 0
+        for day in self.days():
+            if day >= cutoff:
+                break
+            day_dir = self._day_dir(day)
+            path = os.path.join(day_dir, COMPACTED_PART)
+            folded = _folded_parts(path) if os.path.exists(path) else set()
+            names = [
+                name
+                for name in os.listdir(day_dir)
+                if name.endswith(".feather") and name != COMPACTED_PART
+            ]
+            for name in names:
+                if name in folded:  # left over by an interrupted compaction
+                    os.remove(os.path.join(day_dir, name))
+            parts = [
+                os.path.join(day_dir, name) for name in names if name not in folded
+            ]
+            if not parts:
+                continue
+            tables = [feather.read_table(part, memory_map=True) for part in parts]
+            if os.path.exists(path):
+                tables.append(feather.read_table(path, memory_map=True))
+            df = pa.concat_tables(tables).to_pandas()
+            df = df.sort_values("fetched_at", kind="stable")
+            df = df.groupby("video_id", sort=False).tail(1)
+            table = pa.Table.from_pandas(df, HISTORY_SCHEMA, preserve_index=False)
+            metadata = {FOLDED_PARTS_KEY: json.dumps(sorted(folded.union(names)))}
+            feather.write_feather(
+                table.replace_schema_metadata(metadata),
+                path + ".tmp",
+                compression="uncompressed",
+            )
+            os.replace(path + ".tmp", path)
+            for part in parts:
+                os.remove(part)
+            compacted += 1
+        if compacted:
+            logger.info("Compacted %d day(s) of stats history.", compacted)
+        return compacted
+
+
+def _folded_parts(path):
+    """Names of the parts folded into a compacted part."""
+    metadata = feather.read_table(path, memory_map=True).schema.metadata or {}
+    return set(json.loads(metadata.get(FOLDED_PARTS_KEY, b"[]")))
+
+
+def _utc(timestamp):
+    if timestamp is None:
+        return None
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+
+def _empty():
+    return HISTORY_SCHEMA.empty_table().to_pandas()
@@ -0,0 +1,221 @@
+"""
+Performance regression suite for the API and data paths, on the fake API.
+
+Needs pytest-benchmark; without it this module is skipped. Playlist sizes
+come from PERF_SIZES (default "1000,10000"; add 100000 for a full run).
+Every test checks its API call count exactly. With PERF_BUDGETS=1, it
+also checks its mean time against a budget per 1,000 items in THRESHOLDS,
+multiplied by PERF_SLACK on slower machines; wall-clock budgets are off by
+default so a slow or shared runner does not fail the suite. To catch
+smaller regressions, compare with a saved run:
+
+    PERF_BUDGETS=1 pytest test_performance.py
+    pytest test_performance.py --benchmark-autosave
+    pytest test_performance.py --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+
+import math
+import os
+
+import httplib2
+import pandas as pd
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fake_youtube import FakeYouTubeHttp, build_client, seed_playlist, serve
+from manager import PlaylistManager
+from new_releases import AutomateNew
+from project import clean_playlist_data, clean_stats
+from snapshots import PlaylistSnapshotStore
+from Video_stats import YouTubePlaylistManager
+
+SIZES = [int(size) for size in os.getenv("PERF_SIZES", "1000,10000").split(",")]
+SLACK = float(os.getenv("PERF_SLACK", "1"))
+ROUNDS = int(os.getenv("PERF_ROUNDS", "3"))
+BUDGETS = os.getenv("PERF_BUDGETS") == "1"
+PLAYLIST_ID = "PLperf"
+
+# Seconds per 1,000 items, a few times what the paths take today.
+THRESHOLDS = {
+    "get_playlist_items": 0.15,
+    "get_playlist_items_http": 0.4,
+    "collect_playlist_statistics": 0.4,
+    "add_new_songs": 0.15,
+    "remove_deleted_videos": 0.5,
+    "clean_stats": 0.04,
+    "clean_playlist_data": 0.04,
+}
+
+
+def seeded_fake(size, deleted_every=0, **kwargs):
+    fake = FakeYouTubeHttp(**kwargs)
+    seed_playlist(fake, PLAYLIST_ID, size, deleted_every)
+    return fake
+
+
+@pytest.fixture
+def connected(tmp_path_factory):
+    """Puts a manager on a fake, with its snapshots in a temporary directory."""
+
+    def connect(manager, fake):
+        manager.youtube = build_client(fake)
+        if hasattr(manager, "snapshot_store"):
+            snapshots = tmp_path_factory.mktemp("snapshots")
+            manager.snapshot_store = PlaylistSnapshotStore(str(snapshots))
+        return manager
+
+    return connect
+
+
+def check(benchmark, name, size):
+    budget = THRESHOLDS[name] * size / 1000 * SLACK
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info["budget"] = budget
+    if BUDGETS:
+        assert mean <= budget, f"{name} ({size}): {mean:.3f} s, budget {budget:.3f} s"
+
+
+def pages(size):
+    return math.ceil(size / 50)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_get_playlist_items(benchmark, size, connected):
+    fake = seeded_fake(size)
+    playlist_manager = connected(PlaylistManager(), fake)
+
+    items = benchmark.pedantic(
+        playlist_manager.get_playlist_items, (PLAYLIST_ID,), rounds=ROUNDS
+    )
+
+    assert len(items) == size
+    assert fake.calls["playlistItems.get"] == pages(size) * ROUNDS
+    check(benchmark, "get_playlist_items", size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_get_playlist_items_over_http(benchmark, size):
+    fake = seeded_fake(size)
+    server = serve(fake)
+    try:
+        playlist_manager = PlaylistManager(http_factory=httplib2.Http)
+        playlist_manager.youtube = build_client(httplib2.Http(), server.url)
+
+        items = benchmark.pedantic(
+            playlist_manager.get_playlist_items, (PLAYLIST_ID,), rounds=ROUNDS
+        )
+    finally:
+        server.shutdown()
+
+    assert len(items) == size
+    assert fake.calls["playlistItems.get"] == pages(size) * ROUNDS
+    check(benchmark, "get_playlist_items_http", size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_collect_playlist_statistics(benchmark, size, tmp_path, connected):
+    fake = seeded_fake(size, deleted_every=10)
+    youtube_manager = connected(YouTubePlaylistManager(), fake)
+    output_csv = str(tmp_path / "stats.csv")
+
+    df = benchmark.pedantic(
+        youtube_manager.collect_playlist_statistics,
+        (PLAYLIST_ID, output_csv),
+        {"refresh": True},
+        rounds=ROUNDS,
+    )
+
+    assert len(df) == size - size // 10
+    assert fake.calls["playlistItems.get"] == pages(size) * ROUNDS
+    assert fake.calls["videos.get"] == pages(size) * ROUNDS
+    check(benchmark, "collect_playlist_statistics", size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_add_new_songs(benchmark, size, connected):
+    fakes = []
+
+    def setup():
+        fake = seeded_fake(size)
+        seed_playlist(fake, "PLsource", 100)
+        fakes.append(fake)
+        return (connected(AutomateNew(), fake), "PLsource"), {}
+
+    def add_new_songs(automate_new, source):
+        # The whole target is read; the source only until 25 songs are new.
+        return automate_new.add_new_songs(source, PLAYLIST_ID, 25)
+
+    result = benchmark.pedantic(add_new_songs, setup=setup, rounds=ROUNDS)
+
+    assert len(result.succeeded) == 25
+    fake = fakes[-1]
+    assert fake.calls["playlistItems.get"] == pages(size) + 1
+    assert fake.calls["playlistItems.post"] == 25
+    assert fake.calls["batch.post"] == 1
+    check(benchmark, "add_new_songs", size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_remove_deleted_videos(benchmark, size, connected):
+    fakes = []
+
+    def setup():
+        fake = seeded_fake(size, deleted_every=100)
+        fakes.append(fake)
+        return (connected(PlaylistManager(), fake), PLAYLIST_ID), {}
+
+    summary = benchmark.pedantic(
+        PlaylistManager.remove_deleted_videos, setup=setup, rounds=ROUNDS
+    )
+
+    deleted = size // 100
+    assert len(summary["reclaimed"]) == deleted and not summary["failed"]
+    fake = fakes[-1]
+    assert len(fake.playlists[PLAYLIST_ID]) == size - deleted
+    assert fake.calls["playlistItems.get"] == pages(size)
+    assert fake.calls["batch.post"] == math.ceil(deleted / 50)
+    check(benchmark, "remove_deleted_videos", size)
+
+
+def write_csv(path, size, columns):
+    rows = [
+        {
+            "Title": f"Artist {index % 97} - Song {index} (Official Video) [HD]",
+            "Views": index * 1000,
+            "Likes": index * 10,
+            "Artist": f"Artist {index % 97}",
+            "Song": f"Song {index} (Official Audio)",
+            "Video ID": f"v{index:06d}",
+        }
+        for index in range(size)
+    ]
+    pd.DataFrame(rows, columns=columns).to_csv(path, index=False)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_clean_stats(benchmark, size, tmp_path):
+    input_csv = str(tmp_path / "stats.csv")
+    output_csv = str(tmp_path / "clean_stats.csv")
+    write_csv(input_csv, size, ["Title", "Views", "Likes"])
+
+    benchmark.pedantic(clean_stats, (input_csv, output_csv), rounds=ROUNDS)
+
+    cleaned = pd.read_csv(output_csv)
+    assert len(cleaned) == size
+    assert "Official Video" not in cleaned["Title"].iloc[0]
+    check(benchmark, "clean_stats", size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_clean_playlist_data(benchmark, size, tmp_path):
+    input_csv = str(tmp_path / "data.csv")
+    output_csv = str(tmp_path / "clean_data.csv")
+    write_csv(input_csv, size, ["Artist", "Song", "Video ID"])
+
+    benchmark.pedantic(clean_playlist_data, (input_csv, output_csv), rounds=ROUNDS)
+
+    cleaned = pd.read_csv(output_csv)
+    assert len(cleaned) == size
+    assert "Official Audio" not in cleaned["Song"].iloc[0]
+    check(benchmark, "clean_playlist_data", size)
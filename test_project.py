@@ -1,12 +1,46 @@
 import pytest
+import datetime
+import io
+import json
 import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import httplib2
 import pandas as pd
 from unittest.mock import patch, mock_open, MagicMock
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from manager import PlaylistManager, parse_video_title
-from Video_stats import YouTubePlaylistManager
+from Video_stats import YouTubePlaylistManager, join_playlist_data
 from new_releases import AutomateNew
-from project import clean_stats, clean_playlist_data, common_artists
+from project import EXIT_FAILED, clean_stats, clean_playlist_data, common_artists
+from project import main as project_main
+from affinity import CACHE_NAME, ArtistAffinity
+from artists import SpaceSaving, count_artists, split_credits
+from catalog import PlaylistCatalog
+from charts import BarChart, ChartRenderer
+from cleaning import clean_csv, clean_text
+from dataset import dataset_path, load_dataset, save_dataset
+from dedup import DuplicateIndex, find_duplicates
+import metrics
+from mutations import PlaylistMutationBatch
+from orchestrator import Orchestrator
+from reorder import plan_moves
+from response_cache import ResponseCache
+from quota import QuotaExceededError, QuotaMeter, estimate_cost
+from stats_history import StatsHistory
+from titles import parse_title, parse_titles
+from transport import ConnectionPool, PooledHttp, TokenManager, get_session
+from snapshots import (
+    PlaylistSnapshotStore,
+    diff_items,
+    longest_increasing_subsequence,
+    sync_playlist,
+)
+from fake_youtube import FakeYouTubeHttp, build_client, seed_playlist, serve
 
 
 SAMPLE_PLAYLIST_DATA = [
@@ -93,5 +127,1232 @@ def test_youtube_playlist_statistics():
         mock_method.assert_called_once_with("playlist_id", "stats_output.csv")
 
 
+
+@pytest.fixture
+def make_fake_manager(tmp_path_factory):
+    """
+    Builds a manager on a fake API seeded with a "PLtest" playlist; its
+    snapshots go to a temporary directory pytest cleans up.
+    """
+
+    def make(manager_class, playlist_size=0, deleted_every=0):
+        fake = FakeYouTubeHttp()
+        seed_playlist(fake, "PLtest", playlist_size, deleted_every)
+        manager = manager_class()
+        manager.youtube = build_client(fake)
+        if hasattr(manager, "snapshot_store"):
+            snapshots = tmp_path_factory.mktemp("snapshots")
+            manager.snapshot_store = PlaylistSnapshotStore(str(snapshots))
+        return manager, fake
+
+    return make
+
+
+def test_get_videos_statistics_batches_by_50(make_fake_manager):
+    youtube_manager, fake = make_fake_manager(YouTubePlaylistManager, 120, 10)
+    video_ids = [item["videoId"] for item in fake.playlists["PLtest"]]
+
+    stats, missing = youtube_manager.get_videos_statistics(video_ids)
+
+    assert fake.calls["videos.get"] == 3
+    assert len(stats) == 108
+    assert missing == video_ids[9::10]
+    assert stats[video_ids[1]] == {"views": 1000, "likes": 10}
+    assert youtube_manager.get_video_statistics(video_ids[9]) is None
+
+
+def test_collect_playlist_statistics_skips_missing_videos(tmp_path, make_fake_manager):
+    youtube_manager, fake = make_fake_manager(YouTubePlaylistManager, 60, 20)
+
+    stats_df = youtube_manager.collect_playlist_statistics(
+        "PLtest", str(tmp_path / "stats.csv")
+    )
+
+    assert len(stats_df) == 57
+    assert list(stats_df.columns) == ["Title", "Video ID", "Views", "Likes", "Fetched At"]
+    assert fake.calls["videos.get"] == 2
+
+
+def test_stats_join_playlist_data_by_video_id(tmp_path, make_fake_manager):
+    youtube_manager, fake = make_fake_manager(YouTubePlaylistManager, 5)
+    fake.add_video("dup1", "Same Title", views=7)
+    fake.add_video("dup2", "Same Title", views=9)
+    fake.add_playlist_item("PLtest", "dup1")
+    fake.add_playlist_item("PLtest", "dup2")
+    data_csv = str(tmp_path / "data.csv")
+    playlist_manager = PlaylistManager()
+    playlist_manager.youtube = youtube_manager.youtube
+    playlist_manager.sync_playlist_data(
+        "PLtest", data_csv, PlaylistSnapshotStore(str(tmp_path))
+    )
+    stats_df = youtube_manager.collect_playlist_statistics(
+        "PLtest", str(tmp_path / "stats.csv")
+    )
+
+    joined = join_playlist_data(stats_df, data_csv, ("Artist", "Song"))
+
+    assert list(joined["Artist"][:2]) == ["Artist 0", "Artist 1"]
+    assert list(joined["Song"][:2]) == ["Song 0", "Song 1"]
+    assert list(joined["Views"][-2:]) == [7, 9]
+
+
+def test_playlist_catalog_indexes():
+    catalog = PlaylistCatalog()
+    catalog.add("i1", "v1", "Daft Punk - One More Time")
+    catalog.add("i2", "v2", "daft  punk - Aerodynamic")
+    catalog.add("i3", "v1", "Daft Punk - One More Time")
+
+    assert "v1" in catalog and "v3" not in catalog and len(catalog) == 3
+    assert [entry.item_id for entry in catalog.entries("v1")] == ["i1", "i3"]
+    assert [entry.song for entry in catalog.by_artist("DAFT PUNK")] == [
+        "One More Time",
+        "Aerodynamic",
+        "One More Time",
+    ]
+
+    assert [entry.item_id for entry in catalog.pop_video("v1")] == ["i1", "i3"]
+    assert catalog.remove_item("i2").video_id == "v2"
+    assert len(catalog) == 0 and catalog.by_artist("Daft Punk") == []
+
+
+def test_find_duplicates_groups_uploads_of_the_same_song():
+    titles = [
+        "Nicki Minaj & Ice Spice – Barbie World (with Aqua) [Official Music Video]",
+        "Nicki Minaj, Ice Spice - Barbie World (Lyrics)",
+        "Daft Punk - Harder Better Faster Stronger (Official Audio)",
+        "Daft Punk - Harder, Better, Faster, Stonger",
+        "Daft Punk - Harder Better Faster Stronger (Alive 2007 Remix)",
+        "Beyoncé - Halo",
+        "Beyonce - HALO (Official Video)",
+        "Beyonce - Halo (Live)",
+        "Artist - Song Part 2",
+        "Artist - Song Part 3",
+        "Deleted video",
+        "Deleted video",
+    ]
+
+    assert find_duplicates(enumerate(titles)) == [[0, 1], [2, 3], [5, 6]]
+    assert find_duplicates(enumerate(titles), threshold=1) == [[0, 1], [5, 6]]
+
+    index = DuplicateIndex()
+    index.add_many(enumerate(titles[:3]))
+    assert index.find("Daft Punk - Harder Bettr Faster Stronger [HD]") == [2]
+    assert "Nicki Minaj - Barbie World" not in index
+
+
+
+def test_concurrent_statistics_respect_max_in_flight():
+    fake = FakeYouTubeHttp(latency=0.05)
+    seed_playlist(fake, "PLtest", 400)
+    server = serve(fake)
+    try:
+        youtube_manager = YouTubePlaylistManager(
+            max_in_flight=4, http_factory=httplib2.Http
+        )
+        youtube_manager.youtube = build_client(httplib2.Http(), server.url)
+
+        stats, missing = youtube_manager.get_videos_statistics(
+            [item["videoId"] for item in fake.playlists["PLtest"]]
+        )
+        youtube_manager.close()
+    finally:
+        server.shutdown()
+
+    assert len(stats) == 400 and not missing
+    assert fake.calls["videos.get"] == 8
+    assert fake.peak_in_flight == 4
+
+
+def test_add_new_songs_fetches_playlists_concurrently(make_fake_manager):
+    automate_new, fake = make_fake_manager(AutomateNew)
+    fake.latency = 0.05
+    seed_playlist(fake, "PLsource", 3)
+
+    automate_new.add_new_songs("PLsource", "PLtest", 5)
+
+    assert fake.calls["playlistItems.get"] == 2
+    assert fake.peak_in_flight == 2
+
+
+
+def test_mutation_batch_retries_failed_sub_requests(make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120)
+    fake.inject_errors("playlistItems.post", 503, times=2)
+    calls = []
+    batch = PlaylistMutationBatch(playlist_manager, retry_delay=0)
+    for item in fake.playlists["PLtest"][:60]:
+        batch.insert("PLtest", item["videoId"], callback=lambda *args: calls.append(args))
+    missing = batch.insert("PLtest", "no-such-video")
+
+    result = batch.execute()
+
+    assert len(result.succeeded) == 60
+    [(mutation, error)] = result.failed
+    assert mutation == missing and error.status_code == 404
+    assert result.batches == 3
+    assert len(calls) == 60 and all(error is None for _, _, error in calls)
+    assert len(fake.playlists["PLtest"]) == 180
+
+
+def test_remove_deleted_videos_uses_batched_deletes(make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 200, 4)
+
+    summary = playlist_manager.remove_deleted_videos("PLtest")
+
+    assert len(summary["reclaimed"]) == 50 and not summary["failed"]
+    assert summary["scanned"] == 200 and summary["batch_calls"] == 1
+    assert fake.calls["playlistItems.get"] == 4
+    assert fake.calls["batch.post"] == 1
+    assert len(fake.playlists["PLtest"]) == 150
+
+
+def test_remove_deleted_videos_dry_run_deletes_nothing(make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 20, 5)
+
+    summary = playlist_manager.remove_deleted_videos("PLtest", dry_run=True)
+
+    assert [record["video_id"] for record in summary["reclaimed"]] == [
+        item["videoId"] for item in fake.playlists["PLtest"][4::5]
+    ]
+    assert fake.calls["batch.post"] == 0
+    assert len(fake.playlists["PLtest"]) == 20
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_plan_moves_keeps_the_longest_ordered_run(seed):
+    rng = random.Random(seed)
+    target = list(range(60))
+    current = target[:]
+    for _ in range(seed * 3):  # a few items out of place, then a shuffle
+        current.insert(rng.randrange(60), current.pop(rng.randrange(60)))
+    if seed == 4:
+        rng.shuffle(current)
+
+    moves = plan_moves(current, target)
+
+    order = current[:]
+    for item_id, position in moves:
+        order.remove(item_id)
+        order.insert(position, item_id)
+    assert order == target
+    ranks = [target.index(item_id) for item_id in current]
+    assert len(moves) == 60 - len(longest_increasing_subsequence(ranks))
+
+
+def test_reorder_playlist_moves_only_items_out_of_place(make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120)
+    items = fake.playlists["PLtest"]
+    for source, position in [(5, 90), (100, 0), (60, 61)]:
+        items.insert(position, items.pop(source))
+
+    projection = playlist_manager.reorder_playlist("PLtest", "added", dry_run=True)
+    assert projection["moved"] == 3 and projection["projected_units"] == 150
+    assert projection["naive_units"] == 120 * 100
+    assert fake.calls["playlistItems.put"] == 0
+
+    summary = playlist_manager.reorder_playlist("PLtest", "added")
+    assert summary["moved"] == 3 and not summary["failed"]
+    assert fake.calls["playlistItems.put"] == 3
+    assert [item["videoId"] for item in items] == [
+        f"PLtestv{index:06d}" for index in range(120)
+    ]
+
+    views = {f"PLtestv{index:06d}": index % 7 for index in range(120)}
+    playlist_manager.reorder_playlist("PLtest", views, reverse=True)
+    assert [views[item["videoId"]] for item in items] == sorted(
+        views.values(), reverse=True
+    )
+
+
+def test_remove_video_from_playlist_with_prebuilt_index(make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120)
+    index = playlist_manager.get_video_index("PLtest")
+    video_ids = [item["videoId"] for item in fake.playlists["PLtest"][:3]]
+
+    for video_id in video_ids:
+        playlist_manager.remove_video_from_playlist("PLtest", video_id, index)
+
+    assert fake.calls["playlistItems.get"] == 3
+    assert fake.calls["playlistItems.delete"] == 3
+    assert not any(video_id in index for video_id in video_ids)
+    assert len(index) == 117
+
+
+def test_add_new_songs_inserts_in_batches(make_fake_manager):
+    automate_new, fake = make_fake_manager(AutomateNew, 10)
+    seed_playlist(fake, "PLsource", 80)
+
+    result = automate_new.add_new_songs("PLsource", "PLtest", 75)
+
+    assert len(result.succeeded) == 75
+    assert fake.calls["batch.post"] == 2
+    assert fake.calls["playlistItems.post"] == 75
+
+
+
+def test_response_cache_hits_and_revalidates(tmp_path, make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120)
+    playlist_manager.cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+    first = playlist_manager.get_playlist_items("PLtest")
+    assert playlist_manager.get_playlist_items("PLtest") == first
+    assert fake.calls["playlistItems.get"] == 3
+
+    playlist_manager.cache.ttls["playlistItems"] = 0
+    assert playlist_manager.get_playlist_items("PLtest") == first
+    assert fake.calls["playlistItems.get"] == 6
+
+    stats = playlist_manager.cache.stats()
+    assert (stats["misses"], stats["hits"], stats["revalidated"]) == (3, 3, 3)
+    assert stats["entries"] == 3
+
+
+def test_response_cache_invalidated_by_mutations(tmp_path, make_fake_manager):
+    automate_new, fake = make_fake_manager(AutomateNew, 10)
+    automate_new.cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    seed_playlist(fake, "PLsource", 20)
+
+    automate_new.add_new_songs("PLsource", "PLtest", 5)
+    assert len(automate_new.get_playlist_items("PLtest")) == 15
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path, make_fake_manager):
+    youtube_manager, fake = make_fake_manager(YouTubePlaylistManager, 150)
+    youtube_manager.cache = ResponseCache(
+        str(tmp_path / "cache.sqlite"), max_bytes=10_000
+    )
+
+    youtube_manager.get_videos_statistics(
+        [item["videoId"] for item in fake.playlists["PLtest"]]
+    )
+
+    stats = youtube_manager.cache.stats()
+    assert stats["entries"] == 1 and stats["evictions"] == 2
+
+
+
+def test_sync_playlist_is_incremental(tmp_path, make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 200)
+    store = PlaylistSnapshotStore(str(tmp_path))
+
+    first = sync_playlist(playlist_manager, "PLtest", store)
+    unchanged = sync_playlist(playlist_manager, "PLtest", store)
+
+    assert len(first.added) == 200 and first.requests == 4
+    assert not unchanged.changed and unchanged.requests == 4
+
+    items = fake.playlists["PLtest"]
+    removed = items.pop(10)
+    moved = items.pop(0)
+    items.insert(150, moved)
+    fake.add_playlist_item("PLtest", "PLtestv000001")
+
+    diff = sync_playlist(playlist_manager, "PLtest", store)
+
+    assert [item["id"] for item in diff.removed] == [removed["id"]]
+    assert [item["id"] for item in diff.moved] == [moved["id"]]
+    assert [item["video_id"] for item in diff.added] == ["PLtestv000001"]
+    assert [item["id"] for item in diff.items] == [item["id"] for item in items]
+
+
+def test_sync_playlist_sees_changes_behind_an_unchanged_first_page(
+    tmp_path, make_fake_manager
+):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120)
+    store = PlaylistSnapshotStore(str(tmp_path))
+    sync_playlist(playlist_manager, "PLtest", store)
+
+    fake.playlists["PLtest"][100]["title"] = "Deleted video"
+    diff = sync_playlist(playlist_manager, "PLtest", store)
+
+    assert diff.requests == 3
+    assert diff.items[100]["title"] == "Deleted video"
+    assert store.load("PLtest")["pages"][2]["items"][0]["title"] == "Deleted video"
+
+
+def test_diff_items_reports_minimal_moves():
+    old = [{"id": name} for name in "abcdef"]
+    new = [{"id": name} for name in "bcadfg"]
+
+    added, removed, moved = diff_items(old, new)
+
+    assert [item["id"] for item in added] == ["g"]
+    assert [item["id"] for item in removed] == ["e"]
+    assert [item["id"] for item in moved] == ["a"]
+
+
+def test_sync_playlist_data_updates_csv_in_place(tmp_path, make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 5)
+    store = PlaylistSnapshotStore(str(tmp_path / "snapshots"))
+    csv_path = str(tmp_path / "playlist_data.csv")
+
+    playlist_manager.sync_playlist_data("PLtest", csv_path, store)
+    fake.playlists["PLtest"].pop(0)
+    playlist_manager.sync_playlist_data("PLtest", csv_path, store)
+
+    df = pd.read_csv(csv_path)
+    assert list(df.columns) == CSV_HEADER + ["Fetched At"]
+    assert list(df["Video ID"]) == [f"PLtestv00000{i}" for i in range(1, 5)]
+    assert list(df["Artist"]) == ["Artist 1", "Artist 2", "Artist 3", "Artist 4"]
+
+
+
+def test_quota_meter_charges_and_retries_transient_errors(make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120, 3)
+    sleeps = []
+    playlist_manager.quota = QuotaMeter(sleep=sleeps.append)
+    fake.inject_errors("playlistItems.get", 503)
+    fake.inject_errors("playlistItems.get", 403, reason="rateLimitExceeded")
+
+    summary = playlist_manager.remove_deleted_videos("PLtest")
+
+    assert summary["projected_units"] == 40 * 50
+    assert playlist_manager.quota.retries == len(sleeps) == 2
+    assert playlist_manager.quota.used == 5 + 40 * 50
+
+
+def test_quota_meter_refuses_requests_over_daily_limit(make_fake_manager):
+    automate_new, fake = make_fake_manager(AutomateNew, 10)
+    seed_playlist(fake, "PLsource", 20)
+    automate_new.quota = QuotaMeter(daily_limit=100)
+
+    projection = automate_new.add_new_songs("PLsource", "PLtest", 5, dry_run=True)
+    assert projection["projected_units"] == estimate_cost({"insert": 5}) == 250
+
+    result = automate_new.add_new_songs("PLsource", "PLtest", 5)
+    assert not result.succeeded and len(result.failed) == 5
+    assert all(isinstance(error, QuotaExceededError) for _, error in result.failed)
+    assert fake.calls["batch.post"] == 0
+
+
+def test_mutation_batch_returns_partial_result_when_quota_runs_out(
+    make_fake_manager,
+):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 1)
+    video_id = fake.playlists["PLtest"][0]["videoId"]
+    playlist_manager.quota = QuotaMeter(daily_limit=estimate_cost({"insert": 3}))
+    batch = PlaylistMutationBatch(playlist_manager, batch_size=2)
+    for _ in range(5):  # the same insert, queued five times
+        batch.insert("PLtest", video_id)
+
+    result = batch.execute()
+
+    assert result.batches == 2 and len(result.succeeded) == 2
+    assert [mutation.target for mutation, _ in result.failed] == [video_id] * 3
+    assert all(isinstance(error, QuotaExceededError) for _, error in result.failed)
+    assert len(fake.playlists["PLtest"]) == 3
+
+
+def test_quota_meter_stops_after_quota_exceeded(tmp_path, make_fake_manager):
+    youtube_manager, fake = make_fake_manager(YouTubePlaylistManager, 10)
+    state_file = str(tmp_path / "quota.json")
+    youtube_manager.quota = QuotaMeter(state_file=state_file, sleep=lambda _: None)
+    fake.inject_errors("videos.get", 403, reason="quotaExceeded")
+
+    stats, missing = youtube_manager.get_videos_statistics(["PLtestv000001"])
+
+    assert not stats and missing == ["PLtestv000001"]
+    assert QuotaMeter(state_file=state_file).remaining == 0
+
+
+def test_fake_api_enforces_its_daily_quota(tmp_path):
+    fake = FakeYouTubeHttp(daily_quota=103)
+    seed_playlist(fake, "PLtest", 3)
+    seed_playlist(fake, "PLsource", 4)
+    automate_new = AutomateNew()
+    automate_new.youtube = build_client(fake)
+    automate_new.snapshot_store = PlaylistSnapshotStore(str(tmp_path))
+
+    result = automate_new.add_new_songs("PLsource", "PLtest", 3)
+
+    assert len(result.succeeded) == 2
+    [(_, error)] = result.failed
+    assert error.status_code == 403 and b"quotaExceeded" in error.content
+    assert fake.quota_used == 2 + 2 * 50
+
+
+
+def test_quota_meter_token_bucket_spaces_requests():
+    meter = QuotaMeter(units_per_second=1_000, burst=50)
+
+    start = time.perf_counter()
+    for _ in range(3):
+        meter.throttle(50)
+
+    elapsed = time.perf_counter() - start
+    assert elapsed >= 0.09
+    # The upper bound depends on the machine; see PERF_BUDGETS in
+    # test_performance.py.
+    if os.getenv("PERF_BUDGETS") == "1":
+        assert elapsed == pytest.approx(0.1, abs=0.03)
+
+
+
+def test_iter_playlist_items_streams_projected_pages(make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120)
+
+    stream = playlist_manager.iter_playlist_items("PLtest")
+    first = next(stream)
+
+    assert fake.calls["playlistItems.get"] == 1
+    assert first == {
+        "id": fake.playlists["PLtest"][0]["id"],
+        "snippet": {"title": "Artist 0 - Song 0"},
+        "contentDetails": {"videoId": "PLtestv000000"},
+    }
+    assert len(list(stream)) == 119
+
+    projected_bytes = fake.bytes_sent
+    fake.bytes_sent = 0
+    list(playlist_manager.iter_playlist_items("PLtest", fields=None))
+    assert projected_bytes * 5 < fake.bytes_sent
+
+
+
+def test_add_new_songs_skips_other_uploads_of_known_songs(make_fake_manager):
+    automate_new, fake = make_fake_manager(AutomateNew, 3)
+    for video_id, title in [
+        ("lyrics", "Artist 1 - Song 1 (Lyrics)"),
+        ("audio", "Artist 3 - Song 3 (Official Audio)"),
+        ("visualizer", "Artist 3 - Song 3 [Visualizer]"),
+    ]:
+        fake.add_video(video_id, title)
+        fake.add_playlist_item("PLsource", video_id)
+
+    projection = automate_new.add_new_songs(
+        "PLsource", "PLtest", 5, dry_run=True, dedupe_threshold=0.8
+    )
+
+    assert projection["video_ids"] == ["audio"]
+    assert automate_new.add_new_songs("PLsource", "PLtest", 5, dry_run=True)[
+        "video_ids"
+    ] == ["lyrics", "audio", "visualizer"]
+
+
+def test_add_new_songs_ranks_by_artist_affinity(make_fake_manager):
+    automate_new, fake = make_fake_manager(AutomateNew)
+    playlists = {
+        "PLtest": ["Rosalía - Despechá", "Bad Bunny - Tití Me Preguntó"],
+        "PLlatin": ["Bad Bunny - Moscow Mule", "Karol G - Provenza"],
+        "PLmetal": ["Metallica - One", "Slayer - Raining Blood"],
+        "PLsource": [
+            "Metallica - Lux Æterna",
+            "Karol G - Mientras Me Curo del Cora",
+            "Untitled",
+            "Rosalía ft. The Weeknd - La Fama",
+        ],
+    }
+    for playlist_id, titles in playlists.items():
+        for index, title in enumerate(titles):
+            fake.add_video(f"{playlist_id}{index}", title)
+            fake.add_playlist_item(playlist_id, f"{playlist_id}{index}")
+    for playlist_id in ["PLlatin", "PLmetal"]:
+        automate_new.get_playlist_catalog(playlist_id)
+
+    projection = automate_new.add_new_songs(
+        "PLsource", "PLtest", 3, dry_run=True, rank=True
+    )
+
+    assert projection["video_ids"] == ["PLsource3", "PLsource1", "PLsource0"]
+    cache_file = os.path.join(automate_new.snapshot_store.directory, CACHE_NAME)
+    model = ArtistAffinity.load(cache_file)
+    assert sorted(model.playlists) == ["PLlatin", "PLmetal", "PLtest"]
+    assert "the weeknd" not in model.artists
+
+
+def test_artist_affinity_cache_parses_only_changed_snapshots(tmp_path):
+    store = PlaylistSnapshotStore(str(tmp_path))
+    for playlist_id, title in [("PLa", "A - 1"), ("PLb", "B - 1"), ("PLc", "C - 1")]:
+        items = [{"id": playlist_id, "video_id": playlist_id, "title": title}]
+        store.save(playlist_id, {"pages": [{"items": items}]})
+    ArtistAffinity.from_snapshots(str(tmp_path))
+    store.save("PLb", {"pages": [{"items": [{"id": "x", "title": "D - 2"}]}]})
+    os.remove(tmp_path / "PLc.json")
+
+    with patch("affinity.parse_titles", wraps=parse_titles) as parse:
+        model = ArtistAffinity.from_snapshots(str(tmp_path))
+
+    parse.assert_called_once_with(["D - 2"])
+    assert model.playlists == ["PLa", "PLb"]
+    assert sorted(model.artists) == ["a", "d"]
+    scores = model.artist_scores(["D - 3"])
+    assert scores[model.artists.index("d")] > 0
+    assert scores[model.artists.index("a")] == 0
+
+
+def test_add_new_songs_stops_paging_once_enough_songs_found(make_fake_manager):
+    automate_new, fake = make_fake_manager(AutomateNew, 10)
+    seed_playlist(fake, "PLsource", 500)
+    seed_playlist(fake, "PLother", 100)
+    for item in fake.playlists["PLsource"][:60]:
+        fake.add_playlist_item("PLtest", item["videoId"])
+
+    result = automate_new.add_new_songs(["PLsource", "PLother"], "PLtest", 5)
+    assert len(result.succeeded) == 5
+    assert fake.calls["playlistItems.get"] == 2 + 2
+
+    fake.calls.clear()
+    projection = automate_new.add_new_songs(
+        ["PLtest", "PLother"], "PLtest", 3, dry_run=True
+    )
+    assert projection["video_ids"] == [f"PLotherv00000{i}" for i in range(3)]
+    assert fake.calls["playlistItems.get"] == 2 + 2 + 1
+
+
+
+@pytest.mark.parametrize("engine", ["csv", "pandas"])
+def test_clean_stats_leaves_ids_and_numbers_untouched(tmp_path, engine):
+    input_csv = tmp_path / "stats.csv"
+    output_csv = tmp_path / "clean_stats.csv"
+    pd.DataFrame(
+        {
+            "Title": ["Taylor Swift - Anti-Hero (Official Music Video)"],
+            "Video ID": ["b1kbLwvqugk"],
+            "Views": [208967371],
+            "Likes": [3503405],
+        }
+    ).to_csv(input_csv, index=False)
+
+    clean_stats(str(input_csv), str(output_csv), engine=engine)
+
+    cleaned = pd.read_csv(output_csv, dtype=str)
+    assert cleaned.iloc[0].tolist() == [
+        "taylor swift - anti-hero",
+        "b1kbLwvqugk",
+        "208967371",
+        "3503405",
+    ]
+
+
+@pytest.mark.parametrize("malformed", [False, True])
+def test_clean_csv_engines_produce_identical_files(tmp_path, malformed):
+    input_csv = "playlist_data.csv"
+    if malformed:
+        lines = open(input_csv, encoding="utf-8").read().splitlines()
+        lines[3:3] = ["Too,Few", "Too,Many,Cells,In,This,Row,Here"]
+        input_csv = str(tmp_path / "malformed.csv")
+        (tmp_path / "malformed.csv").write_text("\n".join(lines), encoding="utf-8")
+    clean_csv(input_csv, str(tmp_path / "rows.csv"))
+    clean_csv(input_csv, str(tmp_path / "chunks.csv"), engine="pandas", chunksize=64)
+
+    rows = (tmp_path / "rows.csv").read_bytes()
+    assert rows == (tmp_path / "chunks.csv").read_bytes()
+    assert clean_text("Barbie World (with Aqua) [Official Music Video]") == "barbie world"
+
+
+@pytest.mark.parametrize("engine", ["csv", "pandas"])
+def test_clean_csv_skips_rows_that_do_not_match_the_header(tmp_path, caplog, engine):
+    input_csv = tmp_path / "data.csv"
+    input_csv.write_text(
+        "Artist,Song,Video ID\n"
+        "A,B (Official Video),v1\n"
+        "C,D,v2,extra\n"
+        "E,F\n"
+        "G,H [Lyrics],v3\n",
+        encoding="utf-8",
+    )
+
+    clean_csv(str(input_csv), str(tmp_path / "clean.csv"), engine=engine)
+
+    assert (tmp_path / "clean.csv").read_text(encoding="utf-8").splitlines() == [
+        "Artist,Song,Video ID",
+        "a,b,v1",
+        "g,h,v3",
+    ]
+    assert caplog.text.count("Skipping") == 2
+    assert "4 cells, expected 3" in caplog.text and "2 cells" in caplog.text
+
+
+def test_dataset_round_trips_typed_columns(tmp_path):
+    csv_path = str(tmp_path / "stats.csv")
+    save_dataset(
+        pd.DataFrame(
+            {
+                "Title": ["A - B", "C - D"],
+                "Artist": ["A", "A"],
+                "Views": ["10", "20"],
+                "Fetched At": ["2024-05-01T12:00:00Z"] * 2,
+            }
+        ),
+        csv_path,
+    )
+
+    df = load_dataset(csv_path)
+    assert os.path.exists(csv_path) and os.path.exists(dataset_path(csv_path))
+    assert df["Views"].dtype == "int64"
+    assert isinstance(df["Artist"].dtype, pd.CategoricalDtype)
+    assert str(df["Fetched At"].dt.tz) == "UTC"
+    assert list(load_dataset(csv_path, ["Views"]).columns) == ["Views"]
+
+
+def test_load_dataset_converts_legacy_csv(tmp_path):
+    csv_path = tmp_path / "playlist_data.csv"
+    csv_path.write_text("Title,Video ID,Artist,Song\nA - B,x1,A,B\n", encoding="utf-8")
+
+    df = load_dataset(str(csv_path), ["Artist"])
+
+    assert list(df["Artist"]) == ["A"]
+    assert os.path.exists(dataset_path(str(csv_path)))
+
+
+def test_load_dataset_converts_legacy_csv_with_blank_counts(tmp_path):
+    csv_path = tmp_path / "playlist_stats.csv"
+    csv_path.write_text("Title,Views,Likes\nA - B,10,\nC - D,,3\n", encoding="utf-8")
+
+    df = load_dataset(str(csv_path))
+
+    assert df["Views"].dtype == "int64" and df["Likes"].dtype == "int64"
+    assert df[["Views", "Likes"]].values.tolist() == [[10, 0], [0, 3]]
+
+
+def test_clean_stats_and_common_artists_use_dataset(tmp_path, make_fake_manager):
+    playlist_manager, _ = make_fake_manager(PlaylistManager, 6)
+    store = PlaylistSnapshotStore(str(tmp_path / "snapshots"))
+    data_csv = str(tmp_path / "playlist_data.csv")
+    clean_csv_path = str(tmp_path / "clean_playlist_data.csv")
+    playlist_manager.sync_playlist_data("PLtest", data_csv, store)
+
+    clean_stats(data_csv, clean_csv_path)
+    cleaned = load_dataset(clean_csv_path)
+    assert list(cleaned["Artist"]) == [f"artist {i}" for i in range(6)]
+    assert list(cleaned["Video ID"]) == [f"PLtestv{i:06d}" for i in range(6)]
+
+    top = common_artists(clean_csv_path, top_n=3, output=str(tmp_path / "top.svg"))
+    assert [count for _, count in top] == [1, 1, 1]
+    assert (tmp_path / "top.svg").read_text().lstrip().startswith("<?xml")
+
+
+def test_stats_history_growth_and_compaction(tmp_path):
+    history = StatsHistory(str(tmp_path))
+    start = pd.Timestamp("2024-05-01", tz="UTC")
+    for hour in range(24 * 10):
+        history.append(
+            {"a": {"views": 100 + hour, "likes": 1}, "b": {"views": 50, "likes": 2}},
+            start + pd.Timedelta(hours=hour),
+        )
+    now = start + pd.Timedelta(hours=24 * 10 - 1)
+
+    growth = history.growth(days=7, now=now)
+    assert list(growth.index) == ["a", "b"]
+    assert list(growth["views_delta"]) == [24 * 7, 0]
+
+    assert history.compact(keep_days=7, now=now) == 2
+    assert history.compact(keep_days=7, now=now) == 0
+    daily = history.read(end=start + pd.Timedelta(days=3), video_ids=["a"])
+    assert list(daily["views"]) == [100 + 23, 100 + 47] + list(range(148, 172))
+    assert history.growth(days=7, now=now).equals(growth)
+
+
+def test_stats_history_merges_parts_appended_to_a_compacted_day(tmp_path):
+    history = StatsHistory(str(tmp_path))
+    day = pd.Timestamp("2024-05-01", tz="UTC")
+    now = day + pd.Timedelta(days=30)
+    history.append({"a": {"views": 1, "likes": 0}}, day + pd.Timedelta(hours=1))
+    history.append({"a": {"views": 2, "likes": 0}}, day + pd.Timedelta(hours=2))
+    day_dir = tmp_path / "2024-05-01"
+    leftover = sorted(day_dir.iterdir())[0]
+    leftover_bytes = leftover.read_bytes()
+    assert history.compact(now=now) == 1
+    # An interrupted compaction leaves a folded part behind.
+    leftover.write_bytes(leftover_bytes)
+
+    history.append({"b": {"views": 5, "likes": 1}}, day + pd.Timedelta(hours=3))
+    assert list(history.read()["views"]) == [2, 5]
+
+    assert history.compact(now=now) == 1
+    assert [path.name for path in day_dir.iterdir()] == ["compacted.feather"]
+    assert list(history.read()["video_id"]) == ["a", "b"]
+    assert history.compact(now=now) == 0
+
+
+def test_refreshed_statistics_are_appended_to_history(tmp_path, make_fake_manager):
+    youtube_manager, fake = make_fake_manager(YouTubePlaylistManager, 3)
+    youtube_manager.history = StatsHistory(str(tmp_path / "history"))
+    output_csv = str(tmp_path / "stats.csv")
+
+    youtube_manager.collect_playlist_statistics("PLtest", output_csv)
+    youtube_manager.collect_playlist_statistics("PLtest", output_csv)
+    youtube_manager.collect_playlist_statistics("PLtest", output_csv, refresh=True)
+
+    snapshots = youtube_manager.history.read()
+    assert len(snapshots) == 6
+    assert set(snapshots["video_id"]) == {f"PLtestv{i:06d}" for i in range(3)}
+
+
+@pytest.mark.parametrize(
+    "credit, expected",
+    [
+        ("Rema, Selena Gomez", ("Rema", "Selena Gomez")),
+        ("Burna Boy ft. Ed Sheeran", ("Burna Boy", "Ed Sheeran")),
+        ("Wizkid feat. Tems & Justin Bieber", ("Wizkid", "Tems", "Justin Bieber")),
+        ("Skrillex x Fred again..", ("Skrillex", "Fred again..")),
+        ("Xamvolo", ("Xamvolo",)),
+    ],
+)
+def test_split_credits(credit, expected):
+    assert split_credits(credit) == expected
+
+
+def test_count_artists_across_files_and_snapshots(tmp_path):
+    csv_path = tmp_path / "a.csv"
+    csv_path.write_text(
+        "Title,Artist\nx,\"Rema, Selena Gomez\"\ny,Rema\n", encoding="utf-8"
+    )
+    dataset_csv = str(tmp_path / "b.csv")
+    save_dataset(pd.DataFrame({"Artist": ["Rema ft. Asake", "Asake"]}), dataset_csv)
+    store = PlaylistSnapshotStore(str(tmp_path / "snapshots"))
+    store.save("PLx", {"pages": [{"items": [{"title": "Asake - Lonely At The Top"}]}]})
+
+    snapshot = str(tmp_path / "snapshots" / "PLx.json")
+    counts = count_artists([str(csv_path), dataset_csv, snapshot])
+
+    assert counts == {"Rema": 3, "Asake": 3, "Selena Gomez": 1}
+    assert count_artists(str(csv_path), split=False)["Rema, Selena Gomez"] == 1
+
+
+def test_space_saving_keeps_heavy_hitters():
+    counter = SpaceSaving(capacity=10)
+    for index in range(5000):
+        counter.add("heavy" if index % 4 == 0 else f"rare {index}")
+
+    assert len(counter.counts) == 10
+    [(top, count)] = counter.most_common(1)
+    assert top == "heavy"
+    assert 1250 <= count <= 1250 + counter.errors["heavy"]
+
+
+def test_parse_title_returns_structured_record():
+    parsed = parse_title(
+        "Nicki Minaj & Ice Spice – Barbie World (with Aqua) [Official Music Video]"
+    )
+    assert parsed.artists == ("Nicki Minaj", "Ice Spice")
+    assert parsed.featured == ("Aqua",)
+    assert parsed.song == "Barbie World"
+    assert parse_title("Mike Posner - I Took A Pill In Ibiza (Seeb Remix)").tags == (
+        "Seeb Remix",
+    )
+    assert parse_title("Clean Bandit, Anne-Marie – Cry Baby").artists == (
+        "Clean Bandit",
+        "Anne-Marie",
+    )
+    assert parse_titles(["a - b", "c", "a - b"])[2] == parse_title("a - b")
+
+
+def test_parse_title_accuracy_on_corpus():
+    corpus = pd.read_csv("title_corpus.csv", dtype=str, keep_default_na=False)
+    correct = 0
+    for row in corpus.itertuples(index=False):
+        parsed = parse_title(row.Title)
+        correct += (
+            "; ".join(parsed.artists) == row.Artists
+            and "; ".join(parsed.featured) == row.Featured
+            and parsed.song == row.Song
+            and "; ".join(parsed.tags) == row.Tags
+        )
+    assert correct / len(corpus) >= 0.9
+
+
+def test_chart_renderer_reuses_figures_and_writes_png_and_svg(tmp_path):
+    renderer = ChartRenderer()
+    manager = YouTubePlaylistManager(renderer=renderer)
+    df = pd.DataFrame(
+        {"Title": [f"$ong {i}" for i in range(12)], "Views": range(12), "Likes": range(12)}
+    )
+
+    png = io.BytesIO()
+    manager.visualize_statistics(df, png)
+    manager.visualize_statistics(df, str(tmp_path / "stats.svg"))
+
+    assert png.getvalue().startswith(b"\x89PNG")
+    assert (tmp_path / "stats.svg").exists()
+    assert renderer.stats()["renders"] == 8
+    assert renderer.stats()["figures"] == 1
+    assert renderer.render(BarChart("One", ["a"], [1])).startswith(b"\x89PNG")
+
+
+def test_render_charts_in_pool_without_gui(tmp_path):
+    script = (
+        "import sys\n"
+        "from charts import BarChart, render_charts\n"
+        "jobs = [(BarChart(str(i), list('abcdefghij'), range(10)), sys.argv[1] + f'/{i}.png')"
+        " for i in range(4)]\n"
+        "render_charts(jobs, processes=2)\n"
+        "gui = {'matplotlib.pyplot', 'tkinter', 'PyQt5', 'PyQt6', 'PySide6', 'gi'}\n"
+        "print(sorted(gui & set(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script, str(tmp_path)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
+    assert sorted(os.listdir(tmp_path)) == ["0.png", "1.png", "2.png", "3.png"]
+
+
+def test_project_import_loads_no_heavy_modules():
+    script = (
+        "import sys, project\n"
+        "heavy = {'pandas', 'pyarrow', 'matplotlib', 'googleapiclient.discovery',"
+        " 'google_auth_oauthlib', 'Video_stats', 'manager'}\n"
+        "print(sorted(heavy & set(sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_managers_share_one_authenticated_client(tmp_path):
+    token_file = tmp_path / "token.json"
+    token_file.write_text(
+        '{"token": "t", "refresh_token": "r", "client_id": "c", "client_secret": "s",'
+        ' "expiry": "2999-01-01T00:00:00Z"}'
+    )
+
+    playlist_manager = PlaylistManager(token_file=str(token_file))
+    automate_new = AutomateNew(token_file=str(token_file))
+    playlist_manager.authenticate()
+    automate_new.authenticate()
+
+    assert playlist_manager.youtube is automate_new.youtube
+    assert playlist_manager.credentials is automate_new.credentials
+    assert playlist_manager._thread_http() is automate_new._thread_http()
+
+
+def test_connection_pool_reuses_keep_alive_connections():
+    fake = FakeYouTubeHttp(latency=0.01)
+    seed_playlist(fake, "PLtest", 5)
+    server = serve(fake)
+    pool = ConnectionPool()
+    http = PooledHttp(pool)
+    uri = f"{server.url}/youtube/v3/playlistItems?part=id&playlistId=PLtest"
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(lambda _: http.request(uri), range(40)))
+    finally:
+        server.shutdown()
+
+    assert all(response.status == 200 for response, _ in responses)
+    stats = pool.stats()
+    assert server.connections == stats["created"] <= 4
+    assert stats["reused"] == 40 - stats["created"]
+
+
+def test_token_refresh_is_proactive_and_single_flight(tmp_path, monkeypatch):
+    token_file = tmp_path / "token.json"
+    expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=1)
+    token_file.write_text(
+        json.dumps(
+            {"token": "old", "refresh_token": "r", "client_id": "c",
+             "client_secret": "s", "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ")}
+        )
+    )
+    refreshes = []
+
+    def refresh(credentials, request):
+        time.sleep(0.05)
+        refreshes.append(credentials)
+        credentials.token = "new"
+        credentials.expiry = expiry.replace(tzinfo=None) + datetime.timedelta(hours=1)
+
+    monkeypatch.setattr("google.oauth2.credentials.Credentials.refresh", refresh)
+    # Two managers of one file stand in for two processes: only the file
+    # lock serializes them.
+    managers = [TokenManager(str(token_file), ("scope",), margin=300) for _ in range(2)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tokens = list(executor.map(lambda i: managers[i % 2].get().token, range(8)))
+
+    assert tokens == ["new"] * 8 and len(refreshes) == 1
+    assert json.loads(token_file.read_text())["token"] == "new"
+    assert token_file.stat().st_mode & 0o777 == 0o600
+    assert not (tmp_path / "token.json.tmp").exists()
+
+
+def test_get_session_authorizes_accounts_independently(tmp_path, monkeypatch):
+    consent = threading.Event()
+
+    def get(tokens, force=False):
+        # The first account waits on its browser consent.
+        if tokens.token_file.endswith("waiting.json"):
+            assert consent.wait(5)
+        return "credentials"
+
+    monkeypatch.setattr("transport.TokenManager.get", get)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        waiting = [
+            executor.submit(get_session, str(tmp_path / "waiting.json"), ("s",))
+            for _ in range(2)
+        ]
+        other = executor.submit(get_session, str(tmp_path / "other.json"), ("s",))
+        assert other.result(timeout=5).tokens.token_file.endswith("other.json")
+        assert not any(future.done() for future in waiting)
+        consent.set()
+        sessions = [future.result(timeout=5) for future in waiting]
+
+    assert sessions[0] is sessions[1]
+    assert get_session(str(tmp_path / "other.json"), ("s",)) is other.result()
+
+
+def run_cli(argv, fake, monkeypatch, capsys, tmp_path):
+    """Runs project.main in `tmp_path` with every manager on the fake API."""
+    monkeypatch.chdir(tmp_path)
+
+    def authenticate(self):
+        self.youtube = build_client(fake)
+
+    monkeypatch.setattr("authenticate.YouTubeAPIManager.authenticate", authenticate)
+    exit_code = project_main(argv)
+    return exit_code, json.loads(capsys.readouterr().out)
+
+
+def test_cli_runs_a_pipeline_with_json_summary(tmp_path, monkeypatch, capsys):
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, "PLone", 30, deleted_every=10)
+    seed_playlist(fake, "PLtwo", 5)
+    (tmp_path / "config.json").write_text(json.dumps({"playlists": ["PLone", "PLtwo"]}))
+
+    exit_code, summary = run_cli(
+        ["run", "sync", "stats", "clean", "top-artists", "prune", "--json",
+         "--config", "config.json"],
+        fake, monkeypatch, capsys, tmp_path,
+    )
+
+    assert exit_code == 0 and summary["ok"]
+    steps = {(step["command"], step["target"]): step for step in summary["steps"]}
+    assert steps["sync", "PLone"]["result"]["items"] == 30
+    assert steps["sync", "PLtwo"]["result"]["items"] == 5
+    assert steps["stats", "PLone"]["result"] == {"rows": 27}
+    assert (tmp_path / "clean_playlist_data_PLtwo.csv").exists()
+    assert len(steps["prune", "PLone"]["result"]["reclaimed"]) == 3
+    assert all(step["seconds"] >= 0 for step in summary["steps"])
+
+
+def test_cli_reports_duplicate_songs_across_playlists(tmp_path, monkeypatch, capsys):
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, "PLone", 5)
+    fake.add_video("lyrics", "Artist 2 - Song 2 (Lyric Video)")
+    fake.add_playlist_item("PLtwo", "lyrics")
+    (tmp_path / "config.json").write_text(json.dumps({"playlists": ["PLone", "PLtwo"]}))
+    run_cli(["sync", "--json"], fake, monkeypatch, capsys, tmp_path)
+
+    exit_code, summary = run_cli(
+        ["duplicates", "--output", "duplicates.csv", "--json"],
+        fake, monkeypatch, capsys, tmp_path,
+    )
+
+    assert exit_code == 0 and summary["steps"][0]["result"] == {"rows": 2}
+    report = pd.read_csv(tmp_path / "duplicates.csv")
+    assert list(report["Video ID"]) == ["PLonev000002", "lyrics"]
+    assert list(report["Dataset"]) == [
+        "playlist_data_PLone.csv",
+        "playlist_data_PLtwo.csv",
+    ]
+
+    with patch("project.find_duplicate_songs", return_value=report) as find:
+        run_cli(
+            ["duplicates", "--threshold", "0", "--json"],
+            fake, monkeypatch, capsys, tmp_path,
+        )
+    assert find.call_args.args[1] == 0
+
+
+def test_cli_add_new_honours_zero_count_and_no_rank(tmp_path, monkeypatch, capsys):
+    fake = FakeYouTubeHttp()
+    seed_playlist(fake, "PLsource", 5)
+    (tmp_path / "config.json").write_text(
+        json.dumps(
+            {"playlists": ["PLtest"], "from_playlists": ["PLsource"],
+             "songs_to_add": 3, "rank_new_songs": True}
+        )
+    )
+
+    with patch.object(
+        AutomateNew, "add_new_songs", autospec=True, return_value=None
+    ) as add_new_songs:
+        run_cli(
+            ["add-new", "--count", "0", "--no-rank", "--json"],
+            fake, monkeypatch, capsys, tmp_path,
+        )
+        run_cli(["add-new", "--json"], fake, monkeypatch, capsys, tmp_path)
+
+    (_, _, _, count), options = add_new_songs.call_args_list[0]
+    assert count == 0 and options["rank"] is False
+    (_, _, _, count), options = add_new_songs.call_args_list[1]
+    assert count == 3 and options["rank"] is True
+
+    exit_code, _ = run_cli(
+        ["add-new", "--count", "0", "--json"], fake, monkeypatch, capsys, tmp_path
+    )
+    assert exit_code == 0 and fake.calls["playlistItems.post"] == 0
+
+
+def test_cli_reports_failed_steps_in_exit_code(tmp_path, monkeypatch, capsys):
+    exit_code, summary = run_cli(
+        ["top-artists", "missing.csv", "--json"],
+        FakeYouTubeHttp(), monkeypatch, capsys, tmp_path,
+    )
+
+    assert exit_code == EXIT_FAILED
+    assert "FileNotFoundError" in summary["steps"][0]["error"]
+
+
+def test_orchestrator_runs_accounts_and_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fakes = {"music": FakeYouTubeHttp(), "podcasts": FakeYouTubeHttp()}
+    for index in range(4):
+        seed_playlist(fakes["music"], f"PLm{index}", 20, deleted_every=5)
+    seed_playlist(fakes["podcasts"], "PLp0", 10)
+    manifest = {
+        "accounts": [
+            {"name": "music", "playlists": ["PLm0", "PLm1", "PLm2", "PLm3"],
+             "jobs": ["sync", "prune"], "workers": 2},
+            {"name": "podcasts", "playlists": ["PLp0", "PLmissing"], "workers": 1},
+        ]
+    }
+
+    def connect(api_manager):
+        account = os.path.basename(os.path.dirname(api_manager.quota.state_file))
+        api_manager.youtube = build_client(fakes[account])
+
+    summary = Orchestrator(manifest, connect).run()
+
+    assert not summary["ok"]
+    failed = [job for job in summary["jobs"] if not job["ok"]]
+    assert [job["playlist_id"] for job in failed] == ["PLmissing"]
+    assert summary["jobs"][1]["result"]["reclaimed"][0]["title"] == "Deleted video"
+    assert os.path.exists("data/music/PLm3_data.csv")
+    assert os.path.exists("orchestrator_checkpoint.json")
+
+    seed_playlist(fakes["podcasts"], "PLmissing", 3)
+    for fake in fakes.values():
+        fake.calls.clear()
+    summary = Orchestrator(manifest, connect).run()
+
+    assert summary["ok"]
+    assert sum(bool(job.get("resumed")) for job in summary["jobs"]) == 9
+    assert fakes["music"].calls.total() == 0
+    assert not os.path.exists("orchestrator_checkpoint.json")
+
+
+def test_orchestrator_quota_is_per_account(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fake = FakeYouTubeHttp()
+    for index in range(3):
+        seed_playlist(fake, f"PL{index}", 5)
+    manifest = {
+        "accounts": [
+            {"name": "small", "playlists": ["PL0", "PL1"], "daily_quota": 1,
+             "workers": 1, "cache": False},
+            {"name": "large", "playlists": ["PL2"]},
+        ]
+    }
+
+    summary = Orchestrator(
+        manifest,
+        lambda api_manager: setattr(api_manager, "youtube", build_client(fake)),
+    ).run()
+
+    jobs = {job["playlist_id"]: job for job in summary["jobs"]}
+    assert jobs["PL0"]["ok"] and jobs["PL2"]["ok"]
+    assert not jobs["PL1"]["ok"] and "left today" in jobs["PL1"]["error"]
+    assert summary["quota"]["small"]["used"] == 1
+
+
+def test_orchestrator_caps_requests_in_flight_per_account(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fake = FakeYouTubeHttp(latency=0.02)
+    for index in range(4):
+        seed_playlist(fake, f"PL{index}", 120)
+    manifest = {
+        "accounts": [
+            {"name": "music", "playlists": ["PL0", "PL1", "PL2", "PL3"],
+             "jobs": ["sync", "stats"], "workers": 4, "max_in_flight": 2,
+             "cache": False},
+        ]
+    }
+
+    summary = Orchestrator(
+        manifest,
+        lambda api_manager: setattr(api_manager, "youtube", build_client(fake)),
+    ).run()
+
+    assert summary["ok"]
+    assert fake.peak_in_flight == 2
+
+
+@pytest.fixture
+def recording_metrics():
+    metrics.registry.reset()
+    yield metrics.registry
+    metrics.registry.disable()
+    metrics.registry.reset()
+
+
+def test_metrics_record_api_calls(tmp_path, recording_metrics, make_fake_manager):
+    playlist_manager, fake = make_fake_manager(PlaylistManager, 120, 3)
+    playlist_manager.get_playlist_items("PLtest")
+    assert recording_metrics.as_dict() == {}  # disabled: nothing recorded
+
+    recording_metrics.enable()
+    playlist_manager.cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    playlist_manager.quota = QuotaMeter(sleep=lambda seconds: None)
+    fake.inject_errors("playlistItems.get", 503)
+    playlist_manager.get_playlist_items("PLtest")
+    playlist_manager.get_playlist_items("PLtest")
+    playlist_manager.remove_deleted_videos("PLtest", dry_run=False)
+
+    recorded = recording_metrics.as_dict()
+    latency = {
+        (series["labels"]["method"], series["labels"]["status"]): series["count"]
+        for series in recorded["youtube_api_request_seconds"]
+    }
+    assert latency == {("youtube.playlistItems.list", "ok"): 9, ("batch", "ok"): 1}
+    units = {
+        series["labels"]["method"]: series["value"]
+        for series in recorded["youtube_api_quota_units_total"]
+    }
+    assert units == {"youtube.playlistItems.list": 3 + 1, "batch": 40 * 50}
+    assert recorded["youtube_api_retries_total"][0]["value"] == 1
+    events = {
+        series["labels"]["event"]: series["value"]
+        for series in recorded["youtube_api_cache_events_total"]
+    }
+    assert events == {"misses": 3, "hits": 6}
+    assert all(
+        series["value"] > 0 for series in recorded["youtube_api_bytes_received_total"]
+    )
+
+    text = recording_metrics.to_prometheus()
+    assert "# TYPE youtube_api_request_seconds histogram" in text
+    assert 'youtube_api_request_seconds_bucket{method="batch",status="ok",le="+Inf"} 1' in text
+    assert 'youtube_api_retries_total{method="youtube.playlistItems.list"} 1' in text
+
+
+def test_metrics_time_and_profile_data_operations(tmp_path, recording_metrics):
+    stats_csv = tmp_path / "stats.csv"
+    pd.DataFrame(
+        {"Title": ["A - Song (Official Video)"], "Views": [10], "Likes": [1]}
+    ).to_csv(stats_csv, index=False)
+
+    recording_metrics.enable(profile="cprofile")
+    clean_stats(str(stats_csv), str(tmp_path / "clean.csv"))
+    with pytest.raises(FileNotFoundError):
+        clean_stats(str(tmp_path / "missing.csv"), str(tmp_path / "clean.csv"))
+
+    operations = recording_metrics.as_dict()["youtube_manager_operation_seconds"]
+    assert [(series["labels"]["status"], series["count"]) for series in operations] == [
+        ("error", 1),
+        ("ok", 1),
+    ]
+    recording_metrics.write(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()).keys() == {
+        "youtube_manager_operation_seconds"
+    }
+    assert (tmp_path / "metrics.pstats").exists()
+
+
 if __name__ == "__main__":
     pytest.main()
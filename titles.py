@@ -0,0 +1,179 @@
+import functools
+import re
+import unicodedata
+from collections import namedtuple
+
+# Bracketed annotations; 『』 and 「」 usually hold the song itself and are kept as text.
+BRACKETS_PATTERN = re.compile(r"\(([^()]*)\)|\[([^\[\]]*)\]|【([^【】]*)】")
+PLACEHOLDER_PATTERN = re.compile(r"\x00(\d+)\x00")
+# A dash needs a space on at least one side, so "Anne-Marie" and "blink-182" stay whole.
+ARTIST_SEPARATOR = re.compile(
+    r"(?=[\s\-–—|/])(?:\s+[-–—]+\s*|(?<!\s)[-–—]+\s+|\s+\|{1,2}\s+|\s+/\s+)"
+)
+FEATURING_PATTERN = re.compile(
+    r"(?:^|\s)(?:feat\.?|ft\.?|featuring)\s+(.+?)(?=\s+[-–—|]+\s+|\x00|$)",
+    flags=re.IGNORECASE,
+)
+FEATURING_PREFIX = re.compile(r"^(?:feat\.?|ft\.?|featuring|with)\s+", re.IGNORECASE)
+QUOTED_SONG_PATTERN = re.compile(r"^(.+?)\s+[\"'‘“](.+)[\"'’”](.*)$")
+# Anime uploads: "Dororo Ending Full『amazarashi - Sayonaragokko』" or "...『Yamiyo』by Eve".
+CORNER_QUOTE_PATTERN = re.compile(r"『([^』]+)』(?:\s*by\s+(.+))?")
+NOISE_PATTERN = re.compile(
+    r"\b(?:official|music|video|lyrics?|lyrical|audio|visuali[sz]er|mv|m/v|hd|4k"
+    r"|full|release|upgrade)\b",
+    flags=re.IGNORECASE,
+)
+TRAILING_NOISE_WORDS = frozenset(
+    {"official", "music", "video", "lyric", "lyrics", "audio", "mv", "m/v", "hd"}
+)
+VERSION_PATTERN = re.compile(
+    r"\b(?:remix|live|acoustic|acústica|remaster(?:ed)?|version|versión|edit"
+    r"|extended|instrumental|cover|explicit|slowed|sped up|from)\b",
+    flags=re.IGNORECASE,
+)
+# "A, B", "A & B", "A x B", "A ft. B", "A feat. B" and "A featuring B" all credit both.
+CREDIT_SEPARATORS = re.compile(
+    r"\s*,\s*(?:&\s+)?|\s+(?:&|x|ft\.?|feat\.?|featuring)\s+", flags=re.IGNORECASE
+)
+EDGE_PUNCTUATION = " \"'‘’“”|/-–—.,:"
+SYMBOLS_PATTERN = re.compile("[\u2600-\u27bf\U0001f000-\U0001faff]")  # emoji, e.g. 🎵
+
+
+class ParsedTitle(namedtuple("ParsedTitle", "artists featured song tags")):
+    """
+    A parsed video title:
+    - artists  : primary artists, in credit order
+    - featured : featured artists ("feat.", "ft.", "with")
+    - song     : the song name without noise such as "(Official Video)"
+    - tags     : version tags such as "Remix", "Live" or "Acoustic"
+    """
+
+    __slots__ = ()
+
+    @property
+    def artist(self):
+        """The primary artists as one credit, or None if none were found."""
+        return ", ".join(self.artists) or None
+
+
+@functools.lru_cache(maxsize=65536)
+def split_credits(artist):
+    """
+    Splits an artist credit into the artists it names, e.g.
+    "Rema, Selena Gomez" -> ("Rema", "Selena Gomez").
+    """
+    names = CREDIT_SEPARATORS.split(artist.strip())
+    if len(names) == 1:
+        return (names[0],) if names[0] else ()
+    return tuple(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def _is_noise(text):
+    return not NOISE_PATTERN.sub("", PLACEHOLDER_PATTERN.sub("", text)).strip(
+        EDGE_PUNCTUATION
+    )
+
+
+def _restore(groups):
+    return lambda match: f"({groups[int(match.group(1))]})"
+
+
+def _classify(text):
+    """
+    Sorts bracket text into ("featured", names), ("noise",), ("tag", tag)
+    or ("text",) for subtitles that belong to the song.
+    """
+    text = text.strip()
+    if _is_noise(FEATURING_PREFIX.sub("", text)):  # also "(with lyrics)"
+        return ("noise",)
+    if FEATURING_PREFIX.match(text):
+        return "featured", split_credits(FEATURING_PREFIX.sub("", text))
+    rest = NOISE_PATTERN.sub("", text).strip(EDGE_PUNCTUATION)
+    if VERSION_PATTERN.search(rest):
+        return "tag", " ".join(rest.split())
+    return ("text",)
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_title(title):
+    """
+    Parses a video title such as
+    "Nicki Minaj & Ice Spice – Barbie World (with Aqua) [Official Music Video]"
+    into a ParsedTitle. Titles without a recognizable artist get an empty
+    `artists` and the cleaned title as `song`.
+    """
+    text = " ".join(unicodedata.normalize("NFKC", title).split())
+    groups = []
+
+    def hold(match):
+        groups.append(next(group for group in match.groups() if group is not None))
+        return f"\x00{len(groups) - 1}\x00"
+
+    text = BRACKETS_PATTERN.sub(hold, text)
+    corner = CORNER_QUOTE_PATTERN.search(text)
+    if corner and (corner.group(2) or ARTIST_SEPARATOR.search(corner.group(1))):
+        song = corner.group(1)
+        text = f"{corner.group(2)} - {song}" if corner.group(2) else song
+        return parse_title(PLACEHOLDER_PATTERN.sub(_restore(groups), text))
+
+    # Trailing " - Lyrics" or " | Official Music Video" segments are dropped.
+    while True:
+        separators = list(ARTIST_SEPARATOR.finditer(text))
+        if not separators or not _is_noise(text[separators[-1].end() :]):
+            break
+        text = text[: separators[-1].start()]
+
+    featured = []
+    for match in FEATURING_PATTERN.finditer(text):
+        featured.extend(split_credits(match.group(1).strip(EDGE_PUNCTUATION)))
+    text = FEATURING_PATTERN.sub("", text)
+
+    parts = ARTIST_SEPARATOR.split(text, maxsplit=1)
+    if len(parts) == 1:
+        quoted = QUOTED_SONG_PATTERN.match(text)
+        parts = [quoted.group(1), quoted.group(2)] if quoted else ["", text]
+    artist_text, song_text = parts
+
+    # Brackets in the artist part are aliases, e.g. "ILLIT (아일릿)".
+    for index in map(int, PLACEHOLDER_PATTERN.findall(artist_text)):
+        kind, *value = _classify(groups[index])
+        if kind == "featured":
+            featured.extend(value[0])
+    artist_text = PLACEHOLDER_PATTERN.sub("", artist_text).strip(EDGE_PUNCTUATION)
+
+    tags = []
+
+    def resolve(match):
+        group = groups[int(match.group(1))]
+        kind, *value = _classify(group)
+        if kind == "featured":
+            featured.extend(value[0])
+        elif kind == "tag":
+            tags.append(value[0])
+        elif kind == "text":
+            return f"({group.strip()})"
+        return ""  # noise
+
+    song_text = PLACEHOLDER_PATTERN.sub(resolve, song_text)
+    words = song_text.split()
+    # Unbracketed noise at the end, as in "'Magnetic' Official MV".
+    while len(words) > 1 and words[-1].lower().rstrip(".") in TRAILING_NOISE_WORDS:
+        words.pop()
+    song = " ".join(words).strip(EDGE_PUNCTUATION)
+    song = SYMBOLS_PATTERN.sub("", song)
+
+    return ParsedTitle(
+        split_credits(artist_text) if artist_text else (),
+        tuple(dict.fromkeys(featured)),
+        song.strip(),
+        tuple(tags),
+    )
+
+
+def parse_titles(titles):
+    """
+    Parses a whole playlist of titles at once. Repeated titles are parsed
+    once. Returns a list of ParsedTitle in the same order.
+    """
+    parsed = {title: parse_title(title) for title in dict.fromkeys(titles)}
+    return [parsed[title] for title in titles]
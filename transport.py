@@ -0,0 +1,334 @@
+import contextlib
+import datetime
+import logging
+import os
+import threading
+
+from lazy import lazy_import
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Only needed once a network option runs, so they are loaded on first use.
+httplib2 = lazy_import("httplib2")
+google_auth_httplib2 = lazy_import("google_auth_httplib2")
+oauth2_credentials = lazy_import("google.oauth2.credentials")
+oauthlib_flow = lazy_import("google_auth_oauthlib.flow")
+discovery = lazy_import("googleapiclient.discovery")
+
+logger = logging.getLogger(__name__)
+
+# Seconds before expiry at which a token is refreshed, so no request goes out
+# with a token that expires on the way.
+REFRESH_MARGIN = int(os.getenv("YOUTUBE_TOKEN_REFRESH_MARGIN", "300"))
+# Idle keep-alive connections kept per process.
+POOL_SIZE = int(os.getenv("YOUTUBE_POOL_SIZE", "16"))
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP connections shared by every thread of the process.
+    httplib2.Http is not thread-safe, so each request checks one out for its
+    duration and hands it back with its sockets still open, and the next
+    request to the same host skips the TCP and TLS handshakes. At most
+    `max_idle` connections are kept; the most recently used is reused first.
+
+    Args:
+        factory (callable): Builds a new connection (default: httplib2.Http)
+        max_idle (int): Idle connections kept for reuse
+    """
+
+    def __init__(self, factory=None, max_idle=POOL_SIZE):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+
+    def acquire(self):
+        with self._lock:
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            if self._idle:
+                self._reused += 1
+                return self._idle.pop()
+            self._created += 1
+        return self.factory() if self.factory is not None else httplib2.Http()
+
+    def release(self, http):
+        with self._lock:
+            self._in_use -= 1
+            if len(self._idle) < self.max_idle:
+                self._idle.append(http)
+                return
+        http.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """A connection for one request, returned to the pool afterwards."""
+        http = self.acquire()
+        try:
+            yield http
+        finally:
+            self.release(http)
+
+    def clear(self):
+        """Closes the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for http in idle:
+            http.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "created": self._created,
+                "reused": self._reused,
+                "idle": len(self._idle),
+                "peak_in_use": self._peak_in_use,
+            }
+
+
+class PooledHttp:
+    """
+    An httplib2-compatible object, safe to share between threads, that sends
+    each request over a connection from a ConnectionPool.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        with self.pool.connection() as http:
+            return http.request(
+                uri, method=method, body=body, headers=headers, **kwargs
+            )
+
+    def close(self):
+        self.pool.clear()
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """An exclusive lock on `path`, held across processes."""
+    with open(path, "a+", encoding="utf-8") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _utcnow():
+    # google-auth keeps expiry as a naive UTC datetime.
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class TokenManager:
+    """
+    The OAuth credentials of one token file, shared by every thread and
+    refreshed proactively, `margin` seconds before they expire.
+
+    A refresh holds a thread lock and an exclusive lock on `<token
+    file>.lock`, so one thread of one process refreshes at a time. The
+    others wait, then find the new token in the token file and use it
+    without refreshing again. The token file is replaced atomically, so a
+    reader never sees it half-written.
+
+    Args:
+        token_file (str): Authorized user info, as saved by the OAuth flow
+        scopes: OAuth scopes
+        credentials_file (str): Client secrets, for the OAuth flow
+        margin (float): Seconds before expiry to refresh at
+        pool (ConnectionPool): Where the refresh requests are sent from
+    """
+
+    def __init__(
+        self,
+        token_file,
+        scopes,
+        credentials_file="credentials.json",
+        margin=REFRESH_MARGIN,
+        pool=None,
+    ):
+        self.token_file = token_file
+        self.scopes = scopes
+        self.credentials_file = credentials_file
+        self.margin = margin
+        self.pool = pool if pool is not None else default_pool
+        self.credentials = None
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not os.path.exists(self.token_file):
+            return None
+        return oauth2_credentials.Credentials.from_authorized_user_file(
+            self.token_file, self.scopes
+        )
+
+    def _write(self):
+        tmp = self.token_file + ".tmp"
+        # The token is a secret: only the owner may read it.
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as token:
+            token.write(self.credentials.to_json())
+        os.replace(tmp, self.token_file)
+
+    def _stale(self, credentials):
+        if credentials is None or not credentials.token:
+            return True
+        if credentials.expiry is None:
+            return False
+        return credentials.expiry - datetime.timedelta(seconds=self.margin) <= _utcnow()
+
+    def needs_refresh(self):
+        return self._stale(self.credentials)
+
+    def get(self, force=False):
+        """
+        Credentials valid for at least `margin` more seconds, refreshed (or
+        obtained through the OAuth flow) if needed. `force` refreshes even
+        a token that looks valid, e.g. after a 401.
+        """
+        credentials = self.credentials
+        if not force and not self._stale(credentials):
+            return credentials
+        with self._lock, _file_lock(self.token_file + ".lock"):
+            if self.credentials is not credentials:  # another thread refreshed
+                return self.credentials
+            # Another process may have refreshed it already.
+            on_disk = self._read()
+            if on_disk is not None and not self._stale(on_disk):
+                if not force or on_disk.token != getattr(credentials, "token", None):
+                    self.credentials = on_disk
+                    return on_disk
+            self.credentials = self._renew(on_disk or credentials)
+            self._write()
+            return self.credentials
+
+    def _renew(self, credentials):
+        if credentials is not None and credentials.refresh_token:
+            try:
+                credentials.refresh(
+                    google_auth_httplib2.Request(PooledHttp(self.pool))
+                )
+                self.refreshes += 1
+                logger.info("Token refreshed.")
+                return credentials
+            except Exception as e:
+                logger.error("Error refreshing token: %s", e)
+        flow = oauthlib_flow.InstalledAppFlow.from_client_secrets_file(
+            self.credentials_file, self.scopes
+        )
+        credentials = flow.run_local_server(port=0)
+        logger.info("New token obtained and saved.")
+        return credentials
+
+
+class AuthorizedHttp(PooledHttp):
+    """
+    PooledHttp that adds the bearer token of a TokenManager to every
+    request, refreshing it first when it is about to expire. A 401 forces
+    one refresh and a retry.
+    """
+
+    def __init__(self, tokens, pool):
+        super().__init__(pool)
+        self.tokens = tokens
+
+    @property
+    def credentials(self):
+        # googleapiclient reads it to authorize the parts of a batch.
+        return self.tokens.get()
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        credentials = self.tokens.get()
+        for attempt in range(2):
+            request_headers = dict(headers or {})
+            credentials.apply(request_headers)
+            response, content = super().request(
+                uri, method=method, body=body, headers=request_headers, **kwargs
+            )
+            if response.status != 401 or attempt:
+                return response, content
+            credentials = self.tokens.get(force=True)
+
+
+class AuthorizedSession:
+    """
+    Everything needed to call the API as one user: the TokenManager of a
+    token file, a thread-safe AuthorizedHttp on the process's connection
+    pool, and the YouTube client, built on first use from the bundled
+    discovery document. Get one with `get_session`; any code path can send
+    requests with `session.http` without building a client of its own.
+
+    Args:
+        token_file (str): Authorized user info
+        scopes: OAuth scopes
+        credentials_file (str): Client secrets, for the OAuth flow
+        pool (ConnectionPool): Connections to use (default: the process's)
+    """
+
+    def __init__(
+        self, token_file, scopes, credentials_file="credentials.json", pool=None
+    ):
+        pool = pool if pool is not None else default_pool
+        self.tokens = TokenManager(token_file, scopes, credentials_file, pool=pool)
+        self.http = AuthorizedHttp(self.tokens, pool)
+        self._youtube = None
+        self._lock = threading.Lock()
+
+    @property
+    def credentials(self):
+        return self.tokens.get()
+
+    @property
+    def youtube(self):
+        with self._lock:
+            if self._youtube is None:
+                self._youtube = discovery.build(
+                    "youtube", "v3", http=self.http, static_discovery=True
+                )
+            return self._youtube
+
+
+# Process-wide: the connection pool, and one session per (token file, scopes).
+default_pool = ConnectionPool()
+_sessions = {}  # key -> (lock held while authorizing, session or None)
+_sessions_lock = threading.Lock()
+
+
+def get_session(token_file, scopes, credentials_file="credentials.json"):
+    """
+    The process's AuthorizedSession for a token file and scopes, created
+    and authorized on first use. Authorizing one token file, which may wait
+    on the OAuth consent in a browser, does not hold up the others.
+    """
+    key = (os.path.abspath(token_file), scopes)
+    with _sessions_lock:
+        lock, session = _sessions.setdefault(key, (threading.Lock(), None))
+    if session is not None:
+        return session
+    with lock:
+        session = _sessions[key][1]
+        if session is None:
+            session = AuthorizedSession(token_file, scopes, credentials_file)
+            session.tokens.get()
+            with _sessions_lock:
+                _sessions[key] = (lock, session)
+        return session